@@ -0,0 +1,610 @@
+"""
+Xero Asyncio Client
+
+A small asyncio client for the Xero endpoints used by the scripts in this directory. Unlike the generated, synchronous
+xero-python ApiClient, it shares one pooled keep-alive HTTP session between any number of concurrent requests and
+enforces Xero's per-tenant rate limits itself, so callers can simply asyncio.gather() hundreds of calls.
+
+It reuses the same files as the other scripts:
+    - xero_config.yaml (CLIENT_ID, CLIENT_SECRET)
+    - .xero_token.json (generated by xero_connect.py, refreshed and saved back when it expires)
+
+Responses are returned as the JSON documents Xero sends (PascalCase keys), with numbers parsed as Decimal.
+
+Example:
+    import asyncio
+    from xero_async_client import XeroAsyncClient
+
+    async def main():
+        async with XeroAsyncClient.from_files() as xero:
+            connections = await xero.get_connections()
+            tenant_id = connections[0]["tenantId"]
+            journals = await asyncio.gather(*(xero.get_manual_journal(tenant_id, jid) for jid in journal_ids))
+
+    asyncio.run(main())
+
+Scripts start their coroutines with run() rather than asyncio.run(). On its own that is the same thing; under
+xero_batch.py (after start_shared_session()) every coroutine runs on one background event loop and every
+from_files() returns the same client, so the steps of a batch share the token, the HTTP connections and the rate
+limiters.
+"""
+
+import asyncio
+import base64
+import collections
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import httpx
+import yaml
+from xero_http_cache import HttpCache, endpoint_of, is_unchanged, server_time
+
+API_URL = "https://api.xero.com/api.xro/2.0"
+CONNECTIONS_URL = "https://api.xero.com/connections"
+TOKEN_URL = "https://identity.xero.com/connect/token"
+
+# Xero limits: 5 concurrent calls and 60 calls per minute per tenant, 10,000 calls per minute per app.
+TENANT_CONCURRENCY = 5
+TENANT_CALLS_PER_MINUTE = 60
+APP_CALLS_PER_MINUTE = 10000
+MAX_RETRIES = 5
+# A 429 asking to wait longer than this (e.g. the daily limit) is raised instead of waited out
+MAX_RETRY_AFTER = 120
+
+# Event loop of the shared session (see start_shared_session()); None when each run() has its own loop
+_shared_loop = None
+
+_XERO_DATE = re.compile(r"/Date\((-?\d+)([+-]\d{4})?\)/")
+
+
+class XeroApiError(Exception):
+    def __init__(self, status, message, body=None, retry_after=None, problem=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.body = body
+        # For a 429 raised without retrying: the Retry-After seconds and X-Rate-Limit-Problem (e.g. "day")
+        self.retry_after = retry_after
+        self.problem = problem
+
+
+def load_config(config_file="xero_config.yaml"):
+    with open(config_file, "r") as f:
+        return yaml.safe_load(f)
+
+
+def load_token(token_file=".xero_token.json"):
+    if not os.path.exists(token_file):
+        print("Token file not found. Please run xero_connect.py first.", file=sys.stderr)
+        return None
+    with open(token_file, "r") as f:
+        return json.load(f)
+
+
+def parse_xero_date(value):
+    """Convert Xero's "/Date(1735603200000+0000)/" (or ISO 8601) to a date or, if it has a time part, a datetime."""
+    if not value:
+        return None
+    match = _XERO_DATE.fullmatch(value)
+    if match:
+        moment = datetime.fromtimestamp(int(match.group(1)) / 1000, tz=timezone.utc)
+        return moment.date() if moment.time() == datetime.min.time() else moment
+    moment = datetime.fromisoformat(value)
+    return moment.date() if len(value) == 10 else moment
+
+
+def parse_xero_timestamp(value):
+    """
+    parse_xero_date() for UpdatedDateUTC values, always as a datetime.
+
+    The incremental syncs send the newest UpdatedDateUTC they have stored as If-Modified-Since: Xero's own timestamps,
+    so a skewed local clock cannot skip changes.
+    """
+    moment = parse_xero_date(value)
+    return (
+        moment if isinstance(moment, datetime) else datetime.combine(moment, datetime.min.time(), tzinfo=timezone.utc)
+    )
+
+
+def _format_date(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _format_http_date(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+
+class RateLimiter:
+    """Sliding-window limiter with a concurrency cap, shared by every request for one tenant."""
+
+    def __init__(self, calls_per_minute, concurrency=None):
+        self.calls_per_minute = calls_per_minute
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        self.calls = collections.deque()
+        self.lock = asyncio.Lock()
+        self.blocked_until = 0.0
+        # Last values of Xero's X-MinLimit-Remaining / X-DayLimit-Remaining headers
+        self.remaining = {}
+
+    async def wait_turn(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if self.blocked_until > now:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                while self.calls and now - self.calls[0] >= 60:
+                    self.calls.popleft()
+                if len(self.calls) < self.calls_per_minute:
+                    self.calls.append(now)
+                    return
+                await asyncio.sleep(60 - (now - self.calls[0]))
+
+    def block_for(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class XeroAsyncClient:
+    def __init__(self, config, token_data, token_file=".xero_token.json", max_connections=100, cache=True):
+        self.config = config
+        self.token_data = dict(token_data)
+        self.token_file = token_file
+        self.session = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._token_lock = asyncio.Lock()
+        self._app_limiter = RateLimiter(APP_CALLS_PER_MINUTE)
+        self._tenant_limiters = {}
+        self._connections = None
+        # Shared on-disk cache of GET responses (see xero_http_cache.py)
+        self.http_cache = HttpCache.from_environment() if cache else None
+
+        if "expires_at" not in self.token_data and os.path.exists(token_file):
+            # Tokens saved by xero_connect.py only carry expires_in; count it from when the file was written.
+            self.token_data["expires_at"] = os.path.getmtime(token_file) + self.token_data.get("expires_in", 0)
+
+    # The client of the shared session, created by the first from_files() call on the shared loop
+    shared = None
+
+    @classmethod
+    def from_files(cls, config_file="xero_config.yaml", token_file=".xero_token.json", **kwargs):
+        if _shared_loop is not None and kwargs.get("cache", True):
+            if cls.shared is None:
+                cls.shared = cls._from_files(config_file, token_file, **kwargs)
+            return cls.shared
+        return cls._from_files(config_file, token_file, **kwargs)
+
+    @classmethod
+    def _from_files(cls, config_file, token_file, **kwargs):
+        token_data = load_token(token_file)
+        if not token_data:
+            sys.exit(1)
+        return cls(load_config(config_file), token_data, token_file=token_file, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        # The shared client outlives each `async with`; stop_shared_session() closes it
+        if self is not XeroAsyncClient.shared:
+            await self.close()
+
+    async def close(self):
+        await self.session.aclose()
+        if self.http_cache:
+            self.http_cache.close()
+
+    def limiter(self, tenant_id):
+        if tenant_id not in self._tenant_limiters:
+            self._tenant_limiters[tenant_id] = RateLimiter(TENANT_CALLS_PER_MINUTE, TENANT_CONCURRENCY)
+        return self._tenant_limiters[tenant_id]
+
+    # Authentication
+
+    async def refresh_token(self):
+        auth = base64.b64encode(f"{self.config['CLIENT_ID']}:{self.config['CLIENT_SECRET']}".encode()).decode()
+        response = await self.session.post(
+            TOKEN_URL,
+            headers={"Authorization": f"Basic {auth}"},
+            data={"grant_type": "refresh_token", "refresh_token": self.token_data["refresh_token"]},
+        )
+        if response.status_code != 200:
+            raise XeroApiError(response.status_code, f"Token refresh failed: {response.text}")
+        token = response.json()
+        token["expires_at"] = time.time() + token.get("expires_in", 1800)
+        self.token_data = token
+        with open(self.token_file, "w") as f:
+            json.dump(token, f, indent=4)
+
+    async def _access_token(self, force_refresh=False):
+        async with self._token_lock:
+            if force_refresh or self.token_data.get("expires_at", 0) - 60 < time.time():
+                await self.refresh_token()
+            return self.token_data["access_token"]
+
+    # Transport
+
+    async def request(
+        self,
+        method,
+        url,
+        tenant_id=None,
+        params=None,
+        json_body=None,
+        if_modified_since=None,
+        idempotency_key=None,
+        headers=None,
+        fresh=False,
+    ):
+        """
+        Send one request within the rate limits, retrying on 429 and on an expired token. Returns parsed JSON.
+
+        With fresh, a GET is sent to Xero even if the HTTP cache holds a valid response, and the answer replaces it:
+        revalidation with If-Modified-Since cannot see deleted records, so listings used to detect deletions need it.
+        """
+        if not url.startswith("https://"):
+            url = f"{API_URL}{url}"
+        request_headers = {"Accept": "application/json", **(headers or {})}
+        if tenant_id:
+            request_headers["xero-tenant-id"] = tenant_id
+        if if_modified_since:
+            request_headers["If-Modified-Since"] = _format_http_date(if_modified_since)
+        if idempotency_key:
+            request_headers["Idempotency-Key"] = idempotency_key
+        body = json.dumps(json_body, default=_json_default) if json_body is not None else None
+        if body is not None:
+            request_headers["Content-Type"] = "application/json"
+
+        if method == "GET" and self.http_cache and self.http_cache.is_cacheable(url, request_headers):
+            response = await self._cached_get(url, tenant_id, params, request_headers, fresh)
+        else:
+            response = await self._send(method, url, tenant_id, params, body, request_headers)
+            if method != "GET" and self.http_cache and response.status_code < 400:
+                # Cached listings of what was just written (and reports of the ledger it changed) are out of date
+                self.http_cache.invalidate(tenant_id, url)
+
+        if response.status_code == 304:
+            return None
+        if response.status_code >= 400:
+            raise XeroApiError(response.status_code, _error_message(response), response.text)
+        if not response.content:
+            return None
+        return json.loads(response.text, parse_float=Decimal)
+
+    async def _send(self, method, url, tenant_id, params, body, request_headers):
+        """Send within the rate limits, retrying on 429 and once on 401 with a refreshed token."""
+        limiter = self.limiter(tenant_id)
+        force_refresh = False
+        for attempt in range(MAX_RETRIES + 1):
+            token = await self._access_token(force_refresh)
+            request_headers["Authorization"] = f"Bearer {token}"
+            async with limiter.semaphore:
+                await self._app_limiter.wait_turn()
+                await limiter.wait_turn()
+                response = await self.session.request(
+                    method,
+                    url,
+                    params=params,
+                    content=body,
+                    headers=request_headers,
+                )
+
+            for header in ("X-MinLimit-Remaining", "X-DayLimit-Remaining"):
+                if header in response.headers:
+                    limiter.remaining[header] = int(response.headers[header])
+
+            if response.status_code == 429 and attempt < MAX_RETRIES:
+                retry_after = int(response.headers.get("Retry-After", "60"))
+                problem = response.headers.get("X-Rate-Limit-Problem", "")
+                if problem == "day" or retry_after > MAX_RETRY_AFTER:
+                    raise XeroApiError(
+                        429,
+                        f"Rate limited ({problem or 'unknown'} limit); retry after {retry_after}s",
+                        response.text,
+                        retry_after=retry_after,
+                        problem=problem,
+                    )
+                print(f"Rate limited ({problem or 'unknown'} limit); retrying in {retry_after}s", file=sys.stderr)
+                if problem == "appminute":
+                    self._app_limiter.block_for(retry_after)
+                else:
+                    limiter.block_for(retry_after)
+                continue
+            if response.status_code == 401 and not force_refresh:
+                force_refresh = True
+                continue
+            return response
+
+        raise XeroApiError(429, "Rate limit retries exhausted")
+
+    async def _cached_get(self, url, tenant_id, params, request_headers, fresh=False):
+        """GET through the HTTP cache: serve fresh entries, revalidate stale ones with one conditional request."""
+        cache = self.http_cache
+        entry = None if fresh else cache.lookup(tenant_id, url, params)
+        state = cache.state(url, entry) if entry else "stale"
+        if state == "revalidate":
+            async with cache.endpoint_lock(tenant_id, endpoint_of(url), asyncio.Lock):
+                # A concurrent request (e.g. another page of the same listing) may have revalidated it meanwhile
+                entry = cache.lookup(tenant_id, url, params)
+                state = cache.state(url, entry) if entry else "stale"
+                if state == "revalidate":
+                    check_url, check_params, check_headers = cache.revalidation_request(url, params, entry)
+                    response = await self._send(
+                        "GET", check_url, tenant_id, check_params, None, {**request_headers, **check_headers}
+                    )
+                    if is_unchanged(response.status_code, response.content):
+                        cache.mark_validated(
+                            tenant_id, cache.cache_key(url, params), entry, server_time(response.headers)
+                        )
+                        state = "fresh"
+                    elif entry["etag"] and response.status_code == 200:
+                        cache.store(tenant_id, url, params, response.content, response.headers)
+                        return response
+                    else:
+                        state = "stale"
+        if state == "fresh":
+            return httpx.Response(200, content=entry["body"], headers=entry["headers"])
+
+        response = await self._send("GET", url, tenant_id, params, None, request_headers)
+        if response.status_code == 200:
+            cache.store(tenant_id, url, params, response.content, response.headers)
+        return response
+
+    # Identity
+
+    async def get_connections(self):
+        # Connections only change when the user re-authorises, so one request per client is enough
+        if self._connections is None:
+            self._connections = await self.request("GET", CONNECTIONS_URL)
+        return self._connections
+
+    # Manual journals
+
+    async def get_manual_journals(
+        self, tenant_id, page=None, where=None, order=None, if_modified_since=None, page_size=None, fresh=False
+    ):
+        """One page of manual journals (with lines). An empty list means there are no more pages."""
+        params = {k: v for k, v in (("page", page), ("where", where), ("order", order), ("pageSize", page_size)) if v}
+        data = await self.request(
+            "GET", "/ManualJournals", tenant_id, params=params, if_modified_since=if_modified_since, fresh=fresh
+        )
+        return (data or {}).get("ManualJournals", [])
+
+    async def get_all_manual_journals(
+        self, tenant_id, where=None, order=None, if_modified_since=None, window=5, fresh=False
+    ):
+        """All pages of manual journals, fetching `window` pages concurrently until an empty page is seen."""
+        return await _all_pages(
+            lambda page: self.get_manual_journals(tenant_id, page, where, order, if_modified_since, fresh=fresh),
+            window,
+        )
+
+    async def get_manual_journal(self, tenant_id, manual_journal_id):
+        data = await self.request("GET", f"/ManualJournals/{manual_journal_id}", tenant_id)
+        journals = (data or {}).get("ManualJournals", [])
+        return journals[0] if journals else None
+
+    async def update_manual_journal(self, tenant_id, manual_journal_id, journal, idempotency_key=None):
+        data = await self.request(
+            "POST",
+            f"/ManualJournals/{manual_journal_id}",
+            tenant_id,
+            json_body={"ManualJournals": [journal]},
+            idempotency_key=idempotency_key,
+        )
+        return data["ManualJournals"][0]
+
+    async def create_manual_journals(self, tenant_id, journals, idempotency_key=None):
+        """
+        Create many manual journals in one request.
+
+        Sent with summarizeErrors=false, so Xero returns every journal with its own StatusAttributeString
+        ("OK" or "ERROR") and ValidationErrors instead of rejecting the whole batch.
+        """
+        data = await self.request(
+            "PUT",
+            "/ManualJournals",
+            tenant_id,
+            params={"summarizeErrors": "false"},
+            json_body={"ManualJournals": journals},
+            idempotency_key=idempotency_key,
+        )
+        return data["ManualJournals"]
+
+    # Paged listings (Invoices, BankTransactions, CreditNotes, Contacts, ...)
+
+    async def get_list_page(self, tenant_id, endpoint, page, if_modified_since=None, **params):
+        """
+        One page of a paged listing such as "/Invoices"; an empty list means there are no more pages.
+
+        The records are under the collection named like the endpoint (e.g. "Invoices"), with their line items.
+        """
+        data = await self.request(
+            "GET", endpoint, tenant_id, params=_clean({"page": page, **params}), if_modified_since=if_modified_since
+        )
+        return (data or {}).get(endpoint.strip("/"), [])
+
+    async def get_all_list_pages(self, tenant_id, endpoint, if_modified_since=None, window=5, **params):
+        """All pages of a paged listing, fetching `window` pages concurrently until an empty page is seen."""
+        return await _all_pages(
+            lambda page: self.get_list_page(tenant_id, endpoint, page, if_modified_since, **params), window
+        )
+
+    # General ledger journals
+
+    async def get_journals(self, tenant_id, offset=None, payments_only=None, if_modified_since=None):
+        """Up to 100 general ledger journals with JournalNumber greater than offset, in JournalNumber order."""
+        params = _clean({"offset": offset, "paymentsOnly": payments_only})
+        data = await self.request("GET", "/Journals", tenant_id, params=params, if_modified_since=if_modified_since)
+        return (data or {}).get("Journals", [])
+
+    # Accounts
+
+    async def get_accounts(self, tenant_id, where=None, order=None, if_modified_since=None, fresh=False):
+        params = {k: v for k, v in (("where", where), ("order", order)) if v}
+        data = await self.request(
+            "GET", "/Accounts", tenant_id, params=params, if_modified_since=if_modified_since, fresh=fresh
+        )
+        return (data or {}).get("Accounts", [])
+
+    async def create_account(self, tenant_id, account, idempotency_key=None):
+        data = await self.request("PUT", "/Accounts", tenant_id, json_body=account, idempotency_key=idempotency_key)
+        return data["Accounts"][0]
+
+    async def update_account(self, tenant_id, account_id, account, idempotency_key=None):
+        data = await self.request(
+            "POST", f"/Accounts/{account_id}", tenant_id, json_body=account, idempotency_key=idempotency_key
+        )
+        return data["Accounts"][0]
+
+    # Tax rates
+
+    async def get_tax_rates(self, tenant_id):
+        data = await self.request("GET", "/TaxRates", tenant_id)
+        return (data or {}).get("TaxRates", [])
+
+    # Tracking categories
+
+    async def get_tracking_categories(self, tenant_id, include_archived=False):
+        params = {"includeArchived": "true"} if include_archived else {}
+        data = await self.request("GET", "/TrackingCategories", tenant_id, params=params)
+        return (data or {}).get("TrackingCategories", [])
+
+    # Organisation
+
+    async def get_organisations(self, tenant_id):
+        data = await self.request("GET", "/Organisation", tenant_id)
+        return (data or {}).get("Organisations", [])
+
+    # Reports
+
+    async def get_report_profit_and_loss(self, tenant_id, from_date=None, to_date=None, **params):
+        query = {"fromDate": _format_date(from_date), "toDate": _format_date(to_date), **params}
+        data = await self.request("GET", "/Reports/ProfitAndLoss", tenant_id, params=_clean(query))
+        return data["Reports"][0]
+
+    async def get_report_balance_sheet(self, tenant_id, report_date=None, **params):
+        query = {"date": _format_date(report_date), **params}
+        data = await self.request("GET", "/Reports/BalanceSheet", tenant_id, params=_clean(query))
+        return data["Reports"][0]
+
+    async def get_report_trial_balance(self, tenant_id, report_date=None, **params):
+        query = {"date": _format_date(report_date), **params}
+        data = await self.request("GET", "/Reports/TrialBalance", tenant_id, params=_clean(query))
+        return data["Reports"][0]
+
+
+async def _all_pages(fetch_page, window):
+    """Concatenate pages 1, 2, ... of a listing, fetching `window` pages at a time until one comes back empty."""
+    records = []
+    page = 1
+    while True:
+        pages = await asyncio.gather(*(fetch_page(p) for p in range(page, page + window)))
+        for batch in pages:
+            records.extend(batch)
+        if any(not batch for batch in pages):
+            return records
+        page += window
+
+
+def start_shared_session():
+    """Make run() use one background event loop (and from_files() one client) until stop_shared_session()."""
+    global _shared_loop
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="xero-shared-loop", daemon=True).start()
+    _shared_loop = loop
+
+
+def stop_shared_session():
+    global _shared_loop
+    if XeroAsyncClient.shared is not None:
+        run(XeroAsyncClient.shared.close())
+        XeroAsyncClient.shared = None
+    loop, _shared_loop = _shared_loop, None
+    if loop is not None:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+async def _catch_exit(coro):
+    # sys.exit() inside a task would stop the shared loop itself; hand it back to the calling thread instead
+    try:
+        return await coro, None
+    except SystemExit as e:
+        return None, e
+
+
+def run(coro):
+    """
+    Run a coroutine to completion from synchronous code and return its result.
+
+    Without a shared session this is asyncio.run(). With one, the coroutine is scheduled on the shared loop and the
+    calling thread waits for it; the task inherits the caller's context variables (e.g. its output redirection).
+    """
+    if _shared_loop is None:
+        return asyncio.run(coro)
+    result, exit_error = asyncio.run_coroutine_threadsafe(_catch_exit(coro), _shared_loop).result()
+    if exit_error:
+        raise exit_error
+    return result
+
+
+def _json_default(value):
+    # Amounts are kept as Decimal; 2-decimal-place amounts round-trip exactly through a float's shortest repr
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _clean(params):
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def _error_message(response):
+    try:
+        data = response.json()
+    except ValueError:
+        return response.text[:200]
+    for element in data.get("Elements", []):
+        for error in element.get("ValidationErrors", []):
+            return error.get("Message")
+    return data.get("Message") or data.get("Detail") or data.get("Title") or response.reason_phrase
+
+
+def resolve_tenant(connections, tenant_id_arg=None, tenant_index=None):
+    """Pick a connection the same way as the --tenant-id/--tenant-index options of the other scripts."""
+    if not connections:
+        print("No connections found.", file=sys.stderr)
+        sys.exit(1)
+
+    if tenant_id_arg:
+        for conn in connections:
+            if conn.get("tenantId") == tenant_id_arg:
+                print(f"Using Tenant: {conn.get('tenantName', tenant_id_arg)} ({tenant_id_arg})", file=sys.stderr)
+                return tenant_id_arg
+        print(f"Tenant ID {tenant_id_arg} not found among connections.", file=sys.stderr)
+        sys.exit(1)
+
+    if tenant_index:
+        idx = tenant_index - 1
+        if idx < 0 or idx >= len(connections):
+            print(f"Tenant index {tenant_index} is out of range (1-{len(connections)}).", file=sys.stderr)
+            sys.exit(1)
+        chosen = connections[idx]
+    else:
+        chosen = connections[0]
+    print(f"Using Tenant: {chosen.get('tenantName', '')} ({chosen.get('tenantId', '')})", file=sys.stderr)
+    return chosen["tenantId"]
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+#     "httpx",
 #     "PyYAML",
 #     "xero-python",
 # ]
@@ -9,47 +10,61 @@
 """
 Xero Balance Sheet Report Generator
 
-This script fetches and displays the Balance Sheet report from Xero for a specified date.
+This script fetches and displays the Balance Sheet report from Xero for a specified date, or for many dates at once
+as a single account x date matrix in CSV format.
 
 Usage:
     ./xero_balance_sheet_report.py [options]
 
 Options:
     --date YYYY-MM-DD        Date for the report (default: 2025-12-31)
+    --dates D1,D2,...        Fetch several dates concurrently and print one CSV matrix
+    --every month|quarter|year --from YYYY-MM-DD --to YYYY-MM-DD
+                             Fetch every period end in the range and print one CSV matrix
+    --roll-forward           Roll the last saved snapshot forward with the journals posted since, instead of
+                             fetching the full report (default date: today)
+    --full-refresh-days N    With --roll-forward, fetch the full report and check the snapshot for drift when it
+                             is older than N days (default: 7)
+    --no-precomputed         Fetch reports even if xero_scheduler.py has precomputed them
 
 Examples:
     ./xero_balance_sheet_report.py
     ./xero_balance_sheet_report.py --date 2024-12-31
+    ./xero_balance_sheet_report.py --dates 2024-06-30,2024-12-31
+    ./xero_balance_sheet_report.py --every month --from 2024-01-01 --to 2025-12-31 > net_assets.csv
+    ./xero_balance_sheet_report.py --roll-forward > balances_today.csv
 """
 import argparse
-import os
-import json
-import yaml
+import asyncio
+import csv
 import sys
 from datetime import date, datetime
-from xero_python.api_client import ApiClient
-from xero_python.api_client.configuration import Configuration
-from xero_python.api_client.oauth2 import OAuth2Token
-from xero_python.identity import IdentityApi
+from decimal import Decimal
 from xero_python.accounting import AccountingApi
-
-
-def load_config(config_file="xero_config.yaml"):
-    with open(config_file, "r") as f:
-        return yaml.safe_load(f)
-
-
-def load_token(token_file=".xero_token.json"):
-    if not os.path.exists(token_file):
-        print("Token file not found. Please run xero_connect.py first.")
-        return None
-    with open(token_file, "r") as f:
-        return json.load(f)
+from xero_session import sdk_client, sdk_connections
+from xero_async_client import XeroAsyncClient, parse_xero_date, resolve_tenant as resolve_connection, run
+from xero_cache import ACCOUNTS_FILE, age_seconds, cached_fetch, read_json, tenant_cache_path, utc_now, write_json
+from xero_journal_store import JOURNALS_PAGE_SIZE, JournalStore, latest_journal_number, sync_gl_journals
+from xero_precomputed import load_report
+from xero_validation import ACCOUNTS_MAX_AGE
+from xero_reports import (
+    ACCOUNT_CLASS_BY_TYPE,
+    EVERY_CHOICES,
+    flatten_report,
+    merge_columns,
+    period_ends,
+    report_from_sdk,
+    row_key,
+    write_matrix,
+)
+
+SNAPSHOT_FILE = "balance_sheet_snapshot.json"
+SNAPSHOT_VERSION = 1
+CURRENT_YEAR_EARNINGS = "Current Year Earnings"
 
 
 def resolve_tenant(api_client, tenant_id_arg=None, tenant_index=None):
-    identity_api = IdentityApi(api_client)
-    connections = identity_api.get_connections()
+    connections = sdk_connections(api_client)
 
     if not connections:
         print("No connections found.", file=sys.stderr)
@@ -86,15 +101,298 @@ def resolve_tenant(api_client, tenant_id_arg=None, tenant_index=None):
     return chosen.tenant_id
 
 
-def main():
+async def fetch_balance_sheet_series(tenant_id_arg, tenant_index, report_dates, use_precomputed=True):
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+
+        # Organisation details are the same for every date; fetch them once
+        for org in await xero.get_organisations(tenant_id):
+            print(f"Base Currency: {org.get('BaseCurrency')}", file=sys.stderr)
+
+        reports = [None] * len(report_dates)
+        if use_precomputed:
+            for i, report_date in enumerate(report_dates):
+                precomputed = load_report(tenant_id, "balance_sheet", (report_date,))
+                if precomputed:
+                    reports[i] = precomputed[0]
+        missing = [i for i, report in enumerate(reports) if report is None]
+        if len(missing) < len(report_dates):
+            print(f"Using {len(report_dates) - len(missing)} precomputed Balance Sheet(s).", file=sys.stderr)
+        print(f"Fetching {len(missing)} Balance Sheets...", file=sys.stderr)
+        fetched = await asyncio.gather(*(xero.get_report_balance_sheet(tenant_id, report_dates[i]) for i in missing))
+        for i, report in zip(missing, fetched):
+            reports[i] = report
+
+    matrix = merge_columns([flatten_report(report) for report in reports])
+    write_matrix([d.isoformat() for d in report_dates], matrix)
+
+
+async def journal_lines_since(xero, tenant_id, offset):
+    """All general ledger journal lines numbered above offset, and the new offset."""
+    lines = []
+    while True:
+        batch = await xero.get_journals(tenant_id, offset=offset)
+        for journal in batch:
+            journal_date = parse_xero_date(journal["JournalDate"])
+            for line in journal.get("JournalLines") or []:
+                lines.append(
+                    {
+                        "Date": journal_date.isoformat(),
+                        "AccountID": line["AccountID"],
+                        "AccountType": line.get("AccountType"),
+                        "AccountName": line.get("AccountName"),
+                        "NetAmount": str(line.get("NetAmount", 0)),
+                    }
+                )
+        if batch:
+            offset = max(j["JournalNumber"] for j in batch)
+        if len(batch) < JOURNALS_PAGE_SIZE:
+            return lines, offset
+
+
+async def deferred_lines(xero, tenant_id, report_date, journal_offset):
+    """
+    Lines of journals numbered up to journal_offset but dated after report_date (a future-dated journal, the reversal
+    of an auto-reversing accrual). They are not in the report, and journal_lines_since() never returns them since
+    they are below the offset, so roll_forward() applies them once the target date reaches theirs.
+
+    They come from the local ledger store (xero_journal_store.py), which is synced first: the Journals endpoint can
+    only be read by number, so this reads the whole ledger once and only new journals afterwards.
+    """
+    chart = await cached_fetch(tenant_id, ACCOUNTS_FILE, ACCOUNTS_MAX_AGE, lambda: xero.get_accounts(tenant_id))
+    names = {account["AccountID"]: account.get("Name") for account in chart}
+    with JournalStore(tenant_id) as store:
+        await sync_gl_journals(xero, store)
+        return [
+            {
+                "Date": line["Date"],
+                "AccountID": line["AccountID"],
+                "AccountType": line["AccountType"],
+                "AccountName": names.get(line["AccountID"]),
+                "NetAmount": str(line["NetAmount"]),
+            }
+            for line in store.gl_journal_lines(report_date.isoformat(), journal_offset)
+        ]
+
+
+def snapshot_from_report(report, report_date, journal_offset, financial_year_end, deferred=()):
+    _, rows = flatten_report(report)
+    return {
+        "version": SNAPSHOT_VERSION,
+        "date": report_date.isoformat(),
+        "refreshed_at": utc_now().isoformat(),
+        "journal_offset": journal_offset,
+        "financial_year_end": financial_year_end,
+        "rows": [
+            {
+                "Key": row_key(row),
+                "Section": row["Section"],
+                "Label": row["Label"],
+                "AccountID": row["AccountID"],
+                "Balance": str(row["Values"][0] if row["Values"] and row["Values"][0] is not None else 0),
+            }
+            for row in rows
+            if row["RowType"] == "Row"
+        ],
+        # Lines already numbered below journal_offset but dated after the snapshot date
+        "deferred": list(deferred),
+    }
+
+
+def roll_forward(snapshot, lines, target_date):
+    """
+    Apply journal lines dated on or before target_date to the snapshot balances.
+
+    Balances follow the report's sign convention: assets are debit-positive, liabilities and equity credit-positive.
+    Revenue and expense lines move Current Year Earnings. Lines dated after target_date are kept for a later run.
+    Returns {row key: movement}.
+    """
+    rows = {row["Key"]: row for row in snapshot["rows"]}
+    cye_key = next((key for key, row in rows.items() if row["Label"] == CURRENT_YEAR_EARNINGS), None)
+    movements = {}
+    deferred = []
+    for line in snapshot.get("deferred", []) + lines:
+        if line["Date"] > target_date.isoformat():
+            deferred.append(line)
+            continue
+        account_class = ACCOUNT_CLASS_BY_TYPE.get(line["AccountType"], "ASSET")
+        amount = Decimal(line["NetAmount"])
+        if account_class in ("REVENUE", "EXPENSE"):
+            if cye_key is None:
+                cye_key = f"Equity|{CURRENT_YEAR_EARNINGS}"
+                rows[cye_key] = {"Key": cye_key, "Section": "Equity", "Label": CURRENT_YEAR_EARNINGS}
+            key, delta = cye_key, -amount
+        else:
+            key, delta = line["AccountID"], amount if account_class == "ASSET" else -amount
+            if key not in rows:
+                rows[key] = {
+                    "Key": key,
+                    "Section": account_class.title(),
+                    "Label": line["AccountName"] or key,
+                    "AccountID": key,
+                }
+        row = rows[key]
+        row["Balance"] = str(Decimal(row.get("Balance", "0")) + delta)
+        movements[key] = movements.get(key, Decimal(0)) + delta
+
+    snapshot["rows"] = list(rows.values())
+    snapshot["deferred"] = deferred
+    snapshot["date"] = target_date.isoformat()
+    return movements
+
+
+def crosses_year_end(from_date, to_date, financial_year_end):
+    """True if a financial year ends in [from_date, to_date); Xero then moves earnings into retained earnings."""
+    month, day = financial_year_end
+    for year in range(from_date.year, to_date.year + 1):
+        try:
+            year_end = date(year, month, day)
+        except ValueError:
+            year_end = date(year, month, 28)
+        if from_date <= year_end < to_date:
+            return True
+    return False
+
+
+def report_drift(expected, actual):
+    """Print rows where the rolled-forward snapshot disagrees with a freshly fetched report."""
+    expected_rows = {row["Key"]: row for row in expected["rows"]}
+    actual_rows = {row["Key"]: row for row in actual["rows"]}
+    drift = 0
+    for key in dict.fromkeys([*expected_rows, *actual_rows]):
+        before = Decimal(expected_rows.get(key, {}).get("Balance", "0"))
+        after = Decimal(actual_rows.get(key, {}).get("Balance", "0"))
+        if before != after:
+            label = (actual_rows.get(key) or expected_rows[key])["Label"]
+            print(f"Drift: {label}: snapshot {before}, report {after} (diff {after - before})", file=sys.stderr)
+            drift += 1
+    if drift:
+        print(f"Snapshot had drifted on {drift} row(s); replaced with the full report.", file=sys.stderr)
+    else:
+        print("Snapshot matches the full report.", file=sys.stderr)
+
+
+async def full_refresh(xero, tenant_id, report_date):
+    orgs = await xero.get_organisations(tenant_id)
+    org = orgs[0] if orgs else {}
+    financial_year_end = [int(org.get("FinancialYearEndMonth", 12)), int(org.get("FinancialYearEndDay", 31))]
+
+    # Retry if journals were posted while the report was being produced, so the offset matches the report exactly
+    for _ in range(3):
+        offset = await latest_journal_number(xero, tenant_id)
+        report = await xero.get_report_balance_sheet(tenant_id, report_date)
+        if not await xero.get_journals(tenant_id, offset=offset):
+            break
+    deferred = await deferred_lines(xero, tenant_id, report_date, offset)
+    return snapshot_from_report(report, report_date, offset, financial_year_end, deferred)
+
+
+async def roll_forward_balance_sheet(tenant_id_arg, tenant_index, target_date, full_refresh_days):
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        snapshot_path = tenant_cache_path(tenant_id, SNAPSHOT_FILE)
+        snapshot = read_json(snapshot_path)
+        if snapshot and snapshot.get("version") != SNAPSHOT_VERSION:
+            snapshot = None
+
+        usable = (
+            snapshot is not None
+            and snapshot["date"] <= target_date.isoformat()
+            and not crosses_year_end(
+                date.fromisoformat(snapshot["date"]), target_date, tuple(snapshot["financial_year_end"])
+            )
+        )
+        movements = {}
+        if usable:
+            lines, offset = await journal_lines_since(xero, tenant_id, snapshot["journal_offset"])
+            print(f"Rolling forward {snapshot['date']} -> {target_date} with {len(lines)} line(s)", file=sys.stderr)
+            movements = roll_forward(snapshot, lines, target_date)
+            snapshot["journal_offset"] = offset
+
+        if not usable or age_seconds(snapshot["refreshed_at"]) >= full_refresh_days * 86400:
+            print(f"Fetching full Balance Sheet as of {target_date}...", file=sys.stderr)
+            fresh = await full_refresh(xero, tenant_id, target_date)
+            if usable:
+                report_drift(snapshot, fresh)
+            snapshot, movements = fresh, {}
+
+    write_json(snapshot_path, snapshot)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Section", "Account", "AccountID", target_date.isoformat(), "Movement"])
+    for row in snapshot["rows"]:
+        writer.writerow(
+            [row["Section"], row["Label"], row.get("AccountID") or "", row["Balance"], movements.get(row["Key"], "")]
+        )
+
+
+def print_report(r):
+    print(f"\nReport: {r['ReportName']}")
+    print(f"Title: {r['ReportTitles'][0] if r['ReportTitles'] else ''}")
+    print(f"Date: {r['ReportDate']}")
+    print("-" * 60)
+
+    if not r["Rows"]:
+        print("No rows returned in the report.")
+    else:
+        print(f"Found {len(r['Rows'])} rows.")
+
+    for row in r["Rows"]:
+        row_type = row["RowType"]
+        cells = [c.get("Value") for c in row.get("Cells") or []]
+
+        if row_type == "Header":
+            # Print headers
+            print(f"{' | '.join(cells)}")
+            print("-" * 60)
+        elif row_type == "Section":
+            print(f"\n--- {row.get('Title')} ---")
+            for section_row in row.get("Rows") or []:
+                cells = [c.get("Value") for c in section_row.get("Cells") or []]
+                # Format: Description ........... Value
+                if len(cells) >= 2:
+                    print(f"{cells[0]:<40} {cells[1]:>15}")
+        elif row_type == "Row":
+            if len(cells) >= 2:
+                print(f"{cells[0]:<40} {cells[1]:>15}")
+        elif row_type == "SummaryRow":
+            if len(cells) >= 2:
+                print("-" * 60)
+                print(f"{cells[0]:<40} {cells[1]:>15}")
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Generate Xero Balance Sheet Report")
     # Default to end of current year if not specified
     current_year = date.today().year
     default_date = f"{current_year}-12-31"
     parser.add_argument(
         "--date",
-        help=f"Report date (YYYY-MM-DD) (default: {default_date})",
-        default=default_date,
+        help=f"Report date (YYYY-MM-DD) (default: {default_date}, or today with --roll-forward)",
+    )
+    parser.add_argument("--dates", help="Comma-separated report dates (YYYY-MM-DD); prints one CSV matrix")
+    parser.add_argument("--every", choices=EVERY_CHOICES, help="Report at every period end between --from and --to")
+    parser.add_argument("--from", dest="from_date", help="First date of the --every range (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", help="Last date of the --every range (YYYY-MM-DD)")
+    parser.add_argument(
+        "--roll-forward",
+        action="store_true",
+        help="Roll the saved snapshot forward with journals posted since (default date: today)",
+    )
+    parser.add_argument(
+        "--full-refresh-days",
+        type=int,
+        default=7,
+        help="With --roll-forward, re-fetch the full report when the snapshot is older than this (default: 7)",
+    )
+    parser.add_argument(
+        "--no-precomputed",
+        action="store_true",
+        help="Always fetch reports, even if xero_scheduler.py has precomputed them",
     )
     parser.add_argument("--tenant-id", help="Tenant ID to use (defaults to the first connection)")
     parser.add_argument(
@@ -102,32 +400,41 @@ def main():
         type=int,
         help="1-based index of the tenant connection to use (see xero_tenant_manager.py view)",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    if args.roll_forward:
+        try:
+            target_date = parse_date(args.date) if args.date else date.today()
+        except ValueError:
+            print("Error: Date must be in YYYY-MM-DD format")
+            sys.exit(1)
+        run(roll_forward_balance_sheet(args.tenant_id, args.tenant_index, target_date, args.full_refresh_days))
+        return
+
+    if args.dates or args.every:
+        if args.every and not (args.from_date and args.to_date):
+            parser.error("--every requires --from and --to")
+        try:
+            if args.dates:
+                report_dates = sorted({parse_date(d.strip()) for d in args.dates.split(",") if d.strip()})
+            else:
+                report_dates = period_ends(parse_date(args.from_date), parse_date(args.to_date), args.every)
+        except ValueError:
+            print("Error: Dates must be in YYYY-MM-DD format")
+            sys.exit(1)
+        if not report_dates:
+            print("Error: No report dates in the given range")
+            sys.exit(1)
+        run(fetch_balance_sheet_series(args.tenant_id, args.tenant_index, report_dates, not args.no_precomputed))
+        return
 
     try:
-        report_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+        report_date = parse_date(args.date or default_date)
     except ValueError:
         print("Error: Date must be in YYYY-MM-DD format")
         sys.exit(1)
 
-    config = load_config()
-    token_data = load_token()
-
-    if not token_data:
-        return
-
-    # Create the token object first
-    oauth2_token = OAuth2Token(client_id=config["CLIENT_ID"], client_secret=config["CLIENT_SECRET"])
-    oauth2_token.update_token(**token_data)
-
-    api_client = ApiClient(
-        Configuration(debug=False, oauth2_token=oauth2_token),
-        pool_threads=1,
-    )
-
-    @api_client.oauth2_token_getter
-    def obtain_xero_oauth2_token():
-        return token_data
+    api_client = sdk_client()
 
     tenant_id = resolve_tenant(api_client, args.tenant_id, args.tenant_index)
 
@@ -141,6 +448,13 @@ def main():
             print(f"Base Currency: {org.base_currency}", file=sys.stderr)
             break
 
+    precomputed = None if args.no_precomputed else load_report(tenant_id, "balance_sheet", (report_date,))
+    if precomputed:
+        report, fetched_at = precomputed
+        print(f"Using Balance Sheet as of {report_date} precomputed at {fetched_at}", file=sys.stderr)
+        print_report(report)
+        return
+
     print(f"Fetching Balance Sheet as of {report_date}...")
 
     try:
@@ -150,42 +464,7 @@ def main():
         # We need to traverse it to print nicely
 
         if report.reports:
-            r = report.reports[0]
-            print(f"\nReport: {r.report_name}")
-            print(f"Title: {r.report_titles[0] if r.report_titles else ''}")
-            print(f"Date: {r.report_date}")
-            print("-" * 60)
-
-            if not r.rows:
-                print("No rows returned in the report.")
-            else:
-                print(f"Found {len(r.rows)} rows.")
-
-            for row in r.rows:
-                row_type_str = str(row.row_type)
-
-                if row_type_str == "RowType.HEADER":
-                    # Print headers
-                    cells = [c.value for c in row.cells]
-                    print(f"{' | '.join(cells)}")
-                    print("-" * 60)
-                elif row_type_str == "RowType.SECTION":
-                    print(f"\n--- {row.title} ---")
-                    if row.rows:
-                        for section_row in row.rows:
-                            cells = [c.value for c in section_row.cells]
-                            # Format: Description ........... Value
-                            if len(cells) >= 2:
-                                print(f"{cells[0]:<40} {cells[1]:>15}")
-                elif row_type_str == "RowType.ROW":
-                    cells = [c.value for c in row.cells]
-                    if len(cells) >= 2:
-                        print(f"{cells[0]:<40} {cells[1]:>15}")
-                elif row_type_str == "RowType.SUMMARYROW":
-                    cells = [c.value for c in row.cells]
-                    if len(cells) >= 2:
-                        print("-" * 60)
-                        print(f"{cells[0]:<40} {cells[1]:>15}")
+            print_report(report_from_sdk(report.reports[0]))
 
     except Exception as e:
         print(f"Error fetching report: {e}")
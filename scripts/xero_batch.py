@@ -0,0 +1,250 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "httpx",
+#     "PyYAML",
+#     "xero-python",
+# ]
+# ///
+"""
+Xero Batch Runner
+
+Runs a runbook of script commands in one process. The SDK session (config, token refresh, tenant connections), the
+asyncio client with its keep-alive connections and rate limiters, and the local caches are set up once and shared
+by every step, and independent steps run concurrently, so a month-end runbook takes about as long as its API calls.
+
+Each line of the command file (or stdin) is one step: a script name followed by its usual arguments, with shell
+quoting. Blank lines and lines starting with # are ignored, and `> file` or `>> file` at the end of a line sends
+that step's output to a file. Script names are the file names (with or without ./ and .py) or these short names:
+
+    journal         xero_journal_manager.py
+    coa             xero_coa_manager.py
+    pnl             xero_pnl_report.py
+    balance-sheet   xero_balance_sheet_report.py
+    trial-balance   xero_trial_balance_report.py
+    reconcile       xero_reconcile.py
+    tenant          xero_tenant_manager.py
+    snapshot        xero_snapshot_manager.py
+    sync            xero_sync_manager.py
+
+Steps that only read run concurrently (up to --jobs at a time). Steps that write to Xero (journal edit, post and
+create; coa add, import and apply; unless given --dry-run) are barriers: they start once every earlier step has
+finished, and later steps wait for them. Each step's output is collected separately and printed in runbook order.
+Once a step has failed no further steps are started (in particular no later write), unless --keep-going is given.
+
+Usage:
+    ./xero_batch.py month_end.txt
+    ./xero_batch.py - < month_end.txt
+
+Example runbook:
+    # Reports and checks, fetched concurrently
+    pnl --start-date 2025-06-01 --end-date 2025-06-30 > pnl_june.csv
+    balance-sheet --every month --from 2025-01-01 --to 2025-06-30 > net_assets.csv
+    journal view "Status == 'DRAFT'" > drafts.csv
+    # Reclassify, then post (each waits for everything above it)
+    journal edit --journal-ids-file reclass.txt --find-account 265 --new-account 810
+    journal post --journal-ids-file reclass.txt
+    journal summarize --by AccountCode,Month "Status == 'POSTED'" > summary.csv
+
+Requirements:
+    - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET)
+    - .xero_token.json (generated by xero_connect.py)
+"""
+import argparse
+import concurrent.futures
+import contextvars
+import importlib
+import io
+import shlex
+import sys
+import time
+import traceback
+
+from xero_async_client import start_shared_session, stop_shared_session
+
+SCRIPTS = {
+    "journal": "xero_journal_manager",
+    "coa": "xero_coa_manager",
+    "pnl": "xero_pnl_report",
+    "balance-sheet": "xero_balance_sheet_report",
+    "trial-balance": "xero_trial_balance_report",
+    "reconcile": "xero_reconcile",
+    "tenant": "xero_tenant_manager",
+    "snapshot": "xero_snapshot_manager",
+    "sync": "xero_sync_manager",
+}
+# Subcommands that change data in Xero; they run alone, after every earlier step
+WRITE_COMMANDS = {
+    "xero_journal_manager": {"edit", "post", "create"},
+    "xero_coa_manager": {"add", "import", "apply"},
+}
+
+# Output buffers of the step running in the current thread (or task); unset outside steps
+_step_output = contextvars.ContextVar("step_output", default=None)
+
+
+class StepOutput(io.TextIOBase):
+    """Stands in for sys.stdout/sys.stderr and sends each step's writes to that step's own buffer."""
+
+    def __init__(self, stream, index):
+        self.stream = stream
+        self.index = index
+
+    def _target(self):
+        buffers = _step_output.get()
+        return buffers[self.index] if buffers else self.stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def writable(self):
+        return True
+
+
+class Step:
+    def __init__(self, line_number, line):
+        self.line_number = line_number
+        self.line = line
+        words = shlex.split(line)
+        self.output_file = self.append = None
+        if len(words) >= 2 and words[-2] in (">", ">>"):
+            self.output_file, self.append = words[-1], words[-2] == ">>"
+            words = words[:-2]
+        if not words:
+            raise ValueError("no command")
+
+        name = words[0].removeprefix("./").removesuffix(".py")
+        self.module = SCRIPTS.get(name, name)
+        if self.module not in SCRIPTS.values():
+            raise ValueError(f"unknown script '{words[0]}' (use one of {', '.join(SCRIPTS)})")
+        self.argv = words[1:]
+        if self.module == "xero_journal_manager" and "--follow" in self.argv:
+            raise ValueError("view --follow runs until interrupted and cannot be part of a batch")
+        subcommand = next((word for word in self.argv if word in WRITE_COMMANDS.get(self.module, ())), None)
+        self.writes = subcommand is not None and "--dry-run" not in self.argv
+
+        self.stdout = io.StringIO()
+        self.stderr = io.StringIO()
+        self.status = None
+        self.seconds = 0.0
+
+
+def read_steps(lines):
+    steps = []
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            steps.append(Step(line_number, line))
+        except ValueError as e:
+            raise ValueError(f"line {line_number}: {e}") from None
+    return steps
+
+
+def run_step(step):
+    """Run one step's main() with its output captured; returns True on success."""
+    _step_output.set((step.stdout, step.stderr))
+    started = time.monotonic()
+    try:
+        importlib.import_module(step.module).main(step.argv)
+        step.status = 0
+    except SystemExit as e:
+        step.status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if isinstance(e.code, str):
+            step.stderr.write(f"{e.code}\n")
+    except Exception:
+        step.status = 1
+        step.stderr.write(traceback.format_exc())
+    finally:
+        step.seconds = time.monotonic() - started
+        _step_output.set(None)
+    return step.status == 0
+
+
+def emit(step, stdout, stderr):
+    stderr.write(step.stderr.getvalue())
+    if step.output_file:
+        with open(step.output_file, "a" if step.append else "w", newline="") as f:
+            f.write(step.stdout.getvalue())
+    else:
+        stdout.write(step.stdout.getvalue())
+    result = "ok" if step.status == 0 else f"failed (exit {step.status})"
+    print(f"[{step.line_number}] {step.line} -- {result} in {step.seconds:.1f}s", file=stderr)
+    stdout.flush()
+
+
+def run_batch(steps, jobs, keep_going):
+    """Run the steps (reads concurrently, writes as barriers) and print their output in order; returns failures."""
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StepOutput(stdout, 0), StepOutput(stderr, 1)
+    # Import the scripts up front, from this thread, so steps never import concurrently
+    for module in {step.module for step in steps}:
+        importlib.import_module(module)
+    start_shared_session()
+
+    failed = []
+    pending = []
+
+    def drain():
+        # Wait for the submitted steps in runbook order, printing each as it completes
+        while pending:
+            step, future = pending.pop(0)
+            if not future.result():
+                failed.append(step)
+            emit(step, stdout, stderr)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            for step in steps:
+                if step.writes:
+                    drain()
+                failed_so_far = failed or any(future.done() and not future.result() for _, future in pending)
+                if failed_so_far and not keep_going:
+                    break
+                pending.append((step, executor.submit(run_step, step)))
+                if step.writes:
+                    drain()
+            drain()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+        stop_shared_session()
+
+    skipped = len(steps) - sum(1 for step in steps if step.status is not None)
+    if skipped:
+        print(f"Skipped {skipped} step(s) after the failure.", file=sys.stderr)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a runbook of Xero script commands in one process")
+    parser.add_argument("file", help="Command file, one step per line ('-' reads stdin)")
+    parser.add_argument("--jobs", type=int, default=4, help="Maximum number of steps running at once (default: 4)")
+    parser.add_argument("--keep-going", action="store_true", help="Keep starting steps after one fails")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.file == "-":
+            steps = read_steps(sys.stdin)
+        else:
+            with open(args.file, "r") as f:
+                steps = read_steps(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    failed = run_batch(steps, max(1, args.jobs), args.keep_going)
+    if failed:
+        print(
+            f"{len(failed)} step(s) failed: lines {', '.join(str(step.line_number) for step in failed)}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
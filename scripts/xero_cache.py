@@ -0,0 +1,65 @@
+"""
+Xero Local Cache
+
+Per-tenant directory for the local state the scripts keep between runs (report snapshots, cached charts of accounts,
+synced data). Everything lives under .xero_cache/<tenant_id>/ next to xero_config.yaml.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+CACHE_DIR = ".xero_cache"
+
+# Cached API listings shared between scripts
+ACCOUNTS_FILE = "accounts.json"
+ORGANISATION_FILE = "organisation.json"
+TAX_RATES_FILE = "tax_rates.json"
+
+
+def tenant_cache_path(tenant_id, name):
+    """Path of a file in the tenant's cache directory, creating the directory if needed."""
+    directory = os.path.join(CACHE_DIR, tenant_id)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+def read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    """Write atomically so an interrupted run never leaves a truncated cache file behind."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def age_seconds(timestamp):
+    """Seconds since an ISO 8601 timestamp written by utc_now().isoformat(); infinite if missing."""
+    if not timestamp:
+        return float("inf")
+    return (utc_now() - datetime.fromisoformat(timestamp)).total_seconds()
+
+
+async def cached_fetch(tenant_id, name, max_age, fetch):
+    """
+    Return data cached in the tenant's directory if younger than max_age seconds, otherwise await fetch() and cache it.
+
+    max_age=None always fetches (and refreshes the cache).
+    """
+    path = tenant_cache_path(tenant_id, name)
+    cached = read_json(path)
+    if cached and max_age is not None and age_seconds(cached.get("fetched_at")) < max_age:
+        return cached["data"]
+    data = await fetch()
+    write_json(path, {"fetched_at": utc_now().isoformat(), "data": data})
+    return data
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+#     "httpx",
 #     "PyYAML",
 #     "xero-python",
 # ]
@@ -17,6 +18,9 @@ Usage:
 Commands:
     view    List all accounts in CSV format. Supports optional filtering query.
     add     Add a new account.
+    import  Create (or update) many accounts from a CSV or YAML file.
+    plan    Compare a desired chart of accounts with one or all tenants and list the changes.
+    apply   Make one or all tenants match a desired chart of accounts.
 
 Examples:
     # View all accounts
@@ -28,6 +32,9 @@ Examples:
     # View accounts filtered by Type
     ./xero_coa_manager.py view "Type == 'CURRLIAB'"
 
+    # First 10 active accounts by name
+    ./xero_coa_manager.py view "Status == 'ACTIVE'" --sort Name --limit 10
+
     # Add a new liability account
     ./xero_coa_manager.py add --code 810 --name "Crypto Loan Principal" \
         --type CURRLIAB --description "Liability account for tracking crypto loan principal balances" --tax-type NONE
@@ -35,78 +42,58 @@ Examples:
     # Add a new expense account
     ./xero_coa_manager.py add --code 450 --name "Consulting Fees" --type EXPENSE
 
+    # Import a chart-of-accounts template (columns: Code, Name, Type, Description, TaxType, BankAccountNumber)
+    ./xero_coa_manager.py import accounts.csv
+
+    # Validate the template against the enum and the existing chart without writing anything
+    ./xero_coa_manager.py import accounts.yaml --dry-run
+
+    # Update accounts whose code already exists instead of skipping them
+    ./xero_coa_manager.py import accounts.csv --on-duplicate update
+
+    # Show what it would take to bring every connected org in line with the canonical chart
+    ./xero_coa_manager.py plan canonical_chart.yaml --all-tenants
+
+    # Apply it
+    ./xero_coa_manager.py apply canonical_chart.yaml --all-tenants
+
+Desired-state file (YAML; a CSV with the import columns plus Status also works):
+    archive_unlisted: false   # true archives active, non-system accounts missing from the list
+    accounts:
+      - code: "810"
+        name: Crypto Loan Principal
+        type: CURRLIAB
+        tax_type: NONE
+      - code: "265"
+        name: Old Suspense
+        type: CURRLIAB
+        status: ARCHIVED
+
 Requirements:
     - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET)
     - .xero_token.json (generated by xero_connect.py)
 """
 import argparse
+import asyncio
 import csv
 import sys
 import os
-import json
-import yaml
 import signal
-from xero_python.api_client import ApiClient
-from xero_python.api_client.configuration import Configuration
-from xero_python.api_client.oauth2 import OAuth2Token
-from xero_python.identity import IdentityApi
+import yaml
 from xero_python.accounting import AccountingApi, Account, AccountType
+from xero_session import sdk_client, sdk_connections
+from xero_oplog import OperationLog, default_oplog_file
+from xero_async_client import XeroApiError, XeroAsyncClient, resolve_tenant as resolve_connection, run
+from xero_cache import ACCOUNTS_FILE, cached_fetch, tenant_cache_path
+from xero_listing import add_listing_arguments, api_order, select_rows
+from xero_precomputed import drop_reports
 
 # Handle broken pipe when piping output
 signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
 
-def load_config(config_file="xero_config.yaml"):
-    if not os.path.exists(config_file):
-        print(f"Config file {config_file} not found.")
-        sys.exit(1)
-    with open(config_file, "r") as f:
-        return yaml.safe_load(f)
-
-
-def load_token(token_file=".xero_token.json"):
-    if not os.path.exists(token_file):
-        print("Token file not found. Please run xero_connect.py first.")
-        sys.exit(1)
-    with open(token_file, "r") as f:
-        return json.load(f)
-
-
-def get_api_client():
-    config = load_config()
-    token_data = load_token()
-
-    oauth2_token = OAuth2Token(client_id=config["CLIENT_ID"], client_secret=config["CLIENT_SECRET"])
-    oauth2_token.update_token(**token_data)
-
-    api_client = ApiClient(
-        Configuration(debug=False, oauth2_token=oauth2_token),
-        pool_threads=1,
-    )
-
-    @api_client.oauth2_token_getter
-    def obtain_xero_oauth2_token():
-        return token_data
-
-    @api_client.oauth2_token_saver
-    def store_xero_oauth2_token(token):
-        nonlocal token_data
-        token_data = token
-        with open(".xero_token.json", "w") as f:
-            json.dump(token, f, indent=4)
-
-    # Refresh token
-    try:
-        api_client.refresh_oauth2_token()
-    except Exception as e:
-        print(f"Warning: Token refresh failed: {e}")
-
-    return api_client
-
-
 def get_tenant_id(api_client, tenant_id_arg=None, tenant_index=None):
-    identity_api = IdentityApi(api_client)
-    connections = identity_api.get_connections()
+    connections = sdk_connections(api_client)
     if not connections:
         print("No Xero connections found.", file=sys.stderr)
         sys.exit(1)
@@ -142,57 +129,59 @@ def get_tenant_id(api_client, tenant_id_arg=None, tenant_index=None):
     return chosen.tenant_id
 
 
-def list_accounts(api_client, tenant_id, query=None):
+ACCOUNT_COLUMNS = ["Code", "Name", "Type", "TaxType", "Description", "Status", "AccountID"]
+
+
+def list_accounts(api_client, tenant_id, query=None, limit=None, sort=None):
     accounting_api = AccountingApi(api_client)
     try:
-        accounts = accounting_api.get_accounts(tenant_id)
+        # Sort by Code for better readability; the API does the ordering (every column is an Account field)
+        order = api_order(sort or ("Code", False), {column: column for column in ACCOUNT_COLUMNS})
+        accounts = accounting_api.get_accounts(tenant_id, order=order)
 
         writer = csv.writer(sys.stdout)
-        writer.writerow(["Code", "Name", "Type", "TaxType", "Description", "Status", "AccountID"])
-
-        # Sort by Code for better readability
-        sorted_accounts = sorted(accounts.accounts, key=lambda x: x.code if x.code else "")
-
-        for account in sorted_accounts:
-            row_data = {
-                "Code": account.code,
-                "Name": account.name,
-                "Type": str(account.type),
-                "TaxType": account.tax_type,
-                "Description": account.description,
-                "Status": account.status,
-                "AccountID": account.account_id,
-            }
-
-            if query:
-                try:
-                    # Evaluate the query against the row data
-                    if not eval(query, {}, row_data):
+        writer.writerow(ACCOUNT_COLUMNS)
+
+        def rows():
+            for account in accounts.accounts:
+                row_data = {
+                    "Code": account.code,
+                    "Name": account.name,
+                    "Type": str(account.type),
+                    "TaxType": account.tax_type,
+                    "Description": account.description,
+                    "Status": account.status,
+                    "AccountID": account.account_id,
+                }
+
+                if query:
+                    try:
+                        # Evaluate the query against the row data
+                        if not eval(query, {}, row_data):
+                            continue
+                    except Exception as e:
+                        print(
+                            f"Error evaluating query '{query}' for row: {e}",
+                            file=sys.stderr,
+                        )
                         continue
-                except Exception as e:
-                    print(
-                        f"Error evaluating query '{query}' for row: {e}",
-                        file=sys.stderr,
-                    )
-                    continue
-
-            writer.writerow(
-                [
-                    row_data["Code"],
-                    row_data["Name"],
-                    row_data["Type"],
-                    row_data["TaxType"],
-                    row_data["Description"],
-                    row_data["Status"],
-                    row_data["AccountID"],
-                ]
-            )
+
+                yield row_data
+
+        for row_data in select_rows(rows(), limit):
+            writer.writerow([row_data[column] for column in ACCOUNT_COLUMNS])
     except Exception as e:
         print(f"Error fetching accounts: {e}", file=sys.stderr)
         sys.exit(1)
 
 
-def add_account(api_client, tenant_id, code, name, account_type, description=None, tax_type=None):
+def find_account_by_code(api_client, tenant_id, code):
+    accounting_api = AccountingApi(api_client)
+    accounts = accounting_api.get_accounts(tenant_id, where=f'Code=="{code}"')
+    return accounts.accounts[0] if accounts.accounts else None
+
+
+def add_account(api_client, tenant_id, code, name, account_type, description=None, tax_type=None, oplog=None):
     accounting_api = AccountingApi(api_client)
 
     try:
@@ -224,15 +213,362 @@ def add_account(api_client, tenant_id, code, name, account_type, description=Non
         tax_type=tax_type,
     )
 
+    key = None
+    if oplog:
+        params = {"name": name, "type": account_type.name, "description": description, "tax_type": tax_type}
+        key = oplog.plan(tenant_id, "add_account", code, params)
+        if oplog.is_done(key):
+            print(f"Account {code} was already created in a previous run. Skipping.")
+            return
+        if oplog.is_uncertain(key):
+            # The previous run sent the request but stopped before recording the outcome
+            existing = find_account_by_code(api_client, tenant_id, code)
+            if existing:
+                oplog.done(key, {"account_id": existing.account_id})
+                print(f"Account {code} already exists: {existing.name}. Skipping.")
+                return
+        request_key = oplog.request_key(key)
+        oplog.started(key)
+
     try:
-        result = accounting_api.create_account(tenant_id, new_account)
+        result = accounting_api.create_account(
+            tenant_id,
+            new_account,
+            **({"idempotency_key": request_key} if key else {}),
+        )
         print(f"Account created successfully: {result.accounts[0].name} ({result.accounts[0].code})")
     except Exception as e:
+        if key:
+            oplog.failed(key, str(e))
         print(f"Error creating account: {e}", file=sys.stderr)
         sys.exit(1)
+    drop_reports(tenant_id)
+
+    if key:
+        oplog.done(key, {"account_id": result.accounts[0].account_id})
+
+
+IMPORT_FIELDS = {
+    "code": "Code",
+    "name": "Name",
+    "type": "Type",
+    "description": "Description",
+    "taxtype": "TaxType",
+    "tax_type": "TaxType",
+    "bankaccountnumber": "BankAccountNumber",
+    "bank_account_number": "BankAccountNumber",
+    "status": "Status",
+}
+UPDATABLE_FIELDS = ("Name", "Description", "TaxType")
+
+
+def read_account_rows(path):
+    """Rows of a CSV (header row required) or YAML (list of mappings) file, with keys normalised to Xero names."""
+    with open(path, "r", newline="") as f:
+        if path.endswith((".yaml", ".yml")):
+            data = yaml.safe_load(f) or []
+            if isinstance(data, dict):
+                data = data.get("accounts", [])
+        else:
+            data = list(csv.DictReader(f))
+
+    rows = []
+    for item in data:
+        row = {}
+        for key, value in (item or {}).items():
+            field = IMPORT_FIELDS.get(str(key).strip().lower())
+            if field and value not in (None, ""):
+                row[field] = str(value).strip()
+        # Accept the Type column exactly as `view` prints it (e.g. "AccountType.BANK")
+        if "Type" in row:
+            row["Type"] = row["Type"].removeprefix("AccountType.").upper()
+        rows.append(row)
+    return rows
+
+
+def validate_account_rows(rows, existing_accounts):
+    """
+    Check every row locally before anything is sent.
+
+    Returns a list of (row, problem) where problem is None for valid rows. Checks the AccountType enum, Xero's
+    field lengths, duplicate codes within the file, bank account numbers, and name clashes with other accounts
+    (existing or earlier in the file).
+    """
+    valid_types = {e.name for e in AccountType}
+    names_by_code = {a.get("Code"): a.get("Name", "").lower() for a in existing_accounts if a.get("Code")}
+    # Accounts without a code (e.g. some bank accounts) still own their name; "" stands for no code
+    codes_by_name = {a.get("Name", "").lower(): a.get("Code") or "" for a in existing_accounts}
+    seen_codes = set()
+    results = []
+    for row in rows:
+        code = row.get("Code", "")
+        problem = None
+        if not code or not row.get("Name") or not row.get("Type"):
+            problem = "Code, Name and Type are required"
+        elif len(code) > 10:
+            problem = "Code is longer than 10 characters"
+        elif len(row["Name"]) > 150:
+            problem = "Name is longer than 150 characters"
+        elif row["Type"] not in valid_types:
+            problem = f"Invalid Account Type '{row['Type']}'"
+        elif row["Type"] == "BANK" and code not in names_by_code and not row.get("BankAccountNumber"):
+            problem = "BankAccountNumber is required for BANK accounts"
+        elif code in seen_codes:
+            problem = f"Code {code} appears more than once in the file"
+        elif codes_by_name.get(row["Name"].lower(), code) != code:
+            owner = codes_by_name[row["Name"].lower()]
+            owner = f"account {owner}" if owner else "an account without a code"
+            problem = f"Name '{row['Name']}' is already used by {owner}"
+        seen_codes.add(code)
+        if not problem:
+            codes_by_name.setdefault(row["Name"].lower(), code)
+        results.append((row, problem))
+    return results
+
+
+async def write_account(xero, oplog, tenant_id, action, account, account_id=None):
+    """
+    Create or update one account through the operation log. Returns (status, error message or None).
+
+    Only refusals (HTTP status below 500) are recorded as failed. After a 5xx or no answer the outcome is unknown, so
+    the operation stays started and --resume looks the account up by Code before creating it again.
+    """
+    key = oplog.plan(tenant_id, f"{action}_account", account["Code"], account)
+    if oplog.is_done(key):
+        return "skipped", "completed in a previous run"
+    if action == "create" and oplog.is_uncertain(key):
+        # The previous run sent the request but never learnt whether the account was created
+        existing = await xero.get_accounts(tenant_id, where=f'Code=="{account["Code"]}"', fresh=True)
+        if existing:
+            oplog.done(key, {"account_id": existing[0].get("AccountID")})
+            return "skipped", "created by a previous run"
+    request_key = oplog.request_key(key)
+    oplog.started(key)
+    try:
+        if action == "create":
+            result = await xero.create_account(tenant_id, account, idempotency_key=request_key)
+        else:
+            result = await xero.update_account(tenant_id, account_id, account, idempotency_key=request_key)
+    except XeroApiError as e:
+        if e.status < 500:
+            oplog.failed(key, str(e))
+            return "error", str(e)
+        return "error", f"outcome unknown ({e}); re-run with --resume"
+    except Exception as e:
+        return "error", f"outcome unknown ({e}); re-run with --resume"
+    drop_reports(tenant_id)
+    oplog.done(key, {"account_id": result.get("AccountID")})
+    return "ok", None
+
+
+async def import_accounts(tenant_id_arg, tenant_index, path, on_duplicate, dry_run, oplog_file, resume):
+    rows = read_account_rows(path)
+
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        accounts = await xero.get_accounts(tenant_id)
+        existing = {a["Code"]: a for a in accounts if a.get("Code")}
+
+        plan = []
+        for row, problem in validate_account_rows(rows, accounts):
+            current = existing.get(row.get("Code"))
+            if problem:
+                plan.append((row, "invalid", problem))
+            elif not current:
+                plan.append((row, "create", ""))
+            elif on_duplicate == "update":
+                changes = [f for f in UPDATABLE_FIELDS if row.get(f) and row[f] != current.get(f)]
+                if current.get("Type") != row["Type"]:
+                    plan.append((row, "invalid", f"Code exists with Type {current.get('Type')}; cannot change Type"))
+                elif changes:
+                    plan.append((row, "update", "changes " + ", ".join(changes)))
+                else:
+                    plan.append((row, "skip", "already up to date"))
+            else:
+                plan.append((row, "skip", "code already exists"))
+
+        results = [None] * len(plan)
+        if dry_run:
+            for i, (row, action, message) in enumerate(plan):
+                results[i] = (action, "error" if action == "invalid" else "dry-run", message)
+        else:
+            with OperationLog(oplog_file, resume=resume) as oplog:
+
+                async def apply(i, row, action, message):
+                    if action in ("invalid", "skip"):
+                        results[i] = (action, "error" if action == "invalid" else "skipped", message)
+                        return
+                    account = {field: row[field] for field in ("Code", *UPDATABLE_FIELDS) if row.get(field)}
+                    if action == "create":
+                        account["Type"] = row["Type"]
+                        if row.get("BankAccountNumber"):
+                            account["BankAccountNumber"] = row["BankAccountNumber"]
+                    account_id = existing[row["Code"]]["AccountID"] if action == "update" else None
+                    status, error = await write_account(xero, oplog, tenant_id, action, account, account_id)
+                    results[i] = (action, status, error or message)
+
+                # Requests are throttled per tenant by the client, so every row can be scheduled at once
+                await asyncio.gather(*(apply(i, *item) for i, item in enumerate(plan)))
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Row", "Code", "Name", "Action", "Status", "Message"])
+    for n, ((row, _, _), (action, status, message)) in enumerate(zip(plan, results), start=1):
+        writer.writerow([n, row.get("Code", ""), row.get("Name", ""), action, status, message])
+
+    failed = sum(1 for _, status, _ in results if status == "error")
+    print(f"{len(plan)} row(s) processed, {failed} with errors.", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+def load_desired_state(path):
+    """Desired accounts and the archive_unlisted option of a desired-state file."""
+    archive_unlisted = False
+    if path.endswith((".yaml", ".yml")):
+        with open(path, "r") as f:
+            data = yaml.safe_load(f)
+        if isinstance(data, dict):
+            archive_unlisted = bool(data.get("archive_unlisted", False))
+    return read_account_rows(path), archive_unlisted
+
+
+def diff_chart(desired_rows, current_accounts, archive_unlisted=False):
+    """
+    Changes needed to make a tenant's chart match the desired rows.
+
+    Returns a list of dicts with Code, Action (create, update, archive, invalid) and Changes, a mapping of
+    field -> (current, desired). Fields left blank in the desired state are not compared.
+    """
+    by_code = {a["Code"]: a for a in current_accounts if a.get("Code")}
+    changes = []
+    for row, problem in validate_account_rows(desired_rows, current_accounts):
+        code = row.get("Code", "")
+        account = by_code.get(code)
+        wants_archived = row.get("Status", "ACTIVE").upper() == "ARCHIVED"
+        if problem:
+            changes.append({"Code": code, "Action": "invalid", "Changes": {"Problem": ("", problem)}})
+        elif account is None:
+            if not wants_archived:
+                fields = ("Name", "Type", "Description", "TaxType", "BankAccountNumber")
+                changes.append(
+                    {"Code": code, "Action": "create", "Changes": {f: (None, row[f]) for f in fields if row.get(f)}}
+                )
+        elif account.get("Type") != row["Type"]:
+            problem = "Type cannot be changed through the API"
+            changes.append({"Code": code, "Action": "invalid", "Changes": {"Type": (account.get("Type"), problem)}})
+        else:
+            diff = {f: (account.get(f), row[f]) for f in UPDATABLE_FIELDS if row.get(f) and row[f] != account.get(f)}
+            if wants_archived != (account.get("Status") == "ARCHIVED"):
+                diff["Status"] = (account.get("Status"), "ARCHIVED" if wants_archived else "ACTIVE")
+            if diff:
+                action = "archive" if list(diff) == ["Status"] and wants_archived else "update"
+                changes.append({"Code": code, "Action": action, "Changes": diff, "AccountID": account["AccountID"]})
+
+    if archive_unlisted:
+        desired_codes = {row.get("Code") for row in desired_rows}
+        for code, account in by_code.items():
+            if code not in desired_codes and account.get("Status") == "ACTIVE" and not account.get("SystemAccount"):
+                changes.append(
+                    {
+                        "Code": code,
+                        "Action": "archive",
+                        "Changes": {"Status": ("ACTIVE", "ARCHIVED")},
+                        "AccountID": account["AccountID"],
+                    }
+                )
+    return changes
+
+
+async def get_chart(xero, tenant_id, max_age=None):
+    """A tenant's chart of accounts, served from .xero_cache when younger than max_age seconds."""
+    return await cached_fetch(tenant_id, ACCOUNTS_FILE, max_age, lambda: xero.get_accounts(tenant_id))
+
+
+def select_tenants(connections, all_tenants, tenant_id_arg=None, tenant_index=None):
+    """[(tenant_id, tenant_name)] for --all-tenants, else the single tenant chosen by --tenant-id/--tenant-index."""
+    if all_tenants:
+        return [(conn["tenantId"], conn.get("tenantName", "")) for conn in connections]
+    tenant_id = resolve_connection(connections, tenant_id_arg, tenant_index)
+    names = {conn["tenantId"]: conn.get("tenantName", "") for conn in connections}
+    return [(tenant_id, names.get(tenant_id, ""))]
+
+
+async def plan_tenants(xero, tenants, desired_rows, archive_unlisted, max_age):
+    """Diff every tenant's chart concurrently. Returns [(tenant_id, tenant_name, changes)]."""
+    charts = await asyncio.gather(*(get_chart(xero, tenant_id, max_age) for tenant_id, _ in tenants))
+    return [
+        (tenant_id, tenant_name, diff_chart(desired_rows, chart, archive_unlisted))
+        for (tenant_id, tenant_name), chart in zip(tenants, charts)
+    ]
+
+
+async def plan_chart(tenant_id_arg, tenant_index, path, all_tenants, max_age):
+    desired_rows, archive_unlisted = load_desired_state(path)
+    async with XeroAsyncClient.from_files() as xero:
+        tenants = select_tenants(await xero.get_connections(), all_tenants, tenant_id_arg, tenant_index)
+        plans = await plan_tenants(xero, tenants, desired_rows, archive_unlisted, max_age)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Tenant", "TenantId", "Code", "Action", "Field", "Current", "Desired"])
+    for tenant_id, tenant_name, changes in plans:
+        for change in changes:
+            for field, (current, desired) in change["Changes"].items():
+                writer.writerow(
+                    [tenant_name, tenant_id, change["Code"], change["Action"], field, current or "", desired]
+                )
+        counts = {}
+        for change in changes:
+            counts[change["Action"]] = counts.get(change["Action"], 0) + 1
+        summary = ", ".join(f"{action}: {n}" for action, n in counts.items()) or "no changes"
+        print(f"{tenant_name} ({tenant_id}): {summary}", file=sys.stderr)
+
+
+async def apply_chart(tenant_id_arg, tenant_index, path, all_tenants, oplog_file, resume):
+    desired_rows, archive_unlisted = load_desired_state(path)
+    results = []
+    async with XeroAsyncClient.from_files() as xero:
+        tenants = select_tenants(await xero.get_connections(), all_tenants, tenant_id_arg, tenant_index)
+        # Always diff against freshly fetched charts before writing
+        plans = await plan_tenants(xero, tenants, desired_rows, archive_unlisted, max_age=None)
+
+        with OperationLog(oplog_file, resume=resume) as oplog:
+
+            async def apply(tenant_id, tenant_name, change):
+                if change["Action"] == "invalid":
+                    message = "; ".join(str(desired) for _, desired in change["Changes"].values())
+                    results.append((tenant_name, tenant_id, change["Code"], "invalid", "error", message))
+                    return
+                account = {"Code": change["Code"], **{f: desired for f, (_, desired) in change["Changes"].items()}}
+                action = "create" if change["Action"] == "create" else "update"
+                status, error = await write_account(xero, oplog, tenant_id, action, account, change.get("AccountID"))
+                results.append((tenant_name, tenant_id, change["Code"], change["Action"], status, error or ""))
+
+            await asyncio.gather(
+                *(
+                    apply(tenant_id, tenant_name, change)
+                    for tenant_id, tenant_name, changes in plans
+                    for change in changes
+                )
+            )
+
+    for tenant_id, _, changes in plans:
+        if changes:
+            # The cached chart no longer reflects the tenant
+            cache_file = tenant_cache_path(tenant_id, ACCOUNTS_FILE)
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
 
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Tenant", "TenantId", "Code", "Action", "Status", "Message"])
+    writer.writerows(sorted(results))
 
-def main():
+    failed = sum(1 for result in results if result[4] == "error")
+    print(f"{len(results)} change(s) across {len(plans)} tenant(s), {failed} with errors.", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Manage Xero Chart of Accounts")
     parser.add_argument("--tenant-id", help="Tenant ID to use (defaults to the first connection)")
     parser.add_argument(
@@ -245,6 +581,7 @@ def main():
     # View command
     view_parser = subparsers.add_parser("view", help="List all accounts in CSV format")
     view_parser.add_argument("query", nargs="?", help="Filter query (e.g. \"Code == '810'\")")
+    add_listing_arguments(view_parser, ACCOUNT_COLUMNS)
 
     # Add command
     add_parser = subparsers.add_parser("add", help="Add a new account")
@@ -257,25 +594,105 @@ def main():
     )
     add_parser.add_argument("--description", help="Account Description")
     add_parser.add_argument("--tax-type", help="Tax Type (e.g., NONE, OUTPUT, INPUT)")
+    add_parser.add_argument(
+        "--oplog",
+        default=default_oplog_file("coa_add"),
+        help="Write-ahead operation log used to resume interrupted runs (default: %(default)s)",
+    )
+    add_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the account if the operation log records it as already created",
+    )
 
-    args = parser.parse_args()
+    # Import command
+    import_parser = subparsers.add_parser("import", help="Create or update accounts from a CSV or YAML file")
+    import_parser.add_argument("file", help="CSV (with header row) or YAML file of accounts")
+    import_parser.add_argument(
+        "--on-duplicate",
+        choices=("skip", "update"),
+        default="skip",
+        help="What to do when an account code already exists (default: skip)",
+    )
+    import_parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing")
+    import_parser.add_argument(
+        "--oplog",
+        default=default_oplog_file("coa_import"),
+        help="Write-ahead operation log used to resume interrupted runs (default: %(default)s)",
+    )
+    import_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip rows the operation log records as already written",
+    )
+
+    # Plan / apply commands
+    for name, help_text in (
+        ("plan", "List the changes needed to match a desired chart of accounts"),
+        ("apply", "Make tenants match a desired chart of accounts"),
+    ):
+        state_parser = subparsers.add_parser(name, help=help_text)
+        state_parser.add_argument("file", help="Desired-state YAML (or CSV) file")
+        state_parser.add_argument(
+            "--all-tenants",
+            action="store_true",
+            help="Run against every connected tenant instead of only --tenant-id/--tenant-index",
+        )
+        if name == "plan":
+            state_parser.add_argument(
+                "--max-age",
+                type=int,
+                default=3600,
+                help="Use cached charts younger than this many seconds (default: 3600; 0 always re-fetches)",
+            )
+        else:
+            state_parser.add_argument(
+                "--oplog",
+                default=default_oplog_file(f"coa_{name}"),
+                help="Write-ahead operation log used to resume interrupted runs (default: %(default)s)",
+            )
+            state_parser.add_argument(
+                "--resume",
+                action="store_true",
+                help="Skip changes the operation log records as already written",
+            )
+
+    args = parser.parse_args(argv)
 
     if args.command == "view":
-        api_client = get_api_client()
+        api_client = sdk_client()
         tenant_id = get_tenant_id(api_client, args.tenant_id, args.tenant_index)
-        list_accounts(api_client, tenant_id, args.query)
+        list_accounts(api_client, tenant_id, args.query, args.limit, args.sort)
     elif args.command == "add":
-        api_client = get_api_client()
+        api_client = sdk_client()
         tenant_id = get_tenant_id(api_client, args.tenant_id, args.tenant_index)
-        add_account(
-            api_client,
-            tenant_id,
-            args.code,
-            args.name,
-            args.type,
-            args.description,
-            args.tax_type,
+        with OperationLog(args.oplog, resume=args.resume) as oplog:
+            add_account(
+                api_client,
+                tenant_id,
+                args.code,
+                args.name,
+                args.type,
+                args.description,
+                args.tax_type,
+                oplog,
+            )
+    elif args.command == "import":
+        run(
+            import_accounts(
+                args.tenant_id,
+                args.tenant_index,
+                args.file,
+                args.on_duplicate,
+                args.dry_run,
+                args.oplog,
+                args.resume,
+            )
         )
+    elif args.command == "plan":
+        run(plan_chart(args.tenant_id, args.tenant_index, args.file, args.all_tenants, args.max_age))
+    elif args.command == "apply":
+        run(apply_chart(args.tenant_id, args.tenant_index, args.file, args.all_tenants, args.oplog, args.resume))
     else:
         parser.print_help()
 
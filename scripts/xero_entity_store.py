@@ -0,0 +1,213 @@
+"""
+Xero Local Entity Store
+
+A per-tenant SQLite mirror of invoices, bank transactions, credit notes and contacts
+(.xero_cache/<tenant_id>/entities.sqlite, next to the journal store), kept up to date incrementally: sync_entity()
+asks Xero only for records modified since the newest UpdatedDateUTC already stored, fetching pages concurrently, and
+xero_webhook_server.py upserts the invoices, contacts and credit notes named in webhook events as they arrive.
+
+Each record is kept twice: the full API document, zlib-compressed, and a flat row of its main fields (ENTITIES) that
+the view commands filter and sort without decompressing anything. Amounts are stored as decimal strings and read
+back as Decimal.
+"""
+
+import json
+import sqlite3
+import zlib
+from decimal import Decimal
+
+from xero_async_client import parse_xero_date, parse_xero_timestamp
+from xero_cache import tenant_cache_path
+
+STORE_FILE = "entities.sqlite"
+
+# entity -> endpoint, ID field and row columns as (column, dotted path in the API document, kind)
+ENTITIES = {
+    "invoices": {
+        "endpoint": "/Invoices",
+        "id": "InvoiceID",
+        "columns": [
+            ("InvoiceID", "InvoiceID", "text"),
+            ("Type", "Type", "text"),
+            ("InvoiceNumber", "InvoiceNumber", "text"),
+            ("Reference", "Reference", "text"),
+            ("ContactName", "Contact.Name", "text"),
+            ("Date", "Date", "date"),
+            ("DueDate", "DueDate", "date"),
+            ("Status", "Status", "text"),
+            ("CurrencyCode", "CurrencyCode", "text"),
+            ("SubTotal", "SubTotal", "amount"),
+            ("TotalTax", "TotalTax", "amount"),
+            ("Total", "Total", "amount"),
+            ("AmountDue", "AmountDue", "amount"),
+            ("AmountPaid", "AmountPaid", "amount"),
+        ],
+    },
+    "bank_transactions": {
+        "endpoint": "/BankTransactions",
+        "id": "BankTransactionID",
+        "columns": [
+            ("BankTransactionID", "BankTransactionID", "text"),
+            ("Type", "Type", "text"),
+            ("BankAccountCode", "BankAccount.Code", "text"),
+            ("BankAccountName", "BankAccount.Name", "text"),
+            ("ContactName", "Contact.Name", "text"),
+            ("Date", "Date", "date"),
+            ("Reference", "Reference", "text"),
+            ("Status", "Status", "text"),
+            ("IsReconciled", "IsReconciled", "bool"),
+            ("CurrencyCode", "CurrencyCode", "text"),
+            ("SubTotal", "SubTotal", "amount"),
+            ("TotalTax", "TotalTax", "amount"),
+            ("Total", "Total", "amount"),
+        ],
+    },
+    "credit_notes": {
+        "endpoint": "/CreditNotes",
+        "id": "CreditNoteID",
+        "columns": [
+            ("CreditNoteID", "CreditNoteID", "text"),
+            ("Type", "Type", "text"),
+            ("CreditNoteNumber", "CreditNoteNumber", "text"),
+            ("Reference", "Reference", "text"),
+            ("ContactName", "Contact.Name", "text"),
+            ("Date", "Date", "date"),
+            ("Status", "Status", "text"),
+            ("CurrencyCode", "CurrencyCode", "text"),
+            ("Total", "Total", "amount"),
+            ("RemainingCredit", "RemainingCredit", "amount"),
+        ],
+    },
+    "contacts": {
+        "endpoint": "/Contacts",
+        "id": "ContactID",
+        "columns": [
+            ("ContactID", "ContactID", "text"),
+            ("Name", "Name", "text"),
+            ("AccountNumber", "AccountNumber", "text"),
+            ("EmailAddress", "EmailAddress", "text"),
+            ("TaxNumber", "TaxNumber", "text"),
+            ("ContactStatus", "ContactStatus", "text"),
+            ("IsSupplier", "IsSupplier", "bool"),
+            ("IsCustomer", "IsCustomer", "bool"),
+        ],
+    },
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS records (
+    entity TEXT NOT NULL,
+    id TEXT NOT NULL,
+    updated_at TEXT,
+    row TEXT NOT NULL,
+    document BLOB NOT NULL,
+    PRIMARY KEY (entity, id)
+);
+"""
+
+
+def entity_columns(entity):
+    return [column for column, _, _ in ENTITIES[entity]["columns"]]
+
+
+def _field(document, path):
+    for key in path.split("."):
+        if not isinstance(document, dict):
+            return None
+        document = document.get(key)
+    return document
+
+
+def record_row(entity, document):
+    """The flat row of an API document: dates as YYYY-MM-DD, amounts as Decimal, blanks as ''."""
+    row = {}
+    for column, path, kind in ENTITIES[entity]["columns"]:
+        value = _field(document, path)
+        if kind == "date":
+            value = str(parse_xero_date(value))[:10] if value else ""
+        elif kind == "amount":
+            value = Decimal(str(value)) if value is not None else Decimal(0)
+        elif kind == "bool":
+            value = bool(value)
+        elif value is None:
+            value = ""
+        row[column] = value
+    return row
+
+
+class EntityStore:
+    def __init__(self, tenant_id, path=None):
+        self.tenant_id = tenant_id
+        self.db = sqlite3.connect(path or tenant_cache_path(tenant_id, STORE_FILE), timeout=30)
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def upsert(self, entity, documents):
+        """Replace the stored copy of each API document of the entity."""
+        id_field = ENTITIES[entity]["id"]
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        entity,
+                        document[id_field],
+                        document.get("UpdatedDateUTC"),
+                        json.dumps(record_row(entity, document), default=str),
+                        zlib.compress(json.dumps(document, default=str).encode()),
+                    )
+                    for document in documents
+                ),
+            )
+
+    def rows(self, entity):
+        """Flat rows of every stored record of the entity (amounts as Decimal)."""
+        amounts = [column for column, _, kind in ENTITIES[entity]["columns"] if kind == "amount"]
+        for (row,) in self.db.execute("SELECT row FROM records WHERE entity = ?", (entity,)):
+            row = json.loads(row)
+            for column in amounts:
+                row[column] = Decimal(row[column])
+            yield row
+
+    def document(self, entity, record_id):
+        """The full API document of one record, or None."""
+        found = self.db.execute(
+            "SELECT document FROM records WHERE entity = ? AND id = ?", (entity, record_id)
+        ).fetchone()
+        return json.loads(zlib.decompress(found[0])) if found else None
+
+    def count(self, entity):
+        return self.db.execute("SELECT COUNT(*) FROM records WHERE entity = ?", (entity,)).fetchone()[0]
+
+
+async def sync_entity(xero, store, entity):
+    """Fetch records of the entity changed since the last sync into the store; returns how many were updated."""
+    key = f"{entity}_updated_at"
+    since = store.get_meta(key)
+    documents = await xero.get_all_list_pages(
+        store.tenant_id, ENTITIES[entity]["endpoint"], if_modified_since=parse_xero_timestamp(since) if since else None
+    )
+    if not documents:
+        return 0
+    store.upsert(entity, documents)
+    newest = max(documents, key=lambda document: parse_xero_timestamp(document["UpdatedDateUTC"]))["UpdatedDateUTC"]
+    if not since or parse_xero_timestamp(newest) > parse_xero_timestamp(since):
+        with store.db:
+            store.set_meta(key, newest)
+    return len(documents)
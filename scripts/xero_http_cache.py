@@ -0,0 +1,341 @@
+"""
+Xero HTTP Response Cache
+
+Transparent on-disk cache for the GET requests made by xero_async_client and by the xero-python ApiClient used in
+the synchronous scripts (see install_sdk_cache). Responses are stored zlib-compressed in a SQLite database,
+.xero_cache/http_cache.sqlite, keyed by tenant and full URL, and shared by every script and every concurrent run.
+
+Each endpoint has a policy (ENDPOINT_POLICIES): a TTL during which a cached response is served without asking Xero,
+and whether it can then be revalidated. Xero honours If-Modified-Since on list endpoints such as Accounts or
+ManualJournals by returning only the records changed since that time, so a stale response is revalidated with a
+single If-Modified-Since request for the endpoint: an empty (or 304) answer proves nothing changed, and every cached
+response of that endpoint for the tenant is marked valid again at once (e.g. all pages of a listing). If something
+did change, the request is sent again in full. Responses that carry an ETag are revalidated with If-None-Match
+instead. Deleted records do not show up in If-Modified-Since results, so a response is always refetched in full
+once it is older than MAX_REVALIDATED_AGE.
+
+Any write (POST, PUT, DELETE) made through a cached client drops the cached responses of that endpoint for the
+tenant; a write that changes the general ledger (a manual journal, an account, an invoice, ...) also drops the
+tenant's cached Journals pages and Reports, which would otherwise be served from before the write until their TTL.
+The total size is capped, evicting the least recently used responses first. Set XERO_HTTP_CACHE=off in the
+environment to bypass the cache.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlencode, urlsplit
+
+from xero_cache import CACHE_DIR
+
+CACHE_FILE = os.path.join(CACHE_DIR, "http_cache.sqlite")
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+# Endpoint -> (seconds a response is used without asking Xero, whether If-Modified-Since revalidates it)
+ENDPOINT_POLICIES = {
+    "connections": (300, False),
+    "Organisation": (3600, False),
+    "TaxRates": (3600, False),
+    "TrackingCategories": (3600, False),
+    "Accounts": (60, True),
+    "Contacts": (30, True),
+    "Invoices": (30, True),
+    "CreditNotes": (30, True),
+    "BankTransactions": (30, True),
+    "ManualJournals": (10, True),
+    "Journals": (10, True),
+    "Reports": (60, False),
+}
+# Writes to these endpoints change the general ledger and so also drop the LEDGER_VIEWS responses
+LEDGER_ENDPOINTS = {"ManualJournals", "Accounts", "Invoices", "CreditNotes", "BankTransactions"}
+LEDGER_VIEWS = ("Journals", "Reports")
+# Endpoints not listed are never cached
+DEFAULT_POLICY = (0, False)
+MAX_REVALIDATED_AGE = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    tenant TEXT NOT NULL,
+    url TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    body BLOB NOT NULL,
+    headers TEXT NOT NULL,
+    etag TEXT,
+    fetched_at REAL NOT NULL,
+    validated_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (tenant, url)
+)
+"""
+
+
+def endpoint_of(url):
+    """The endpoint name used for policies and invalidation, e.g. "ManualJournals" or "Reports"."""
+    path = urlsplit(url).path
+    if "/api.xro/2.0/" not in path:
+        return path.strip("/").split("/")[0]
+    return path.split("/api.xro/2.0/", 1)[1].split("/")[0]
+
+
+def collection_url(url):
+    """URL of the list endpoint a (list or single-resource) URL belongs to."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path.split(endpoint_of(url), 1)[0]}{endpoint_of(url)}"
+
+
+def server_time(headers):
+    """Time the response was produced according to Xero's Date header (local clocks drift), minus a second."""
+    try:
+        return parsedate_to_datetime(headers["date"]).timestamp() - 1
+    except (KeyError, TypeError, ValueError):
+        return time.time() - 1
+
+
+def is_unchanged(status, body):
+    """True if a revalidation response shows nothing changed: 304, or an empty If-Modified-Since listing."""
+    if status == 304:
+        return True
+    if status != 200:
+        return False
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(data, dict) and not any(isinstance(value, list) and value for value in data.values())
+
+
+class HttpCache:
+    def __init__(self, path=CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        self._lock = threading.Lock()
+        self._endpoint_locks = {}
+
+    @classmethod
+    def from_environment(cls):
+        """The shared cache, or None when disabled with XERO_HTTP_CACHE=off."""
+        if os.environ.get("XERO_HTTP_CACHE", "").lower() in ("0", "off", "false", "no"):
+            return None
+        return cls()
+
+    def close(self):
+        self._db.close()
+
+    def endpoint_lock(self, tenant_id, endpoint, factory):
+        """One lock per tenant and endpoint (created with factory()) so concurrent requests revalidate once."""
+        with self._lock:
+            return self._endpoint_locks.setdefault((tenant_id or "", endpoint), factory())
+
+    @staticmethod
+    def cache_key(url, params):
+        if isinstance(params, dict):
+            params = params.items()
+        query = urlencode(sorted((str(k), str(v)) for k, v in params or []))
+        return f"{url}?{query}" if query else url
+
+    def is_cacheable(self, url, headers=None):
+        # A caller-supplied If-Modified-Since asks for a filtered listing, not the resource
+        if headers and any(name.lower() == "if-modified-since" for name in headers):
+            return False
+        return ENDPOINT_POLICIES.get(endpoint_of(url), DEFAULT_POLICY)[0] > 0
+
+    def lookup(self, tenant_id, url, params):
+        """Cached entry as a dict (body decompressed), or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, headers, etag, fetched_at, validated_at FROM responses WHERE tenant = ? AND url = ?",
+                (tenant_id or "", self.cache_key(url, params)),
+            ).fetchone()
+            if not row:
+                return None
+            self._db.execute(
+                "UPDATE responses SET last_used = ? WHERE tenant = ? AND url = ?",
+                (time.time(), tenant_id or "", self.cache_key(url, params)),
+            )
+        body, headers, etag, fetched_at, validated_at = row
+        return {
+            "body": zlib.decompress(body),
+            "headers": json.loads(headers),
+            "etag": etag,
+            "fetched_at": fetched_at,
+            "validated_at": validated_at,
+        }
+
+    def state(self, url, entry):
+        """Classify an entry: "fresh" (use it), "revalidate" (ask Xero if it changed) or "stale" (fetch again)."""
+        ttl, conditional = ENDPOINT_POLICIES.get(endpoint_of(url), DEFAULT_POLICY)
+        now = time.time()
+        if now - entry["validated_at"] < ttl:
+            return "fresh"
+        if now - entry["fetched_at"] < MAX_REVALIDATED_AGE and (entry["etag"] or conditional):
+            return "revalidate"
+        return "stale"
+
+    def revalidation_request(self, url, params, entry):
+        """(url, params, headers) of the request that tells whether the entry changed."""
+        if entry["etag"]:
+            return url, params, {"If-None-Match": entry["etag"]}
+        since = formatdate(entry["validated_at"], usegmt=True)
+        return collection_url(url), None, {"If-Modified-Since": since}
+
+    def mark_validated(self, tenant_id, url, entry, validated_at):
+        """Record that nothing changed between the entry's validation time and validated_at."""
+        with self._lock:
+            if entry["etag"]:
+                self._db.execute(
+                    "UPDATE responses SET validated_at = ? WHERE tenant = ? AND url = ?",
+                    (validated_at, tenant_id or "", url),
+                )
+            else:
+                # The check covered the whole endpoint, so it also vouches for every response validated since
+                self._db.execute(
+                    "UPDATE responses SET validated_at = ? WHERE tenant = ? AND endpoint = ? AND validated_at >= ?",
+                    (validated_at, tenant_id or "", endpoint_of(url), entry["validated_at"]),
+                )
+
+    def store(self, tenant_id, url, params, body, headers):
+        """Cache a 200 response; headers is any mapping of response headers."""
+        if isinstance(body, str):
+            body = body.encode()
+        # The body is stored decoded, so transfer headers of the original response no longer apply
+        headers = {
+            k.lower(): v
+            for k, v in dict(headers).items()
+            if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        }
+        compressed = zlib.compress(body)
+        fetched_at = server_time(headers)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    tenant_id or "",
+                    self.cache_key(url, params),
+                    endpoint_of(url),
+                    compressed,
+                    json.dumps(headers),
+                    headers.get("etag"),
+                    fetched_at,
+                    fetched_at,
+                    time.time(),
+                    len(compressed),
+                ),
+            )
+            self._evict()
+
+    def invalidate(self, tenant_id, url):
+        """Drop the tenant's cached responses made out of date by a write to url."""
+        endpoint = endpoint_of(url)
+        endpoints = [endpoint, *LEDGER_VIEWS] if endpoint in LEDGER_ENDPOINTS else [endpoint]
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM responses WHERE tenant = ? AND endpoint = ?",
+                [(tenant_id or "", name) for name in endpoints],
+            )
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used responses until back under 90% of the cap
+        excess = total - int(self.max_bytes * 0.9)
+        for tenant, url, size in self._db.execute(
+            "SELECT tenant, url, size FROM responses ORDER BY last_used"
+        ).fetchall():
+            if excess <= 0:
+                break
+            self._db.execute("DELETE FROM responses WHERE tenant = ? AND url = ?", (tenant, url))
+            excess -= size
+
+
+class _CachedResponse:
+    """Stands in for xero_python.rest.RESTResponse when a response comes from the cache."""
+
+    def __init__(self, entry):
+        self.status = 200
+        self.reason = "OK"
+        self.data = entry["body"]
+        self._headers = entry["headers"]
+
+    @property
+    def text(self):
+        return self.data.decode("utf8")
+
+    def getheaders(self):
+        return self._headers
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+
+def install_sdk_cache(api_client, cache=None):
+    """Route the GET requests of a xero-python ApiClient through the cache; writes invalidate the endpoint."""
+    cache = cache or HttpCache.from_environment()
+    if not cache:
+        return api_client
+    from xero_python.exceptions import HTTPStatusException
+
+    rest_client = api_client.rest_client
+    send_get = rest_client.GET
+
+    def cached_get(url, headers=None, query_params=None, **kwargs):
+        if not cache.is_cacheable(url, headers) or not kwargs.get("_preload_content", True):
+            return send_get(url, headers=headers, query_params=query_params, **kwargs)
+        tenant_id = (headers or {}).get("xero-tenant-id")
+
+        entry = cache.lookup(tenant_id, url, query_params)
+        state = cache.state(url, entry) if entry else "stale"
+        if state == "revalidate":
+            with cache.endpoint_lock(tenant_id, endpoint_of(url), threading.Lock):
+                # Another thread may have revalidated the endpoint while this one waited
+                entry = cache.lookup(tenant_id, url, query_params)
+                state = cache.state(url, entry) if entry else "stale"
+                if state == "revalidate":
+                    check_url, check_params, check_headers = cache.revalidation_request(url, query_params, entry)
+                    try:
+                        response = send_get(
+                            check_url, headers={**headers, **check_headers}, query_params=check_params, **kwargs
+                        )
+                        status, body, response_headers = response.status, response.data, response.getheaders()
+                    except HTTPStatusException as e:
+                        if e.status != 304:
+                            raise
+                        status, body, response_headers = 304, b"", e.headers or {}
+                    if is_unchanged(status, body):
+                        cache.mark_validated(
+                            tenant_id, cache.cache_key(url, query_params), entry, server_time(response_headers)
+                        )
+                        state = "fresh"
+                    elif entry["etag"]:
+                        # If-None-Match returned the full new response
+                        cache.store(tenant_id, url, query_params, body, response_headers)
+                        return response
+                    else:
+                        state = "stale"
+        if state == "fresh":
+            return _CachedResponse(entry)
+
+        response = send_get(url, headers=headers, query_params=query_params, **kwargs)
+        cache.store(tenant_id, url, query_params, response.data, response.getheaders())
+        return response
+
+    def invalidating(send):
+        def write(url, headers=None, **kwargs):
+            response = send(url, headers=headers, **kwargs)
+            cache.invalidate((headers or {}).get("xero-tenant-id"), url)
+            return response
+
+        return write
+
+    rest_client.GET = cached_get
+    for method in ("POST", "PUT", "PATCH", "DELETE"):
+        setattr(rest_client, method, invalidating(getattr(rest_client, method)))
+    return api_client
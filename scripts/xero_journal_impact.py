@@ -0,0 +1,119 @@
+"""
+Xero Journal Edit Impact
+
+The effect of manual journal edits on the Profit & Loss and Balance Sheet, worked out from the journals themselves
+and the cached chart of accounts, so a reclassification plan of any size can be previewed without fetching a report.
+xero_journal_manager.py prints it for edit --dry-run and post --dry-run.
+
+Only posted journals reach the reports: a journal counts before the edit if it was posted, and after it if it will
+be. For each period (month of the journal date) and account class, Before and After are the totals of the edited
+journals' lines in the sign the reports use (debits positive for assets and expenses, credits positive for
+liabilities, equity and revenue), and each period closes with Net Profit (revenue less expenses) and Net Assets
+(assets less liabilities).
+
+Lines are summed as they are, which is only what Xero posts when no tax applies. When a journal's LineAmountTypes is
+Exclusive or Inclusive and a line has a TaxType, Xero posts part of it to the tax account at a rate that the update
+payload does not carry, so such journals are listed as not previewed instead of being summed.
+"""
+
+import csv
+import sys
+from decimal import Decimal
+
+from xero_reports import ACCOUNT_CLASS_BY_TYPE
+
+CLASSES = ("REVENUE", "EXPENSE", "ASSET", "LIABILITY", "EQUITY")
+CREDIT_CLASSES = {"REVENUE", "LIABILITY", "EQUITY"}
+COLUMNS = ["Period", "Class", "Before", "After", "Change"]
+ZERO = Decimal("0.00")
+# TaxType values that never post tax
+NO_TAX_TYPES = ("", "NONE")
+
+
+def account_classes(chart):
+    """{AccountCode: class} from the chart of accounts."""
+    return {
+        account["Code"]: account.get("Class") or ACCOUNT_CLASS_BY_TYPE.get(account.get("Type"), "ASSET")
+        for account in chart
+        if account.get("Code")
+    }
+
+
+def posts_tax(journal):
+    """True if Xero splits some of the journal's lines between their account and the tax account."""
+    if (journal.get("LineAmountTypes") or "NoTax") == "NoTax":
+        return False
+    return any((line.get("TaxType") or "") not in NO_TAX_TYPES for line in journal.get("JournalLines") or [])
+
+
+def edit_impact(edits, chart):
+    """
+    Sum the edited journals by period and class.
+
+    edits are (journal ID, journal before, journal after) triples, the journals in the update payload shape (Date as
+    YYYY-MM-DD, Status, LineAmountTypes, JournalLines). Returns ({(period, class): [before, after]}, account codes
+    missing from the chart, IDs of posted journals left out because tax applies to them).
+    """
+    classes = account_classes(chart)
+    impact = {}
+    unknown = set()
+    taxed = []
+    for journal_id, *pair in edits:
+        posted = [journal for journal in pair if journal.get("Status") == "POSTED"]
+        if any(posts_tax(journal) for journal in posted):
+            taxed.append(journal_id)
+            continue
+        for side, journal in enumerate(pair):
+            if journal.get("Status") != "POSTED":
+                continue
+            period = journal["Date"][:7]
+            for line in journal.get("JournalLines") or []:
+                account_class = classes.get(line.get("AccountCode"))
+                if account_class is None:
+                    unknown.add(line.get("AccountCode") or "")
+                    continue
+                amount = Decimal(str(line.get("LineAmount") or 0)).quantize(ZERO)
+                totals = impact.setdefault((period, account_class), [ZERO, ZERO])
+                totals[side] += -amount if account_class in CREDIT_CLASSES else amount
+    return impact, unknown, taxed
+
+
+def impact_rows(impact):
+    """[Period, Class, Before, After, Change] for each period and class moved, then Net Profit and Net Assets."""
+    rows = []
+    for period in sorted({period for period, _ in impact}):
+
+        def totals(account_class):
+            return impact.get((period, account_class), [ZERO, ZERO])
+
+        for account_class in CLASSES:
+            if (period, account_class) in impact:
+                before, after = totals(account_class)
+                rows.append([period, account_class, before, after, after - before])
+        for label, plus, minus in (("Net Profit", "REVENUE", "EXPENSE"), ("Net Assets", "ASSET", "LIABILITY")):
+            before, after = (totals(plus)[side] - totals(minus)[side] for side in (0, 1))
+            rows.append([period, label, before, after, after - before])
+    return rows
+
+
+def print_impact(rows, unknown=(), taxed=(), out=None):
+    """Print the impact as an aligned table (for the terminal, next to the dry-run messages)."""
+    out = out or sys.stderr
+    if not rows and not taxed:
+        print("No posted journal changes: the reports would not move.", file=out)
+        return
+    if rows:
+        print("Report impact (Before / After / Change):", file=out)
+    for period, label, before, after, change in rows:
+        print(f"  {period}  {label:<11}{before:>16,.2f}{after:>16,.2f}{change:>16,.2f}", file=out)
+    if unknown:
+        print(f"  Not classified (not in the chart of accounts): {', '.join(sorted(unknown))}", file=out)
+    if taxed:
+        print(f"  Not previewed (tax applies to their lines): {', '.join(taxed)}", file=out)
+
+
+def write_impact(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+#     "httpx",
 #     "PyYAML",
 #     "xero-python",
 # ]
@@ -15,8 +16,14 @@ Usage:
     ./xero_journal_manager.py <command> [options]
 
 Commands:
-    view    List all manual journals in CSV format. Supports optional filtering query.
-    edit    Edit a manual journal (e.g. change account code).
+    view       List all manual journals in CSV format. Supports optional filtering query.
+    edit       Edit one or more manual journals (e.g. change account code).
+    post       Post one or more draft manual journals.
+    create     Create manual journals from a CSV file of journal lines.
+    summarize  Sum journal line amounts grouped by account, month, status, ... as a pivot table, from the local
+               journal store (see search) on all cores.
+    search     Full-text search of narrations and line descriptions, best matches first.
+    balance    Running balance of ledger accounts at given dates, or every movement, from a local index.
 
 Examples:
     # View all manual journals
@@ -31,255 +38,898 @@ Examples:
     # View journals filtered by Date
     ./xero_journal_manager.py view "Date >= '2025-11-01'"
 
+    # The 20 most recent journal lines touching account 127 (stops paging once 20 lines are found)
+    ./xero_journal_manager.py view "AccountCode == '127'" --sort Date:desc --limit 20
+
+    # Posted amounts per account (rows) and month (columns), with totals
+    ./xero_journal_manager.py summarize --by AccountCode,Month "Status == 'POSTED'"
+
+    # Lines mentioning a loan repayment or a wallet address, using the local index in .xero_cache/
+    ./xero_journal_manager.py search '"loan repayment" OR 0x3f5ce5fbfe3e9af3971dd833d26ba9b5c936f0be' --status POSTED
+
+    # Balance of account 810 at two dates, and its day-by-day movements this year (ledger kept in .xero_cache/)
+    ./xero_journal_manager.py balance --account 810 --at 2025-03-31 --at 2025-06-30
+    ./xero_journal_manager.py balance --account 810 --series --from 2025-01-01
+
+    # Large filters over the local journal store (kept in .xero_cache/), one process per core
+    ./xero_journal_manager.py view "Description.startswith('Koinly') and abs(LineAmount) > 500" --local
+
+    # Watch for new or changed draft lines (one If-Modified-Since request per minute), as NDJSON
+    ./xero_journal_manager.py view "Status == 'DRAFT'" --follow --format ndjson
+
     # Edit a journal to change account code (Dry Run)
     ./xero_journal_manager.py edit --journal-id <ID> --find-account 265 --new-account 810 --dry-run
 
     # Edit a journal to change account code (Apply)
     ./xero_journal_manager.py edit --journal-id <ID> --find-account 265 --new-account 810
 
+    # How reclassifying a list of journals would move each month's P&L and balance sheet, saved for review
+    ./xero_journal_manager.py edit --journal-ids-file ids.txt --find-account 265 --new-account 810 --dry-run \
+        --impact impact.csv
+
+    # Reclassify many journals; progress is recorded in .xero_oplog_journal_edit.jsonl
+    ./xero_journal_manager.py edit --journal-ids-file ids.txt --find-account 265 --new-account 810
+
+    # Continue after the run above stopped, skipping journals already changed
+    ./xero_journal_manager.py edit --resume
+
+    # Post several draft journals
+    ./xero_journal_manager.py post --journal-id <ID1> --journal-id <ID2>
+
+    Before anything is sent, edit, post and create check every journal locally (see xero_validation.py): archived
+    or unknown accounts, invalid tax types, unbalanced lines and dates inside the lock period are reported without
+    a request being made.
+
+    # Create journals from a CSV of lines (columns: JournalKey, Date, Narration, AccountCode, Description,
+    # LineAmount, TaxType, Status). Lines sharing a JournalKey (or, without it, Date and Narration) form one journal.
+    ./xero_journal_manager.py create journals.csv --dry-run
+    ./xero_journal_manager.py create journals.csv
+
 Requirements:
     - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET)
     - .xero_token.json (generated by xero_connect.py)
 """
 import argparse
-import os
-import json
-import yaml
+import asyncio
+import collections
+import contextlib
 import csv
+import itertools
+import json
 import sys
 import signal
-from xero_python.api_client import ApiClient
-from xero_python.api_client.configuration import Configuration
-from xero_python.api_client.oauth2 import OAuth2Token
-from xero_python.identity import IdentityApi
-from xero_python.accounting import AccountingApi, ManualJournals
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+from xero_python.accounting import AccountingApi
+from xero_session import sdk_client, sdk_connections
+from xero_cache import ACCOUNTS_FILE, cached_fetch
+from xero_journal_impact import edit_impact, impact_rows, print_impact, write_impact
+from xero_journal_store import (
+    LINE_COLUMNS,
+    BalanceIndex,
+    JournalStore,
+    quote_terms,
+    sync_gl_journals,
+    sync_manual_journals,
+)
+from xero_listing import SORT_MEMORY_MB, add_listing_arguments, api_order, select_rows
+from xero_parallel import DEFAULT_WORKERS, add_workers_argument, map_ranges, merge_groups, plan_ranges
+from xero_oplog import OperationLog, default_oplog_file, make_idempotency_key
+from xero_precomputed import drop_reports
+from xero_async_client import (
+    TENANT_CALLS_PER_MINUTE,
+    TENANT_CONCURRENCY,
+    XeroAsyncClient,
+    XeroApiError,
+    parse_xero_date,
+    resolve_tenant as resolve_connection,
+    run,
+)
+from xero_validation import ACCOUNTS_MAX_AGE, JournalValidator
 
 # Handle broken pipe when piping output
 signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
 
-def load_config(config_file="xero_config.yaml"):
-    with open(config_file, "r") as f:
-        return yaml.safe_load(f)
-
+VIEW_COLUMNS = [
+    "JournalID",
+    "Date",
+    "Narration",
+    "Status",
+    "LineID",
+    "AccountCode",
+    "Description",
+    "LineAmount",
+    "TaxType",
+]
+# View columns the ManualJournals endpoint can order by (the rest are line fields, sorted client-side)
+API_ORDER_FIELDS = {"JournalID": "ManualJournalID", "Date": "Date", "Narration": "Narration", "Status": "Status"}
 
-def load_token(token_file=".xero_token.json"):
-    if not os.path.exists(token_file):
-        print("Token file not found. Please run xero_connect.py first.")
-        return None
-    with open(token_file, "r") as f:
-        return json.load(f)
 
-
-def list_journals(api_client, tenant_id, query=None):
-    # 2. Get Manual Journals
-    accounting_api = AccountingApi(api_client)
-
-    all_journals = []
+def journal_rows(accounting_api, tenant_id, order=None):
+    """Yield (row_data, csv_row) for every journal line, fetching pages only as the rows are consumed."""
     page = 1
-
-    # print("Fetching manual journals...", file=sys.stderr)
-
     while True:
-        # print(f"Fetching page {page}...", file=sys.stderr)
-        journals_response = accounting_api.get_manual_journals(tenant_id, page=page)
+        journals_response = accounting_api.get_manual_journals(
+            tenant_id, page=page, **({"order": order} if order else {})
+        )
 
         if not journals_response.manual_journals:
-            break
+            return
 
-        all_journals.extend(journals_response.manual_journals)
+        for journal in journals_response.manual_journals:
+            header = {
+                "JournalID": journal.manual_journal_id,
+                "Date": str(journal.date),
+                "Narration": journal.narration,
+                "Status": journal.status,
+            }
+            if journal.journal_lines:
+                for line in journal.journal_lines:
+                    row_data = {
+                        **header,
+                        "LineID": getattr(line, "line_item_id", ""),
+                        "AccountCode": line.account_code,
+                        "Description": line.description,
+                        "LineAmount": line.line_amount,
+                        "TaxType": line.tax_type,
+                    }
+                    yield row_data, [row_data[column] for column in VIEW_COLUMNS]
+            else:
+                # Just write the journal info if no lines (shouldn't happen for valid journals)
+                row_data = {
+                    **header,
+                    "LineID": "",
+                    "AccountCode": "",
+                    "Description": "",
+                    "LineAmount": 0.0,
+                    "TaxType": "",
+                }
+                yield row_data, [*header.values(), "", "", "", "", ""]
         page += 1
 
-    # print(f"Found {len(all_journals)} journals.", file=sys.stderr)
-
-    # 3. Output to CSV
-    writer = csv.writer(sys.stdout)
-    # Header
-    writer.writerow(
-        [
-            "JournalID",
-            "Date",
-            "Narration",
-            "Status",
-            "LineID",
-            "AccountCode",
-            "Description",
-            "LineAmount",
-            "TaxType",
-        ]
-    )
-
-    for journal in all_journals:
-        # We might need to fetch details if lines are not included in the list endpoint?
-        # Xero API documentation says get_manual_journals returns ManualJournals which includes JournalLines.
-        # Let's verify if lines are present.
 
-        # If lines are missing, we might need to fetch each journal individually, but that would be slow.
-        # Usually list endpoint returns lines for Manual Journals.
+def list_journals(api_client, tenant_id, query=None, limit=None, sort=None, sort_memory=SORT_MEMORY_MB):
+    accounting_api = AccountingApi(api_client)
 
-        if journal.journal_lines:
-            for line in journal.journal_lines:
-                row_data = {
-                    "JournalID": journal.manual_journal_id,
-                    "Date": str(journal.date),
-                    "Narration": journal.narration,
-                    "Status": journal.status,
-                    "LineID": getattr(line, "line_item_id", ""),
-                    "AccountCode": line.account_code,
-                    "Description": line.description,
-                    "LineAmount": line.line_amount,
-                    "TaxType": line.tax_type,
-                }
+    # Journal-level sorts are done by the API, so the rows arrive in order and a limit can stop paging early
+    order = api_order(sort, API_ORDER_FIELDS)
+    rows = journal_rows(accounting_api, tenant_id, order)
 
-                if query:
-                    try:
-                        # Evaluate the query against the row data
-                        if not eval(query, {}, row_data):
-                            continue
-                    except Exception as e:
-                        print(
-                            f"Error evaluating query '{query}' for row: {e}",
-                            file=sys.stderr,
-                        )
-                        continue
+    if query:
 
-                writer.writerow(
-                    [
-                        row_data["JournalID"],
-                        row_data["Date"],
-                        row_data["Narration"],
-                        row_data["Status"],
-                        row_data["LineID"],
-                        row_data["AccountCode"],
-                        row_data["Description"],
-                        row_data["LineAmount"],
-                        row_data["TaxType"],
-                    ]
+        def matches(row):
+            try:
+                # Evaluate the query against the row data
+                return eval(query, {}, row[0])
+            except Exception as e:
+                print(
+                    f"Error evaluating query '{query}' for row: {e}",
+                    file=sys.stderr,
                 )
-        else:
-            # Just write the journal info if no lines (shouldn't happen for valid journals)
-            row_data = {
-                "JournalID": journal.manual_journal_id,
-                "Date": str(journal.date),
-                "Narration": journal.narration,
-                "Status": journal.status,
-                "LineID": "",
-                "AccountCode": "",
-                "Description": "",
-                "LineAmount": 0.0,
-                "TaxType": "",
-            }
+                return False
 
-            if query:
-                try:
-                    if not eval(query, {}, row_data):
-                        continue
-                except Exception:
-                    continue
+        rows = filter(matches, rows)
 
-            writer.writerow(
-                [
-                    row_data["JournalID"],
-                    row_data["Date"],
-                    row_data["Narration"],
-                    row_data["Status"],
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                ]
-            )
+    selected = select_rows(rows, limit, sort, presorted=bool(order), fields=lambda row: row[0], memory_mb=sort_memory)
 
+    # Output to CSV
+    writer = csv.writer(sys.stdout)
+    writer.writerow(VIEW_COLUMNS)
+    for _, csv_row in selected:
+        writer.writerow(csv_row)
+
+
+MANUAL_JOURNALS_PAGE_SIZE = 100
+
+
+def journal_line_rows(journal):
+    """Rows of the view output for a ManualJournal from the async client."""
+    header = {
+        "JournalID": journal["ManualJournalID"],
+        "Date": str(parse_xero_date(journal["Date"]))[:10],
+        "Narration": journal.get("Narration", ""),
+        "Status": journal.get("Status", ""),
+    }
+    return [
+        {
+            **header,
+            "AccountCode": line.get("AccountCode", ""),
+            "Description": line.get("Description", ""),
+            "LineAmount": line.get("LineAmount"),
+            "TaxType": line.get("TaxType", ""),
+        }
+        for line in journal.get("JournalLines") or []
+    ]
+
+
+def diff_journal_rows(old_rows, new_rows):
+    """
+    Compare two versions of a journal's rows and return (ChangeType, row) pairs.
+
+    Lines are matched on their content (account, description, amount, tax type): unmatched new lines are ADDED
+    (or NEW for a journal not seen before), unmatched old lines REMOVED, and matched lines are CHANGED when the
+    journal's date, narration or status changed.
+    """
+    if old_rows is None:
+        return [("NEW", row) for row in new_rows]
+
+    def content(row):
+        return (row["AccountCode"], row["Description"], row["LineAmount"], row["TaxType"])
+
+    def header(rows):
+        return (rows[0]["Date"], rows[0]["Narration"], rows[0]["Status"]) if rows else None
+
+    header_changed = header(old_rows) != header(new_rows)
+    unmatched = collections.Counter(content(row) for row in old_rows)
+    changes = []
+    for row in new_rows:
+        if unmatched[content(row)] > 0:
+            unmatched[content(row)] -= 1
+            if header_changed:
+                changes.append(("CHANGED", row))
+        else:
+            changes.append(("ADDED", row))
+    for row in old_rows:
+        if unmatched[content(row)] > 0:
+            unmatched[content(row)] -= 1
+            changes.append(("REMOVED", row))
+    return changes
+
+
+def follow_interval(base_interval, remaining):
+    """
+    Seconds to wait before the next poll: the requested interval, stretched so the polls left in Xero's daily
+    allowance (X-DayLimit-Remaining) last a day, and a full minute when the per-minute allowance is nearly spent.
+    """
+    interval = base_interval
+    if "X-DayLimit-Remaining" in remaining:
+        interval = max(interval, 86400 / max(remaining["X-DayLimit-Remaining"], 1))
+    if remaining.get("X-MinLimit-Remaining", TENANT_CALLS_PER_MINUTE) < 5:
+        interval = max(interval, 60)
+    return interval
+
+
+async def follow_journals(tenant_id_arg, tenant_index, query, interval, output_format):
+    """
+    Keep polling for manual journals modified since the last poll and print only new or changed lines.
+
+    Each poll is a single If-Modified-Since request for the first page (Xero returns nothing, or 304, when no
+    journal changed); more pages are only fetched when the first one is full.
+    """
+    writer = csv.writer(sys.stdout)
+    if output_format == "csv":
+        writer.writerow(["ChangeType", *LINE_COLUMNS])
+        sys.stdout.flush()
+
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        known = {}
+        # UpdatedDateUTC of each journal seen: If-Modified-Since is inclusive, so the newest comes back every poll
+        versions = {}
+        since = None
+        first = True
+        while True:
+            journals = []
+            page = 1
+            while True:
+                batch = await xero.get_manual_journals(tenant_id, page, if_modified_since=since)
+                journals.extend(batch)
+                if len(batch) < MANUAL_JOURNALS_PAGE_SIZE:
+                    break
+                page += 1
+
+            for journal in journals:
+                if versions.get(journal["ManualJournalID"]) == journal.get("UpdatedDateUTC"):
+                    continue
+                versions[journal["ManualJournalID"]] = journal.get("UpdatedDateUTC")
+                updated = parse_xero_date(journal.get("UpdatedDateUTC"))
+                if isinstance(updated, datetime):
+                    since = max(since, updated) if since else updated
+                rows = journal_line_rows(journal)
+                changes = [] if first else diff_journal_rows(known.get(journal["ManualJournalID"]), rows)
+                known[journal["ManualJournalID"]] = rows
+
+                for change_type, row in changes:
+                    if query:
+                        try:
+                            if not eval(query, {}, dict(row)):
+                                continue
+                        except Exception as e:
+                            print(f"Error evaluating query '{query}' for row: {e}", file=sys.stderr)
+                            continue
+                    if output_format == "ndjson":
+                        print(json.dumps({"ChangeType": change_type, **row}, default=str))
+                    else:
+                        writer.writerow([change_type, *(row[column] for column in LINE_COLUMNS)])
+            sys.stdout.flush()
 
-def edit_journal(api_client, tenant_id, journal_id, find_account, new_account, dry_run=False):
-    accounting_api = AccountingApi(api_client)
+            if first:
+                print(f"Watching {len(known)} journal(s) for changes (Ctrl-C to stop)...", file=sys.stderr)
+                first = False
+            await asyncio.sleep(follow_interval(interval, xero.limiter(tenant_id).remaining))
 
-    try:
-        # Get the journal
-        print(f"Fetching journal {journal_id}...", file=sys.stderr)
-        journal_response = accounting_api.get_manual_journal(tenant_id, journal_id)
 
-        if not journal_response.manual_journals:
-            print(f"Journal {journal_id} not found.", file=sys.stderr)
-            return
+# Columns summarize can group by: the line columns plus periods derived from Date
+SUMMARY_DIMENSIONS = [column for column in LINE_COLUMNS if column != "LineAmount"] + ["Month", "Quarter", "Year"]
 
-        journal = journal_response.manual_journals[0]
 
-        print(f"Found Journal: {journal.manual_journal_id} - {journal.narration}")
+def with_periods(row):
+    year, month = row["Date"][:4], row["Date"][5:7]
+    return {**row, "Month": row["Date"][:7], "Quarter": f"{year}-Q{(int(month) + 2) // 3}", "Year": year}
 
-        updated = False
-        if journal.journal_lines:
-            for line in journal.journal_lines:
-                if line.account_code == find_account:
-                    print(
-                        f"  - Found line matching AccountCode '{find_account}': {line.description} ({line.line_amount})"
-                    )
-                    print(f"    -> Changing AccountCode to '{new_account}'")
-                    line.account_code = new_account
-                    updated = True
 
-        if not updated:
-            print(f"No lines found with AccountCode '{find_account}'. No changes made.")
-            return
+def summarize_lines(rows, by, query=None):
+    """
+    Sum LineAmount over rows grouped by the `by` columns in one pass.
 
-        if dry_run:
-            print("Dry run: Changes not applied.")
-            return
+    Returns {group key tuple: [line count, Decimal total]}. The query is compiled once and evaluated per row, like
+    the view filter, with the period columns available too.
+    """
+    code = compile(query, "<query>", "eval") if query else None
+    groups = {}
+    for row in rows:
+        row = with_periods(row)
+        if code:
+            try:
+                if not eval(code, {}, row):
+                    continue
+            except Exception as e:
+                print(f"Error evaluating query '{query}' for row: {e}", file=sys.stderr)
+                continue
+        key = tuple(row[column] for column in by)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [0, Decimal(0)]
+        group[0] += 1
+        group[1] += row["LineAmount"]
+    return groups
+
+
+def write_summary(by, groups, out=None):
+    """
+    Write grouped totals as CSV. With several --by columns the last one is pivoted into columns, followed by a
+    Total column and a Total row; with one column, each group gets its line count and total.
+    """
+    writer = csv.writer(out or sys.stdout)
+    if len(by) == 1:
+        writer.writerow([by[0], "Lines", "Total"])
+        for key in sorted(groups):
+            writer.writerow([*key, *groups[key]])
+        return
 
-        # Update the journal
-        print("Applying changes...", file=sys.stderr)
-        # We need to wrap the journal in a list for the update call
-        # Note: Xero API might require specific fields or complain about read-only ones.
-        # But usually passing the object back works for updates.
+    row_keys = sorted({key[:-1] for key in groups})
+    column_keys = sorted({key[-1] for key in groups})
+    writer.writerow([*by[:-1], *column_keys, "Total"])
+    column_totals = dict.fromkeys(column_keys, Decimal(0))
+    for row_key in row_keys:
+        cells = [groups[(*row_key, column)][1] if (*row_key, column) in groups else None for column in column_keys]
+        for column, value in zip(column_keys, cells):
+            column_totals[column] += value or 0
+        total = sum((value for value in cells if value is not None), Decimal(0))
+        writer.writerow([*row_key, *["" if value is None else value for value in cells], total])
+    writer.writerow(["Total", *[""] * (len(by) - 2), *column_totals.values(), sum(column_totals.values())])
+
+
+async def local_journal_ranges(tenant_id_arg, tenant_index, offline=False, workers=DEFAULT_WORKERS, full=False):
+    """
+    Bring the tenant's local manual journals up to date (unless offline) and plan how to split them between workers.
+
+    With full, every journal is listed so that those deleted in Xero are dropped (see sync_manual_journals()).
+
+    Returns the tenant ID and the date ranges of the store to evaluate (see xero_parallel.py).
+    """
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        with JournalStore(tenant_id) as store:
+            if not offline:
+                updated = await sync_manual_journals(xero, store, full)
+                if updated:
+                    print(f"Indexed {updated} new, changed or deleted journal(s).", file=sys.stderr)
+            return tenant_id, plan_ranges(store.manual_journal_line_dates(), workers)
+
+
+def summarize_range(task):
+    """summarize_lines() over one date range of the local store (pruned by local_journal_ranges()); run in a worker."""
+    tenant_id, date_from, date_to, by, query = task
+    with JournalStore(tenant_id) as store:
+        return summarize_lines(store.manual_journal_lines(date_from, date_to), by, query)
+
+
+def summarize_journals(tenant_id, ranges, by, query=None, workers=DEFAULT_WORKERS):
+    partials = map_ranges(summarize_range, [(tenant_id, *dates, by, query) for dates in ranges], workers)
+    write_summary(by, merge_groups(partials))
+
+
+def filter_range(task):
+    """The lines of one date range of the local store matching the query, as view rows; run in a worker process."""
+    tenant_id, date_from, date_to, query = task
+    code = compile(query, "<query>", "eval") if query else None
+    matched = []
+    with JournalStore(tenant_id) as store:
+        for row in store.manual_journal_lines(date_from, date_to):
+            row["LineID"] = ""
+            if code:
+                try:
+                    if not eval(code, {}, row):
+                        continue
+                except Exception as e:
+                    print(f"Error evaluating query '{query}' for row: {e}", file=sys.stderr)
+                    continue
+            matched.append(row)
+    return matched
 
-        accounting_api.update_manual_journal(
-            tenant_id,
-            journal_id,
-            manual_journals=ManualJournals(manual_journals=[journal]),
-        )
-        print("Journal updated successfully.")
 
-    except Exception as e:
-        print(f"Error updating journal: {e}", file=sys.stderr)
-        sys.exit(1)
+def list_local_journals(
+    tenant_id, ranges, query=None, limit=None, sort=None, sort_memory=SORT_MEMORY_MB, workers=DEFAULT_WORKERS
+):
+    """Like list_journals(), from the local store; the query is evaluated by the workers, a range each at a time."""
+    # Without a query there is nothing to spread: shipping every row back from the workers costs more than reading it
+    tasks = [(tenant_id, *dates, query) for dates in (ranges if query else [(None, None)])]
+    rows = itertools.chain.from_iterable(map_ranges(filter_range, tasks, workers))
 
+    writer = csv.writer(sys.stdout)
+    writer.writerow(VIEW_COLUMNS)
+    for row in select_rows(rows, limit, sort, memory_mb=sort_memory):
+        writer.writerow([row[column] for column in VIEW_COLUMNS])
+
+
+async def search_journals(tenant_id_arg, tenant_index, terms, filters, limit, offline=False, full=False):
+    """
+    Bring the tenant's local journal index up to date, then print the best matching lines.
+
+    Journals deleted in Xero leave the index with the daily full listing, or now with full (see sync_manual_journals()).
+    """
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        with JournalStore(tenant_id) as store:
+            if not offline:
+                updated = await sync_manual_journals(xero, store, full)
+                if updated:
+                    print(f"Indexed {updated} new, changed or deleted journal(s).", file=sys.stderr)
+            try:
+                results = store.search(terms, limit=limit, **filters)
+            except sqlite3.OperationalError:
+                # Not valid FTS5 syntax (e.g. punctuation in an address); match the words literally instead
+                results = store.search(quote_terms(terms), limit=limit, **filters)
 
-def post_journal(api_client, tenant_id, journal_id):
-    accounting_api = AccountingApi(api_client)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Score", *LINE_COLUMNS])
+    for score, row in results:
+        # bm25 is lower for better matches; print it so that higher is better
+        writer.writerow([round(-score, 4), *(row[column] for column in LINE_COLUMNS)])
+
+
+async def account_balances(tenant_id_arg, tenant_index, accounts, dates, series, date_from, date_to, offline=False):
+    """
+    Print account balances from the general ledger journals, fetching only journals added since the last run.
+
+    Balances are cumulative from the first journal (debits positive, credits negative), so for income and expense
+    accounts they are lifetime totals rather than year-to-date figures.
+    """
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        with JournalStore(tenant_id) as store:
+            if not offline:
+                added = await sync_gl_journals(xero, store)
+                if added:
+                    print(f"Indexed {added} new ledger journal(s).", file=sys.stderr)
+            index = BalanceIndex.load(store)
 
-    try:
-        print(f"Fetching journal {journal_id}...", file=sys.stderr)
-        journal_response = accounting_api.get_manual_journal(tenant_id, journal_id)
+    writer = csv.writer(sys.stdout)
+    accounts = accounts or sorted(index.accounts)
+    if series:
+        writer.writerow(["Account", "Date", "Movement", "Balance"])
+        for account in accounts:
+            for balance_date, movement, balance in index.series(account, date_from, date_to):
+                writer.writerow([account, balance_date, movement, balance])
+        return
+    writer.writerow(["Account", "Date", "Balance"])
+    for account in accounts:
+        for at in dates:
+            writer.writerow([account, at, index.balance_at(account, at)])
+
+
+# Fields accepted by the ManualJournals endpoint; everything else in a GET response is read-only
+WRITABLE_JOURNAL_FIELDS = ("Narration", "Status", "LineAmountTypes", "Url", "ShowOnCashBasisReports")
+WRITABLE_LINE_FIELDS = ("LineAmount", "AccountCode", "Description", "TaxType", "Tracking")
+
+
+def journal_for_update(journal):
+    """Turn a ManualJournal from the API into an update payload (Date as YYYY-MM-DD, read-only fields dropped)."""
+    payload = {k: journal[k] for k in WRITABLE_JOURNAL_FIELDS if journal.get(k) is not None}
+    payload["Date"] = str(parse_xero_date(journal["Date"]))[:10]
+    payload["JournalLines"] = [
+        {k: line[k] for k in WRITABLE_LINE_FIELDS if line.get(k) not in (None, "", [])}
+        for line in journal.get("JournalLines") or []
+    ]
+    return payload
+
+
+def reassign_account(journal_id, payload, params):
+    """Move lines on params["find_account"] to params["new_account"]. Returns False if no line matches."""
+    updated = False
+    for line in payload["JournalLines"]:
+        if line.get("AccountCode") == params["find_account"]:
+            print(
+                f"  {journal_id}: line '{line.get('Description', '')}' ({line.get('LineAmount')}) "
+                f"{params['find_account']} -> {params['new_account']}",
+                file=sys.stderr,
+            )
+            line["AccountCode"] = params["new_account"]
+            updated = True
+    return updated
+
+
+def mark_posted(journal_id, payload, params):
+    """Set a draft journal to POSTED. Returns False if the journal is not a draft."""
+    if payload.get("Status") != "DRAFT":
+        print(f"  {journal_id}: not a draft (status: {payload.get('Status')}); nothing to post", file=sys.stderr)
+        return False
+    payload["Status"] = "POSTED"
+    return True
+
+
+JOURNAL_TRANSFORMS = {"edit_journal": reassign_account, "post_journal": mark_posted}
+
+
+def read_journal_ids(journal_ids=None, journal_ids_file=None):
+    ids = list(journal_ids or [])
+    if journal_ids_file:
+        f = sys.stdin if journal_ids_file == "-" else open(journal_ids_file, "r")
+        with f:
+            ids.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    # Preserve order but drop duplicates so a journal is never written twice in one run
+    return list(dict.fromkeys(ids))
+
+
+async def run_journal_writes(
+    tenant_id_arg,
+    tenant_index,
+    op,
+    journal_ids,
+    params,
+    dry_run=False,
+    oplog_file=None,
+    resume=False,
+    impact_file=None,
+):
+    """
+    Fetch each journal, apply the op's transform, validate every changed journal locally, then send the valid ones.
+
+    Journals rejected by JournalValidator (archived or unknown account, invalid tax type, unbalanced lines, date
+    inside a lock period) are recorded as failed without a request being sent. Progress is recorded in the operation
+    log: with resume, operations completed in a previous run are skipped without fetching them, and with no journal
+    IDs the pending ones are taken from the log. A journal whose earlier attempt has no recorded outcome is simply
+    re-fetched; if the change is already applied the transform finds nothing to do. A 429 (rate limit retries
+    exhausted, or the daily limit reached) stops the run: the journals not yet sent are left pending for --resume.
+
+    A dry run also previews how the changes would move the Profit & Loss and Balance Sheet, per period and account
+    class (see xero_journal_impact.py), classifying lines with the cached chart of accounts. Journals that Xero posts
+    tax for are listed as not previewed.
+    """
+    transform = JOURNAL_TRANSFORMS[op]
+    # edit_journal -> .xero_oplog_journal_edit.jsonl, as for the edit command
+    oplog_file = oplog_file or default_oplog_file("journal_" + op.removesuffix("_journal"))
+    results = {}
+    originals = {}
+
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+
+        with contextlib.ExitStack() as stack:
+            oplog = None if dry_run else stack.enter_context(OperationLog(oplog_file, resume=resume))
+            if journal_ids:
+                targets = [
+                    (journal_id, oplog.plan(tenant_id, op, journal_id, params) if oplog else None, params)
+                    for journal_id in journal_ids
+                ]
+            elif oplog:
+                targets = [(entry["target"], entry["key"], entry["params"]) for entry in oplog.pending(tenant_id, op)]
+            else:
+                targets = []
+            if not targets:
+                print(f"No pending '{op}' operations in {oplog_file} for this tenant.", file=sys.stderr)
+                return
+
+            def fail(journal_id, key, message):
+                if oplog:
+                    oplog.failed(key, message)
+                results[journal_id] = ("error", message)
+
+            pending = []
+            for journal_id, key, op_params in targets:
+                if oplog and oplog.is_done(key):
+                    results[journal_id] = ("skipped", "completed in a previous run")
+                else:
+                    pending.append((journal_id, key, op_params))
+
+            async def prepare(journal_id, op_params):
+                journal = await xero.get_manual_journal(tenant_id, journal_id)
+                if not journal:
+                    raise LookupError(f"Journal {journal_id} not found.")
+                payload = journal_for_update(journal)
+                originals[journal_id] = journal_for_update(journal)
+                return payload if transform(journal_id, payload, op_params) else None
+
+            print(f"Fetching {len(pending)} journal(s)...", file=sys.stderr)
+            validator, *payloads = await asyncio.gather(
+                JournalValidator.load(xero, tenant_id),
+                *(prepare(journal_id, op_params) for journal_id, _, op_params in pending),
+                return_exceptions=True,
+            )
+            if isinstance(validator, Exception):
+                print(f"Error loading organisation settings, accounts or tax rates: {validator}", file=sys.stderr)
+                sys.exit(1)
+
+            changed = []
+            for (journal_id, key, _), payload in zip(pending, payloads):
+                if isinstance(payload, Exception):
+                    fail(journal_id, key, str(payload))
+                elif payload is None:
+                    if oplog:
+                        oplog.done(key, {"changed": False})
+                    results[journal_id] = ("unchanged", "")
+                else:
+                    changed.append((journal_id, key, payload))
+
+            # Validate the whole batch before the first write so bad journals cost no requests
+            problems = await validator.validate_fresh([payload for _, _, payload in changed])
+            to_send = []
+            previews = []
+            for (journal_id, key, payload), journal_problems in zip(changed, problems):
+                if journal_problems:
+                    fail(journal_id, key, "rejected locally: " + "; ".join(journal_problems))
+                elif dry_run:
+                    results[journal_id] = ("dry-run", "")
+                    previews.append((journal_id, originals[journal_id], payload))
+                else:
+                    to_send.append((journal_id, key, payload))
+
+            if dry_run:
+                # Loaded by the validator above, so this is read from the cache
+                chart = await cached_fetch(
+                    tenant_id, ACCOUNTS_FILE, ACCOUNTS_MAX_AGE, lambda: xero.get_accounts(tenant_id)
+                )
+                impact, unclassified, taxed = edit_impact(previews, chart)
+                rows = impact_rows(impact)
+                print_impact(rows, unclassified, taxed)
+                if impact_file:
+                    write_impact(rows, impact_file)
+
+            rate_limited = False
+            # As many in flight as the client sends at once, so a 429 leaves the rest unsent
+            in_flight = asyncio.Semaphore(TENANT_CONCURRENCY)
+
+            async def send(journal_id, key, payload):
+                nonlocal rate_limited
+                async with in_flight:
+                    if rate_limited:
+                        results[journal_id] = ("pending", "not sent after a rate limit; re-run with --resume")
+                        return
+                    request_key = oplog.request_key(key)
+                    oplog.started(key)
+                    try:
+                        await xero.update_manual_journal(tenant_id, journal_id, payload, idempotency_key=request_key)
+                    except XeroApiError as e:
+                        if e.status == 429:
+                            # Refused, so not applied; it stays pending in the log with the unsent ones
+                            rate_limited = True
+                            oplog.failed(key, str(e))
+                            results[journal_id] = ("pending", f"{e}; re-run with --resume")
+                        elif e.status < 500:
+                            fail(journal_id, key, str(e))
+                        else:
+                            results[journal_id] = ("error", f"outcome unknown ({e}); re-run with --resume")
+                        return
+                    except Exception as e:
+                        # No answer: leave the operation marked started so --resume re-checks the journal
+                        results[journal_id] = ("error", f"outcome unknown ({e}); re-run with --resume")
+                        return
+                    oplog.done(key, {"changed": True})
+                    results[journal_id] = ("updated", "")
 
-        if not journal_response.manual_journals:
-            print(f"Journal {journal_id} not found.", file=sys.stderr)
-            return
+            if to_send:
+                print(f"Sending {len(to_send)} journal update(s)...", file=sys.stderr)
+                await asyncio.gather(*(send(*item) for item in to_send))
+                drop_reports(tenant_id)
 
-        journal = journal_response.manual_journals[0]
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["JournalID", "Status", "Message"])
+    for journal_id, _, _ in targets:
+        writer.writerow([journal_id, *results[journal_id]])
+
+    failed = sum(1 for outcome, _ in results.values() if outcome == "error")
+    unsent = sum(1 for outcome, _ in results.values() if outcome == "pending")
+    if failed:
+        print(f"{failed} of {len(targets)} journal(s) failed. Fix the cause and re-run with --resume.", file=sys.stderr)
+    if unsent:
+        print(f"Rate limited: {unsent} of {len(targets)} journal(s) not sent. Re-run with --resume.", file=sys.stderr)
+    if failed or unsent:
+        sys.exit(1)
 
-        if journal.status != "DRAFT":
-            print(f"Journal {journal_id} is not a draft (status: {journal.status}). Cannot post.", file=sys.stderr)
-            return
 
-        print(f"Posting Journal: {journal.manual_journal_id} - {journal.narration}")
-        journal.status = "POSTED"
+def read_journal_csv(path, default_status="DRAFT"):
+    """Group CSV lines into journals by JournalKey (or Date and Narration), preserving file order."""
+    journals = {}
+    with open(path, "r", newline="") as f:
+        # Line 1 is the header, so data rows start at 2
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+            key = row.get("JournalKey") or f"{row.get('Date', '')}|{row.get('Narration', '')}"
+            journal = journals.setdefault(
+                key,
+                {
+                    "Key": key,
+                    "Date": row.get("Date", ""),
+                    "Narration": row.get("Narration", ""),
+                    "Status": (row.get("Status") or default_status).upper(),
+                    "JournalLines": [],
+                    "Rows": [],
+                },
+            )
+            journal["JournalLines"].append(
+                {
+                    "AccountCode": row.get("AccountCode", ""),
+                    "Description": row.get("Description", ""),
+                    "LineAmount": row.get("LineAmount", ""),
+                    "TaxType": row.get("TaxType", ""),
+                }
+            )
+            journal["Rows"].append(line_number)
+    return list(journals.values())
+
+
+def journal_payload(journal):
+    return {
+        "Narration": journal["Narration"],
+        "Date": journal["Date"],
+        "Status": journal["Status"],
+        "JournalLines": [
+            {k: (Decimal(v) if k == "LineAmount" else v) for k, v in line.items() if v}
+            for line in journal["JournalLines"]
+        ],
+    }
+
+
+async def find_created_journal(xero, tenant_id, journal):
+    """
+    ManualJournalID of an existing journal matching this one's narration, date and lines, if any.
+
+    Only the date is filtered on by Xero; the narration is compared here, as it may contain quotes or other characters
+    that a where filter would have to escape.
+    """
+    year, month, day = (int(part) for part in journal["Date"].split("-"))
+    candidates = await xero.get_all_manual_journals(tenant_id, where=f"Date==DateTime({year},{month},{day})")
+    expected = sorted((line["AccountCode"], Decimal(line["LineAmount"])) for line in journal["JournalLines"])
+    for candidate in candidates:
+        lines = sorted((line["AccountCode"], line["LineAmount"]) for line in candidate.get("JournalLines") or [])
+        if (candidate.get("Narration") or "") == journal["Narration"] and lines == expected:
+            return candidate["ManualJournalID"]
+    return None
+
+
+async def create_journals(tenant_id_arg, tenant_index, path, status, batch_size, dry_run, oplog_file, resume):
+    journals = read_journal_csv(path, status)
+    results = {}
+
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        validator = await JournalValidator.load(xero, tenant_id)
+
+        valid = []
+        for journal, problems in zip(journals, await validator.validate_fresh(journals)):
+            if problems:
+                results[journal["Key"]] = ("invalid", "", "; ".join(problems))
+            elif dry_run:
+                results[journal["Key"]] = ("dry-run", "", "")
+            else:
+                valid.append(journal)
+
+        if valid:
+            with OperationLog(oplog_file, resume=resume) as oplog:
+                pending = []
+                for journal in valid:
+                    payload = journal_payload(journal)
+                    key = oplog.plan(tenant_id, "create_journal", journal["Key"], payload)
+                    if oplog.is_done(key):
+                        results[journal["Key"]] = ("skipped", "", "created in a previous run")
+                    elif oplog.is_uncertain(key) and (existing := await find_created_journal(xero, tenant_id, journal)):
+                        oplog.done(key, {"manual_journal_id": existing})
+                        results[journal["Key"]] = ("skipped", existing, "found from a previous run")
+                    else:
+                        pending.append((journal, payload, key))
+
+                rate_limited = False
+                # As many batches in flight as the client sends at once, so a 429 leaves the rest unsent
+                in_flight = asyncio.Semaphore(TENANT_CONCURRENCY)
+
+                async def submit(batch):
+                    async with in_flight:
+                        if rate_limited:
+                            for journal, _, _ in batch:
+                                message = "not sent after a rate limit; re-run with --resume"
+                                results[journal["Key"]] = ("pending", "", message)
+                            return
+                        await send_batch(batch)
+
+                async def send_batch(batch):
+                    nonlocal rate_limited
+                    request_keys = [oplog.request_key(key) for _, _, key in batch]
+                    batch_key = make_idempotency_key(tenant_id, "create_journals", "", {"keys": request_keys})
+                    for _, _, key in batch:
+                        oplog.started(key)
+                    try:
+                        created = await xero.create_manual_journals(
+                            tenant_id, [payload for _, payload, _ in batch], idempotency_key=batch_key
+                        )
+                    except XeroApiError as e:
+                        # A 429 stops the run: this batch and the unsent ones stay pending for --resume
+                        rate_limited = rate_limited or e.status == 429
+                        for journal, _, key in batch:
+                            if e.status < 500:
+                                # Xero answered, so nothing in this batch was created
+                                oplog.failed(key, str(e))
+                            if e.status == 429:
+                                results[journal["Key"]] = ("pending", "", f"{e}; re-run with --resume")
+                            else:
+                                results[journal["Key"]] = ("error", "", str(e))
+                        return
+                    except Exception as e:
+                        # No answer: leave the journals marked started so --resume re-checks them
+                        for journal, _, key in batch:
+                            results[journal["Key"]] = ("error", "", f"outcome unknown ({e}); re-run with --resume")
+                        return
+
+                    for (journal, _, key), item in zip(batch, created):
+                        errors = [v.get("Message", "") for v in item.get("ValidationErrors") or []]
+                        if item.get("StatusAttributeString") == "ERROR" or errors:
+                            oplog.failed(key, "; ".join(errors))
+                            results[journal["Key"]] = ("error", "", "; ".join(errors))
+                        else:
+                            oplog.done(key, {"manual_journal_id": item.get("ManualJournalID")})
+                            results[journal["Key"]] = ("created", item.get("ManualJournalID", ""), "")
+
+                batches = []
+                for start in range(0, len(pending), batch_size):
+                    end = start + batch_size
+                    batches.append(pending[start:end])
+                print(f"Submitting {len(pending)} journal(s) in {len(batches)} batch(es)...", file=sys.stderr)
+                await asyncio.gather(*(submit(batch) for batch in batches))
+                drop_reports(tenant_id)
 
-        accounting_api.update_manual_journal(
-            tenant_id,
-            journal_id,
-            manual_journals=ManualJournals(manual_journals=[journal]),
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["JournalKey", "Date", "Narration", "Lines", "CsvRows", "Status", "ManualJournalID", "Message"])
+    for journal in journals:
+        outcome, journal_id, message = results[journal["Key"]]
+        rows = f"{journal['Rows'][0]}-{journal['Rows'][-1]}"
+        writer.writerow(
+            [
+                journal["Key"],
+                journal["Date"],
+                journal["Narration"],
+                len(journal["JournalLines"]),
+                rows,
+                outcome,
+                journal_id,
+                message,
+            ]
         )
-        print("Journal posted successfully.")
 
-    except Exception as e:
-        print(f"Error posting journal: {e}", file=sys.stderr)
+    failed = sum(1 for outcome, _, _ in results.values() if outcome in ("invalid", "error"))
+    unsent = sum(1 for outcome, _, _ in results.values() if outcome == "pending")
+    print(f"{len(journals)} journal(s) processed, {failed} with errors.", file=sys.stderr)
+    if unsent:
+        print(
+            f"Rate limited: {unsent} journal(s) not sent. Re-run with --resume once the limit resets.", file=sys.stderr
+        )
+    if failed or unsent:
         sys.exit(1)
 
 
 def resolve_tenant(api_client, tenant_id_arg=None, tenant_index=None):
-    identity_api = IdentityApi(api_client)
-    connections = identity_api.get_connections()
+    connections = sdk_connections(api_client)
 
     if not connections:
         print("No connections found.", file=sys.stderr)
@@ -318,7 +968,20 @@ def resolve_tenant(api_client, tenant_id_arg=None, tenant_index=None):
     return tenant_id or chosen.tenant_id
 
 
-def main():
+def add_oplog_arguments(subparser, command):
+    subparser.add_argument(
+        "--oplog",
+        default=default_oplog_file(command),
+        help="Write-ahead operation log used to resume interrupted runs (default: %(default)s)",
+    )
+    subparser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue a previous run, skipping operations the operation log records as completed",
+    )
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Manage Xero Manual Journals")
     parser.add_argument("--tenant-id", help="Tenant ID to use (defaults to the first connection)")
     parser.add_argument(
@@ -331,71 +994,253 @@ def main():
     # View command
     view_parser = subparsers.add_parser("view", help="List all manual journals in CSV format")
     view_parser.add_argument("query", nargs="?", help="Filter query (e.g. \"AccountCode == '810'\")")
+    add_listing_arguments(view_parser, VIEW_COLUMNS, sort_memory=True)
+    view_parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep running and print only new or changed lines, with a ChangeType column",
+    )
+    view_parser.add_argument(
+        "--interval",
+        type=float,
+        default=60,
+        help="Seconds between polls with --follow (default: 60; longer when the daily API allowance runs low)",
+    )
+    view_parser.add_argument(
+        "--format",
+        choices=("csv", "ndjson"),
+        default="csv",
+        help="Output format for --follow (default: csv)",
+    )
+    view_parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Query the local journal store (synced first) on all cores instead of paging the API",
+    )
+    view_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Query the local journal store without syncing it first (implies --local)",
+    )
+    view_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="With --local, list every journal first, dropping those deleted in Xero (otherwise done once a day)",
+    )
+    add_workers_argument(view_parser)
 
     # Edit command
-    edit_parser = subparsers.add_parser("edit", help="Edit a manual journal")
-    edit_parser.add_argument("--journal-id", required=True, help="The ID of the journal to edit")
-    edit_parser.add_argument("--find-account", required=True, help="The account code to find")
-    edit_parser.add_argument("--new-account", required=True, help="The new account code")
+    edit_parser = subparsers.add_parser("edit", help="Edit one or more manual journals")
+    edit_parser.add_argument(
+        "--journal-id",
+        action="append",
+        help="The ID of a journal to edit (repeat for several journals)",
+    )
+    edit_parser.add_argument("--journal-ids-file", help="File with one journal ID per line ('-' for stdin)")
+    edit_parser.add_argument("--find-account", help="The account code to find")
+    edit_parser.add_argument("--new-account", help="The new account code")
     edit_parser.add_argument(
         "--dry-run",
         action="store_true",
-        help="Simulate the edit without applying changes",
+        help="Simulate the edit without applying changes, previewing its effect on the reports",
     )
+    edit_parser.add_argument("--impact", metavar="FILE", help="With --dry-run, also write the report impact as CSV")
+    add_oplog_arguments(edit_parser, "journal_edit")
 
     # Post command
-    post_parser = subparsers.add_parser("post", help="Post a draft manual journal")
-    post_parser.add_argument("--journal-id", required=True, help="The ID of the journal to post")
+    post_parser = subparsers.add_parser("post", help="Post one or more draft manual journals")
+    post_parser.add_argument(
+        "--journal-id",
+        action="append",
+        help="The ID of a journal to post (repeat for several journals)",
+    )
+    post_parser.add_argument("--journal-ids-file", help="File with one journal ID per line ('-' for stdin)")
+    post_parser.add_argument(
+        "--dry-run", action="store_true", help="Validate without posting, previewing the effect on the reports"
+    )
+    post_parser.add_argument("--impact", metavar="FILE", help="With --dry-run, also write the report impact as CSV")
+    add_oplog_arguments(post_parser, "journal_post")
+
+    # Summarize command
+    summarize_parser = subparsers.add_parser("summarize", help="Sum journal line amounts by account, period, ...")
+    summarize_parser.add_argument(
+        "--by",
+        type=lambda value: value.split(","),
+        default=["AccountCode", "Month"],
+        help=f"Comma-separated columns to group by, the last one pivoted (from: {', '.join(SUMMARY_DIMENSIONS)})",
+    )
+    summarize_parser.add_argument("query", nargs="?", help="Filter query (e.g. \"Status == 'POSTED'\")")
+    summarize_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Summarize the local journal store without first fetching journals changed since the last run",
+    )
+    summarize_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="List every journal first, dropping those deleted in Xero (otherwise done once a day)",
+    )
+    add_workers_argument(summarize_parser)
+
+    # Search command
+    search_parser = subparsers.add_parser("search", help="Full-text search of narrations and line descriptions")
+    search_parser.add_argument("terms", help='Search terms (FTS5 syntax: words, "phrases", OR, NOT, prefix*)')
+    search_parser.add_argument("--account", help="Only lines on this account code")
+    search_parser.add_argument("--status", help="Only journals with this status (e.g. POSTED)")
+    search_parser.add_argument("--from", dest="date_from", help="Only journals dated on or after YYYY-MM-DD")
+    search_parser.add_argument("--to", dest="date_to", help="Only journals dated on or before YYYY-MM-DD")
+    search_parser.add_argument("--limit", type=int, default=50, help="Maximum number of lines (default: 50)")
+    search_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Search the local index without first fetching journals changed since the last search",
+    )
+    search_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="List every journal first, dropping those deleted in Xero from the index (otherwise done once a day)",
+    )
 
-    args = parser.parse_args()
+    # Balance command
+    balance_parser = subparsers.add_parser("balance", help="Running balance of ledger accounts from a local index")
+    balance_parser.add_argument(
+        "--account",
+        action="append",
+        default=[],
+        help="Account code (or AccountID for accounts without a code); may be repeated (default: all accounts)",
+    )
+    balance_parser.add_argument(
+        "--at",
+        action="append",
+        default=[],
+        type=lambda value: datetime.strptime(value, "%Y-%m-%d").date().isoformat(),
+        help="Balance at the end of YYYY-MM-DD; may be repeated (default: today)",
+    )
+    balance_parser.add_argument("--series", action="store_true", help="Print every dated movement and balance")
+    balance_parser.add_argument("--from", dest="date_from", help="With --series, only dates on or after YYYY-MM-DD")
+    balance_parser.add_argument("--to", dest="date_to", help="With --series, only dates on or before YYYY-MM-DD")
+    balance_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use the local index without first fetching journals added since the last run",
+    )
 
-    config = load_config()
-    token_data = load_token()
+    # Create command
+    create_parser = subparsers.add_parser("create", help="Create manual journals from a CSV file of lines")
+    create_parser.add_argument("file", help="CSV file with one journal line per row")
+    create_parser.add_argument(
+        "--status",
+        choices=("DRAFT", "POSTED"),
+        default="DRAFT",
+        help="Status for journals without a Status column (default: DRAFT)",
+    )
+    create_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=50,
+        help="Journals per ManualJournals request (default: 50)",
+    )
+    create_parser.add_argument("--dry-run", action="store_true", help="Validate and report without creating")
+    add_oplog_arguments(create_parser, "journal_create")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        run(
+            create_journals(
+                args.tenant_id,
+                args.tenant_index,
+                args.file,
+                args.status,
+                args.batch_size,
+                args.dry_run,
+                args.oplog,
+                args.resume,
+            )
+        )
+        return
 
-    if not token_data:
+    if args.command == "summarize":
+        unknown = [column for column in args.by if column not in SUMMARY_DIMENSIONS]
+        if unknown:
+            parser.error(f"unknown --by column(s): {', '.join(unknown)}")
+        tenant_id, ranges = run(
+            local_journal_ranges(args.tenant_id, args.tenant_index, args.offline, args.workers, args.full)
+        )
+        summarize_journals(tenant_id, ranges, args.by, args.query, args.workers)
         return
 
-    # Create the token object first
-    oauth2_token = OAuth2Token(client_id=config["CLIENT_ID"], client_secret=config["CLIENT_SECRET"])
-    oauth2_token.update_token(**token_data)
+    if args.command == "search":
+        filters = {
+            "account_code": args.account,
+            "status": args.status,
+            "date_from": args.date_from,
+            "date_to": args.date_to,
+        }
+        run(
+            search_journals(args.tenant_id, args.tenant_index, args.terms, filters, args.limit, args.offline, args.full)
+        )
+        return
 
-    api_client = ApiClient(
-        Configuration(debug=False, oauth2_token=oauth2_token),
-        pool_threads=1,
-    )
+    if args.command == "balance":
+        run(
+            account_balances(
+                args.tenant_id,
+                args.tenant_index,
+                args.account,
+                args.at or [datetime.now().date().isoformat()],
+                args.series,
+                args.date_from,
+                args.date_to,
+                args.offline,
+            )
+        )
+        return
 
-    @api_client.oauth2_token_getter
-    def obtain_xero_oauth2_token():
-        return token_data
+    if args.command == "view" and args.follow:
+        try:
+            run(follow_journals(args.tenant_id, args.tenant_index, args.query, args.interval, args.format))
+        except KeyboardInterrupt:
+            pass
+        return
 
-    @api_client.oauth2_token_saver
-    def store_xero_oauth2_token(token):
-        nonlocal token_data
-        token_data = token
-        with open(".xero_token.json", "w") as f:
-            json.dump(token, f, indent=4)
+    if args.command == "view" and (args.local or args.offline):
+        tenant_id, ranges = run(
+            local_journal_ranges(args.tenant_id, args.tenant_index, args.offline, args.workers, args.full)
+        )
+        list_local_journals(tenant_id, ranges, args.query, args.limit, args.sort, args.sort_memory, args.workers)
+        return
 
-    # Refresh token
-    try:
-        api_client.refresh_oauth2_token()
-    except Exception as e:
-        print(f"Warning: Token refresh failed: {e}", file=sys.stderr)
+    if args.command in ("edit", "post"):
+        journal_ids = read_journal_ids(args.journal_id, args.journal_ids_file)
+        if not journal_ids and not args.resume:
+            parser.error("--journal-id or --journal-ids-file is required (or --resume to continue a previous run)")
+        if args.command == "edit" and journal_ids and not (args.find_account and args.new_account):
+            parser.error("--find-account and --new-account are required when journal IDs are given")
+        if args.command == "edit":
+            op, params = "edit_journal", {"find_account": args.find_account, "new_account": args.new_account}
+        else:
+            op, params = "post_journal", {}
+        run(
+            run_journal_writes(
+                args.tenant_id,
+                args.tenant_index,
+                op,
+                journal_ids,
+                params,
+                args.dry_run,
+                args.oplog,
+                args.resume,
+                args.impact,
+            )
+        )
+        return
 
+    api_client = sdk_client()
     tenant_id = resolve_tenant(api_client, args.tenant_id, args.tenant_index)
 
     if args.command == "view":
-        list_journals(api_client, tenant_id, args.query)
-    elif args.command == "edit":
-        edit_journal(
-            api_client,
-            tenant_id,
-            args.journal_id,
-            args.find_account,
-            args.new_account,
-            args.dry_run,
-        )
-    elif args.command == "post":
-        post_journal(api_client, tenant_id, args.journal_id)
+        list_journals(api_client, tenant_id, args.query, args.limit, args.sort, args.sort_memory)
     else:
         parser.print_help()
 
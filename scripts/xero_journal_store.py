@@ -0,0 +1,441 @@
+"""
+Xero Local Journal Store
+
+A per-tenant SQLite mirror of the manual journals and general ledger journals
+(.xero_cache/<tenant_id>/journals.sqlite), kept up to date incrementally: sync_manual_journals() asks Xero only for
+journals modified since the newest UpdatedDateUTC already stored, and sync_gl_journals() only for ledger journals
+numbered above the last one stored, so a sync with no changes costs one request. Amounts are stored as decimal
+strings and read back as Decimal.
+
+If-Modified-Since never reports deletions (a draft journal deleted in Xero simply stops being listed), so once every
+PRUNE_INTERVAL, or when asked for a full sync, sync_manual_journals() lists every journal instead and deletes the
+stored journals Xero no longer returns, with their lines and index rows.
+
+Narration and line Description are indexed with SQLite FTS5 (one index row per line), so full-text searches rank
+hundreds of thousands of lines by bm25 in milliseconds.
+
+Ledger lines also maintain a running balance per account and date (account_balances). A sync only recomputes each
+affected account from the earliest date it touched, and BalanceIndex loads the table into sorted arrays so a
+balance at any date is a binary search.
+"""
+
+import asyncio
+import bisect
+import sqlite3
+from decimal import Decimal
+
+from xero_async_client import parse_xero_date, parse_xero_timestamp
+from xero_cache import age_seconds, tenant_cache_path, utc_now
+
+STORE_FILE = "journals.sqlite"
+JOURNALS_PAGE_SIZE = 100
+# Seconds between full listings of the manual journals that drop the ones deleted in Xero
+PRUNE_INTERVAL = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS manual_journals (
+    journal_id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    narration TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS manual_journal_lines (
+    journal_id TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    account_code TEXT,
+    description TEXT,
+    line_amount TEXT NOT NULL,
+    tax_type TEXT,
+    PRIMARY KEY (journal_id, line_no)
+);
+CREATE TABLE IF NOT EXISTS gl_journal_lines (
+    journal_number INTEGER NOT NULL,
+    line_no INTEGER NOT NULL,
+    journal_date TEXT NOT NULL,
+    account TEXT NOT NULL,
+    account_id TEXT,
+    account_type TEXT,
+    net_amount TEXT NOT NULL,
+    PRIMARY KEY (journal_number, line_no)
+);
+CREATE INDEX IF NOT EXISTS gl_journal_lines_account ON gl_journal_lines (account, journal_date);
+CREATE TABLE IF NOT EXISTS account_balances (
+    account TEXT NOT NULL,
+    date TEXT NOT NULL,
+    movement TEXT NOT NULL,
+    balance TEXT NOT NULL,
+    PRIMARY KEY (account, date)
+);
+CREATE INDEX IF NOT EXISTS manual_journal_lines_account ON manual_journal_lines (account_code);
+CREATE INDEX IF NOT EXISTS manual_journals_date ON manual_journals (date);
+-- rowid of each index row is the rowid of its manual_journal_lines row
+CREATE VIRTUAL TABLE IF NOT EXISTS manual_journal_lines_fts USING fts5(
+    narration, description, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Columns of a manual journal line row, as printed by xero_journal_manager.py view
+LINE_COLUMNS = ["JournalID", "Date", "Narration", "Status", "AccountCode", "Description", "LineAmount", "TaxType"]
+
+
+class JournalStore:
+    def __init__(self, tenant_id, path=None):
+        self.tenant_id = tenant_id
+        self.db = sqlite3.connect(path or tenant_cache_path(tenant_id, STORE_FILE), timeout=30)
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def upsert_manual_journals(self, journals):
+        """Replace the stored copy (header, lines and index rows) of each ManualJournal from the API."""
+        with self.db:
+            for journal in journals:
+                journal_id = journal["ManualJournalID"]
+                narration = journal.get("Narration") or ""
+                self._delete_manual_journal_lines(journal_id)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO manual_journals VALUES (?, ?, ?, ?, ?)",
+                    (
+                        journal_id,
+                        str(parse_xero_date(journal["Date"]))[:10],
+                        narration,
+                        journal.get("Status", ""),
+                        journal.get("UpdatedDateUTC"),
+                    ),
+                )
+                for line_no, line in enumerate(journal.get("JournalLines") or []):
+                    description = line.get("Description") or ""
+                    cursor = self.db.execute(
+                        "INSERT INTO manual_journal_lines VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            journal_id,
+                            line_no,
+                            line.get("AccountCode", ""),
+                            description,
+                            str(line.get("LineAmount", 0)),
+                            line.get("TaxType", ""),
+                        ),
+                    )
+                    self.db.execute(
+                        "INSERT INTO manual_journal_lines_fts (rowid, narration, description) VALUES (?, ?, ?)",
+                        (cursor.lastrowid, narration, description),
+                    )
+
+    def _delete_manual_journal_lines(self, journal_id):
+        self.db.execute(
+            "DELETE FROM manual_journal_lines_fts WHERE rowid IN "
+            "(SELECT rowid FROM manual_journal_lines WHERE journal_id = ?)",
+            (journal_id,),
+        )
+        self.db.execute("DELETE FROM manual_journal_lines WHERE journal_id = ?", (journal_id,))
+
+    def delete_manual_journals(self, journal_ids):
+        """Remove journals (header, lines and index rows) from the store."""
+        with self.db:
+            for journal_id in journal_ids:
+                self._delete_manual_journal_lines(journal_id)
+                self.db.execute("DELETE FROM manual_journals WHERE journal_id = ?", (journal_id,))
+
+    def manual_journal_versions(self):
+        """{journal_id: UpdatedDateUTC as stored} of every stored journal."""
+        return dict(self.db.execute("SELECT journal_id, updated_at FROM manual_journals"))
+
+    def upsert_gl_journals(self, journals):
+        """
+        Store general ledger journals (lines keyed by AccountCode, or AccountID for accounts without a code).
+
+        Returns {account: earliest journal date} of the lines written, for rebuild_balances().
+        """
+        affected = {}
+        with self.db:
+            for journal in journals:
+                journal_date = str(parse_xero_date(journal["JournalDate"]))[:10]
+                for line_no, line in enumerate(journal.get("JournalLines") or []):
+                    account = line.get("AccountCode") or line["AccountID"]
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO gl_journal_lines VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            journal["JournalNumber"],
+                            line_no,
+                            journal_date,
+                            account,
+                            line.get("AccountID"),
+                            line.get("AccountType"),
+                            str(line.get("NetAmount", 0)),
+                        ),
+                    )
+                    affected[account] = min(affected.get(account, journal_date), journal_date)
+        return affected
+
+    def rebuild_balances(self, affected):
+        """Recompute the running balances of each account from the given date onward."""
+        with self.db:
+            for account, since in affected.items():
+                row = self.db.execute(
+                    "SELECT balance FROM account_balances WHERE account = ? AND date < ? ORDER BY date DESC LIMIT 1",
+                    (account, since),
+                ).fetchone()
+                balance = Decimal(row[0]) if row else Decimal(0)
+                self.db.execute("DELETE FROM account_balances WHERE account = ? AND date >= ?", (account, since))
+
+                movements = {}
+                for journal_date, amount in self.db.execute(
+                    "SELECT journal_date, net_amount FROM gl_journal_lines WHERE account = ? AND journal_date >= ?",
+                    (account, since),
+                ):
+                    movements[journal_date] = movements.get(journal_date, Decimal(0)) + Decimal(amount)
+                for journal_date in sorted(movements):
+                    balance += movements[journal_date]
+                    self.db.execute(
+                        "INSERT INTO account_balances VALUES (?, ?, ?, ?)",
+                        (account, journal_date, str(movements[journal_date]), str(balance)),
+                    )
+
+    def manual_journal_lines(self, date_from=None, date_to=None):
+        """Stored manual journal lines as view rows, ordered by date, journal and line; optionally only a date range."""
+        sql = """
+            SELECT j.journal_id, j.date, j.narration, j.status, l.account_code, l.description, l.line_amount, l.tax_type
+            FROM manual_journal_lines l JOIN manual_journals j ON j.journal_id = l.journal_id
+            WHERE 1
+        """
+        params = []
+        for condition, value in (("j.date >= ?", date_from), ("j.date <= ?", date_to)):
+            if value is not None:
+                sql += f" AND {condition}"
+                params.append(str(value))
+        for values in self.db.execute(sql + " ORDER BY j.date, j.journal_id, l.line_no", params):
+            row = dict(zip(LINE_COLUMNS, values))
+            row["LineAmount"] = Decimal(row["LineAmount"])
+            yield row
+
+    def manual_journal_line_dates(self):
+        """[(date, number of lines)] of the stored manual journals, by date."""
+        return self.db.execute(
+            """
+            SELECT j.date, COUNT(*) FROM manual_journal_lines l JOIN manual_journals j ON j.journal_id = l.journal_id
+            GROUP BY j.date ORDER BY j.date
+            """
+        ).fetchall()
+
+    def gl_journal_lines(self, dated_after=None, max_journal_number=None):
+        """
+        Stored general ledger lines, ordered by journal number and line; optionally only those dated after a date
+        (YYYY-MM-DD) and of journals numbered up to max_journal_number.
+        """
+        sql = """
+            SELECT journal_number, journal_date, account, account_id, account_type, net_amount
+            FROM gl_journal_lines WHERE 1
+        """
+        params = []
+        for condition, value in (("journal_date > ?", dated_after), ("journal_number <= ?", max_journal_number)):
+            if value is not None:
+                sql += f" AND {condition}"
+                params.append(value)
+        for number, journal_date, account, account_id, account_type, amount in self.db.execute(
+            sql + " ORDER BY journal_number, line_no", params
+        ):
+            yield {
+                "JournalNumber": number,
+                "Date": journal_date,
+                "Account": account,
+                "AccountID": account_id,
+                "AccountType": account_type,
+                "NetAmount": Decimal(amount),
+            }
+
+    def ledger_accounts(self):
+        """{AccountID: account key used in gl_journal_lines and account_balances} for every account with lines."""
+        return dict(
+            self.db.execute("SELECT DISTINCT account_id, account FROM gl_journal_lines WHERE account_id IS NOT NULL")
+        )
+
+    def search(self, terms, account_code=None, status=None, date_from=None, date_to=None, limit=50):
+        """
+        Lines matching an FTS5 query (e.g. 'loan repayment', '"loan repayment" OR 0x12ab*'), best match first.
+
+        Returns (score, row) pairs, rows being dicts like the view rows; the score is bm25 (lower is better).
+        Raises sqlite3.OperationalError for a malformed query.
+        """
+        sql = """
+            SELECT bm25(manual_journal_lines_fts), j.journal_id, j.date, j.narration, j.status,
+                   l.account_code, l.description, l.line_amount, l.tax_type
+            FROM manual_journal_lines_fts f
+            JOIN manual_journal_lines l ON l.rowid = f.rowid
+            JOIN manual_journals j ON j.journal_id = l.journal_id
+            WHERE manual_journal_lines_fts MATCH ?
+        """
+        params = [terms]
+        for condition, value in (
+            ("l.account_code = ?", account_code),
+            ("j.status = ?", status),
+            ("j.date >= ?", date_from),
+            ("j.date <= ?", date_to),
+        ):
+            if value is not None:
+                sql += f" AND {condition}"
+                params.append(str(value))
+        sql += " ORDER BY bm25(manual_journal_lines_fts) LIMIT ?"
+        params.append(limit)
+
+        results = []
+        for score, *values in self.db.execute(sql, params):
+            row = dict(zip(LINE_COLUMNS, values))
+            row["LineAmount"] = Decimal(row["LineAmount"])
+            results.append((score, row))
+        return results
+
+
+class BalanceIndex:
+    """
+    In-memory running balances: per account, sorted dates with the movement on and the balance after each date.
+
+    A balance at a date is a bisect over the account's dates, so thousands of lookups take milliseconds.
+    """
+
+    def __init__(self, accounts):
+        self.accounts = accounts
+
+    @classmethod
+    def load(cls, store):
+        accounts = {}
+        for account, balance_date, movement, balance in store.db.execute(
+            "SELECT account, date, movement, balance FROM account_balances ORDER BY account, date"
+        ):
+            dates, movements, balances = accounts.setdefault(account, ([], [], []))
+            dates.append(balance_date)
+            movements.append(Decimal(movement))
+            balances.append(Decimal(balance))
+        return cls(accounts)
+
+    def balance_at(self, account, at):
+        """Balance of the account at the end of the date `at` (YYYY-MM-DD), Decimal 0 before its first line."""
+        if account not in self.accounts:
+            return Decimal(0)
+        dates, _, balances = self.accounts[account]
+        i = bisect.bisect_right(dates, str(at))
+        return balances[i - 1] if i else Decimal(0)
+
+    def series(self, account, date_from=None, date_to=None):
+        """(date, movement, balance) for each date the account moved, optionally limited to a date range."""
+        dates, movements, balances = self.accounts.get(account, ([], [], []))
+        start = bisect.bisect_left(dates, str(date_from)) if date_from else 0
+        end = bisect.bisect_right(dates, str(date_to)) if date_to else len(dates)
+        return list(zip(dates[start:end], movements[start:end], balances[start:end]))
+
+
+async def latest_journal_number(xero, tenant_id):
+    """
+    Highest general ledger JournalNumber, found by probing offsets.
+
+    The Journals endpoint pages by offset (100 journals numbered above it), so the head of the ledger is located by
+    exponential probing followed by a binary search: about 2*log2(n/100) small requests instead of reading them all.
+    """
+
+    async def probe(offset):
+        return await xero.get_journals(tenant_id, offset=offset)
+
+    lo, step = 0, 1000
+    batch = await probe(lo)
+    while len(batch) == JOURNALS_PAGE_SIZE:
+        hi = lo + step
+        upper = await probe(hi)
+        if len(upper) < JOURNALS_PAGE_SIZE:
+            if upper:
+                return max(j["JournalNumber"] for j in upper)
+            # The head is in (lo, hi]; narrow it down until a probe returns a partial page
+            while True:
+                mid = (lo + hi) // 2
+                batch = await probe(mid)
+                if not batch:
+                    hi = mid
+                elif len(batch) == JOURNALS_PAGE_SIZE:
+                    lo = mid
+                else:
+                    return max(j["JournalNumber"] for j in batch)
+        lo, step, batch = hi, step * 2, upper
+    return max((j["JournalNumber"] for j in batch), default=lo)
+
+
+async def sync_gl_journals(xero, store):
+    """
+    Fetch general ledger journals numbered above the last one stored and update the running balances.
+
+    Ledger journals are never changed once written, so the stored offset is all the state needed. The first page
+    tells whether more are waiting; if so the head is located and the remaining pages are fetched concurrently.
+    """
+    offset = int(store.get_meta("gl_journal_offset", 0))
+    journals = await xero.get_journals(store.tenant_id, offset=offset)
+    if len(journals) == JOURNALS_PAGE_SIZE:
+        start = max(journal["JournalNumber"] for journal in journals)
+        latest = await latest_journal_number(xero, store.tenant_id)
+        # Pages overlap where numbers have gaps; rows are keyed by journal and line number, so that is harmless
+        pages = await asyncio.gather(
+            *(
+                xero.get_journals(store.tenant_id, offset=page_offset)
+                for page_offset in range(start, latest, JOURNALS_PAGE_SIZE)
+            )
+        )
+        journals += [journal for page in pages for journal in page]
+    if not journals:
+        return 0
+    store.rebuild_balances(store.upsert_gl_journals(journals))
+    with store.db:
+        store.set_meta("gl_journal_offset", str(max(journal["JournalNumber"] for journal in journals)))
+    return len({journal["JournalNumber"] for journal in journals})
+
+
+def quote_terms(terms):
+    """Turn free text into an FTS5 query matching all words literally (for input FTS5 cannot parse)."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in terms.split())
+
+
+async def sync_manual_journals(xero, store, full=False):
+    """
+    Fetch manual journals changed since the last sync into the store; returns how many were updated or deleted.
+
+    With full, or when the last full listing is older than PRUNE_INTERVAL, every journal is listed: the changed ones
+    are stored and stored journals missing from the listing (deleted in Xero) are deleted. That listing bypasses the
+    HTTP cache, whose If-Modified-Since revalidation would vouch for a cached listing that still has them.
+
+    Xero's If-Modified-Since is inclusive, so the newest journal of the last sync comes back every time; journals whose
+    UpdatedDateUTC is the one already stored are skipped and not counted.
+    """
+    since = store.get_meta("manual_journals_updated_at")
+    pruned_at = store.get_meta("manual_journals_pruned_at")
+    full = full or not since or not pruned_at or age_seconds(pruned_at) >= PRUNE_INTERVAL
+    if full:
+        journals = await xero.get_all_manual_journals(store.tenant_id, fresh=True)
+    else:
+        journals = await xero.get_all_manual_journals(store.tenant_id, if_modified_since=parse_xero_timestamp(since))
+    stored = store.manual_journal_versions()
+    deleted = set()
+    if full:
+        deleted = stored.keys() - {journal["ManualJournalID"] for journal in journals}
+        store.delete_manual_journals(deleted)
+        with store.db:
+            store.set_meta("manual_journals_pruned_at", utc_now().isoformat())
+    journals = [journal for journal in journals if stored.get(journal["ManualJournalID"]) != journal["UpdatedDateUTC"]]
+    if not journals:
+        return len(deleted)
+    store.upsert_manual_journals(journals)
+    newest = max(journals, key=lambda journal: parse_xero_timestamp(journal["UpdatedDateUTC"]))["UpdatedDateUTC"]
+    if not since or parse_xero_timestamp(newest) > parse_xero_timestamp(since):
+        with store.db:
+            store.set_meta("manual_journals_updated_at", newest)
+    return len(journals) + len(deleted)
@@ -0,0 +1,171 @@
+"""
+Xero Listing Helpers
+
+Shared --sort / --limit handling for the list commands. Rows are dicts (the same ones the filter query is evaluated
+against) produced lazily, page by page, so a limit can stop paging as soon as enough rows have been seen.
+
+A sort without a limit is an external merge sort: rows are collected up to a memory budget (--sort-memory), each
+full buffer is sorted and spilled to a temporary file as a run, and the runs are merged lazily with heapq.merge while
+the output is written. Exports of any size are sorted in fixed memory; when everything fits in the budget nothing
+touches the disk.
+"""
+
+import argparse
+import heapq
+import itertools
+import pickle
+import sys
+import tempfile
+
+SORT_MEMORY_MB = 256
+# Most runs merged at once; beyond this, runs are first merged into longer runs to bound the open files
+MERGE_FAN_IN = 64
+# Rows measured to estimate how many fit in the memory budget
+_SAMPLE_ROWS = 1000
+
+
+def parse_sort(spec, columns):
+    """Parse "<column>[:desc|:asc]" into (column, descending); raises ValueError for an unknown column or order."""
+    column, _, direction = spec.partition(":")
+    if column not in columns:
+        raise ValueError(f"unknown sort column '{column}' (choose from {', '.join(columns)})")
+    if direction.lower() not in ("", "asc", "desc"):
+        raise ValueError(f"unknown sort order '{direction}' (use asc or desc)")
+    return column, direction.lower() == "desc"
+
+
+def add_listing_arguments(subparser, columns, sort_memory=False):
+    def sort_type(spec):
+        try:
+            return parse_sort(spec, columns)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+
+    subparser.add_argument("--limit", type=int, help="Print at most N rows")
+    subparser.add_argument(
+        "--sort",
+        type=sort_type,
+        metavar="COLUMN[:desc]",
+        help="Sort rows by a column, ascending unless ':desc' is given (e.g. Date:desc)",
+    )
+    if sort_memory:
+        add_sort_memory_argument(subparser)
+
+
+def add_sort_memory_argument(subparser):
+    subparser.add_argument(
+        "--sort-memory",
+        type=int,
+        default=SORT_MEMORY_MB,
+        metavar="MB",
+        help=f"Memory for sorting before rows are spilled to temporary files (default: {SORT_MEMORY_MB})",
+    )
+
+
+def api_order(sort, fields):
+    """The API `order` parameter for a sort, or None if the column is not one the endpoint can order by."""
+    if not sort or sort[0] not in fields:
+        return None
+    column, descending = sort
+    return f"{fields[column]} {'DESC' if descending else 'ASC'}"
+
+
+def _sort_key(column, descending, fields):
+    # Blank values go last in either direction, whatever the column type
+    def key(row):
+        value = fields(row)[column]
+        blank = value is None or value == ""
+        return (blank != descending, "" if value is None else value)
+
+    return key
+
+
+def _approximate_size(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approximate_size(k) + _approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_approximate_size(v) for v in value)
+    return size
+
+
+def _write_run(rows):
+    run = tempfile.TemporaryFile()
+    # One pickle per row: a shared Pickler/Unpickler would keep every row alive in its memo
+    for row in rows:
+        pickle.dump(row, run, protocol=pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    while True:
+        try:
+            yield pickle.load(run)
+        except EOFError:
+            return
+
+
+def _merge_runs(runs, key, reverse):
+    try:
+        yield from heapq.merge(*(_read_run(run) for run in runs), key=key, reverse=reverse)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def external_sort(rows, key, reverse=False, memory_mb=SORT_MEMORY_MB):
+    """
+    Sort an iterable of rows of any size in about memory_mb of memory, yielding them in order (stable).
+
+    The number of rows per run comes from the size of the first rows, so rows should be of similar shape.
+    """
+    budget = memory_mb * 1024 * 1024
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, _SAMPLE_ROWS))
+    row_size = max(1, sum(_approximate_size(row) for row in sample) // max(1, len(sample)))
+    run_rows = max(_SAMPLE_ROWS, budget // row_size)
+
+    runs = []
+    buffer = sample
+    while True:
+        buffer.extend(itertools.islice(rows, run_rows - len(buffer)))
+        buffer.sort(key=key, reverse=reverse)
+        if len(buffer) < run_rows and not runs:
+            # Everything fit in memory
+            yield from buffer
+            return
+        if buffer:
+            runs.append(_write_run(buffer))
+        if len(buffer) < run_rows:
+            break
+        buffer = []
+
+    while len(runs) > MERGE_FAN_IN:
+        merged = []
+        while runs:
+            group, runs = runs[:MERGE_FAN_IN], runs[MERGE_FAN_IN:]
+            merged.append(_write_run(_merge_runs(group, key, reverse)))
+        runs = merged
+    yield from _merge_runs(runs, key, reverse)
+
+
+def select_rows(rows, limit=None, sort=None, presorted=False, fields=None, memory_mb=SORT_MEMORY_MB):
+    """
+    Apply a sort and limit to an iterable of rows.
+
+    fields extracts the column dict from a row when rows carry more than that (e.g. (row_data, csv_row) pairs).
+
+    Without a sort (or when the API already returned rows in sort order) the limit just stops consuming rows. A
+    client-side sort with a limit keeps only the best `limit` rows in a bounded heap instead of sorting everything;
+    without a limit it is an external sort in about memory_mb of memory, streaming rows as they are merged.
+    """
+    if sort and not presorted:
+        column, descending = sort
+        key = _sort_key(column, descending, fields or (lambda row: row))
+        if limit is None:
+            return external_sort(rows, key, descending, memory_mb)
+        if descending:
+            return heapq.nlargest(limit, rows, key=key)
+        return heapq.nsmallest(limit, rows, key=key)
+    return list(itertools.islice(rows, limit)) if limit is not None else rows
@@ -0,0 +1,157 @@
+"""
+Xero Write-Ahead Operation Log
+
+Shared by the manager scripts to make bulk writes resumable. Every write is recorded in a JSON Lines file before it
+is sent to Xero and again once Xero confirms it, so a run that stops partway (HTTP 429, validation error, Ctrl-C)
+can be restarted with --resume and skip everything that already completed.
+
+Each line in the log is one event:
+    {"event": "intent",  "key": ..., "op": "edit_journal", "tenant_id": ..., "target": ..., "params": {...}}
+    {"event": "started", "key": ...}
+    {"event": "done",    "key": ..., "result": {...}}
+    {"event": "failed",  "key": ..., "error": "..."}
+
+Each write command has its own log by default (default_oplog_file(), e.g. .xero_oplog_journal_edit.jsonl), so an
+interrupted job of one command neither blocks nor is displaced by the others. A fresh (non-resume) run moves the
+previous log to <path>.prev, but refuses to start while that log still has unfinished operations (planned or
+started, never done or failed), so an interrupted job is not displaced before it has been resumed.
+
+The key is a deterministic idempotency key derived from the tenant, operation, target and parameters. It is also
+sent to Xero as the Idempotency-Key header (see OperationLog.request_key) so a retried request is not applied twice.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+
+def default_oplog_file(command: str) -> str:
+    """The log a write command uses unless given --oplog, e.g. .xero_oplog_coa_import.jsonl for "coa_import"."""
+    return f".xero_oplog_{command}.jsonl"
+
+
+def make_idempotency_key(tenant_id: str, op: str, target: str, params: dict | None = None) -> str:
+    payload = json.dumps([tenant_id, op, target, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class OperationLog:
+    """Append-only log of intended and completed write operations."""
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.ops: dict[str, dict] = {}
+        self.states: dict[str, str] = {}
+        self.failures: dict[str, int] = {}
+
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            self._load()
+            unfinished = [key for key, state in self.states.items() if state in ("intent", "started")]
+            if unfinished:
+                print(
+                    f"Error: {path} has {len(unfinished)} unfinished operation(s) from an interrupted run. "
+                    "Re-run that command with --resume first, or use another --oplog file.",
+                    file=sys.stderr,
+                )
+                sys.exit(1)
+            # A fresh run starts a new job; keep the previous log around for inspection.
+            os.replace(path, f"{path}.prev")
+            self.ops, self.states, self.failures = {}, {}, {}
+
+        self._fh = open(path, "a")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; everything before it is intact.
+                    continue
+                key = entry.get("key")
+                if entry.get("event") == "intent":
+                    self.ops[key] = entry
+                    self.states.setdefault(key, "intent")
+                else:
+                    self.states[key] = entry.get("event")
+                    if entry.get("event") == "failed":
+                        self.failures[key] = self.failures.get(key, 0) + 1
+
+    def _append(self, entry: dict) -> None:
+        entry["ts"] = datetime.now(timezone.utc).isoformat()
+        self._fh.write(json.dumps(entry, default=str) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def plan(self, tenant_id: str, op: str, target: str, params: dict | None = None) -> str:
+        """Record the intent to perform an operation and return its idempotency key."""
+        key = make_idempotency_key(tenant_id, op, target, params)
+        if key not in self.ops:
+            entry = {
+                "event": "intent",
+                "key": key,
+                "op": op,
+                "tenant_id": tenant_id,
+                "target": target,
+                "params": params or {},
+            }
+            self._append(dict(entry))
+            self.ops[key] = entry
+            self.states[key] = "intent"
+        return key
+
+    def started(self, key: str) -> None:
+        self._append({"event": "started", "key": key})
+        self.states[key] = "started"
+
+    def done(self, key: str, result: dict | None = None) -> None:
+        self._append({"event": "done", "key": key, "result": result or {}})
+        self.states[key] = "done"
+
+    def failed(self, key: str, error: str) -> None:
+        self._append({"event": "failed", "key": key, "error": error})
+        self.states[key] = "failed"
+        self.failures[key] = self.failures.get(key, 0) + 1
+
+    def request_key(self, key: str) -> str:
+        """
+        Idempotency-Key header value for the next attempt of an operation.
+
+        An attempt whose outcome is unknown is retried with the same value so Xero can deduplicate it; an attempt
+        that definitely failed gets a fresh value so Xero does not replay the earlier error response.
+        """
+        attempts = self.failures.get(key, 0)
+        return key if not attempts else f"{key}-{attempts + 1}"
+
+    def is_done(self, key: str) -> bool:
+        return self.states.get(key) == "done"
+
+    def is_uncertain(self, key: str) -> bool:
+        """True if a previous run sent the request but never recorded the outcome."""
+        return self.states.get(key) == "started"
+
+    def pending(self, tenant_id: str, op: str) -> list[dict]:
+        """Operations of the given type recorded for the tenant that have not completed, in log order."""
+        return [
+            entry
+            for key, entry in self.ops.items()
+            if entry["op"] == op and entry["tenant_id"] == tenant_id and not self.is_done(key)
+        ]
@@ -0,0 +1,76 @@
+"""
+Xero Parallel Evaluation
+
+Process-pool helpers for filtering and aggregating the local journal store on every core. The store's lines are split
+into contiguous date ranges of about equal size; each worker process opens its own SQLite connection, evaluates the
+query over its ranges and returns matching rows or partial totals, which the parent combines. Amounts stay Decimal
+throughout (they pickle exactly), so merged totals are the same as a single pass, and results come back in range
+order, so concatenated rows keep the store's date order.
+
+Stores under PARALLEL_MIN_LINES lines are evaluated in-process, where starting workers would cost more than it saves.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+PARALLEL_MIN_LINES = 50_000
+# Several ranges per worker, so one that finishes early takes another range instead of idling
+RANGES_PER_WORKER = 4
+
+
+def add_workers_argument(subparser):
+    subparser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Processes evaluating the query over the local store (default: one per core, {DEFAULT_WORKERS})",
+    )
+
+
+def date_ranges(date_counts, parts):
+    """
+    Split [(date, lines)], sorted by date, into at most `parts` contiguous (first date, last date) ranges of about
+    equal line counts. A single date is never split, so a date with more lines than a share gets a range of its own.
+    """
+    total = sum(count for _, count in date_counts)
+    ranges = []
+    first, seen = None, 0
+    for i, (day, count) in enumerate(date_counts):
+        first = first or day
+        seen += count
+        if seen * parts >= total * (len(ranges) + 1) or i == len(date_counts) - 1:
+            ranges.append((first, day))
+            first = None
+    return ranges
+
+
+def plan_ranges(date_counts, workers):
+    """The date ranges to evaluate: the whole store as one range when it is small or only one worker is asked for."""
+    if workers <= 1 or sum(count for _, count in date_counts) < PARALLEL_MIN_LINES:
+        return [(None, None)]
+    return date_ranges(date_counts, workers * RANGES_PER_WORKER)
+
+
+def map_ranges(function, tasks, workers=DEFAULT_WORKERS):
+    """Yield function(task) for each task in task order, evaluated by up to `workers` processes if there are several."""
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield function(task)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        yield from pool.map(function, tasks)
+
+
+def merge_groups(partials):
+    """Combine {group key: [line count, Decimal total]} dicts from several ranges into one."""
+    merged = {}
+    for groups in partials:
+        for key, (count, total) in groups.items():
+            group = merged.get(key)
+            if group is None:
+                merged[key] = [count, total]
+            else:
+                group[0] += count
+                group[1] += total
+    return merged
@@ -2,6 +2,7 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+#     "httpx",
 #     "PyYAML",
 #     "xero-python",
 # ]
@@ -11,46 +12,37 @@ Xero Profit and Loss Report Generator
 
 This script fetches and displays the Profit and Loss report from Xero for a specified date range.
 
+With --by-tracking the report is broken down by the options of a tracking category (e.g. a department or wallet):
+the category is looked up by name, and a single report request with its trackingCategoryID returns a column per
+option, an Unassigned column for amounts with no option of the category and a Total column, printed as a CSV matrix
+with a row per account and total.
+
 Usage:
     ./xero_pnl_report.py [options]
 
 Options:
     --start-date YYYY-MM-DD  Start date for the report (default: 2025-01-01)
     --end-date YYYY-MM-DD    End date for the report (default: 2025-12-31)
+    --no-precomputed         Fetch the report even if xero_scheduler.py has precomputed it
+    --by-tracking CATEGORY   One column per option of a tracking category (name or TrackingCategoryID), as CSV
 
 Examples:
     ./xero_pnl_report.py
     ./xero_pnl_report.py --start-date 2024-01-01 --end-date 2024-12-31
+    ./xero_pnl_report.py --by-tracking Department > pnl_by_department.csv
 """
 import argparse
-import os
-import json
-import yaml
 import sys
 from datetime import date, datetime
-from xero_python.api_client import ApiClient
-from xero_python.api_client.configuration import Configuration
-from xero_python.api_client.oauth2 import OAuth2Token
-from xero_python.identity import IdentityApi
 from xero_python.accounting import AccountingApi
-
-
-def load_config(config_file="xero_config.yaml"):
-    with open(config_file, "r") as f:
-        return yaml.safe_load(f)
-
-
-def load_token(token_file=".xero_token.json"):
-    if not os.path.exists(token_file):
-        print("Token file not found. Please run xero_connect.py first.")
-        return None
-    with open(token_file, "r") as f:
-        return json.load(f)
+from xero_async_client import XeroAsyncClient, resolve_tenant as resolve_connection, run
+from xero_precomputed import load_report
+from xero_reports import flatten_report, report_from_sdk, write_matrix
+from xero_session import sdk_client, sdk_connections
 
 
 def resolve_tenant(api_client, tenant_id_arg=None, tenant_index=None):
-    identity_api = IdentityApi(api_client)
-    connections = identity_api.get_connections()
+    connections = sdk_connections(api_client)
 
     if not connections:
         print("No connections found.", file=sys.stderr)
@@ -89,7 +81,72 @@ def resolve_tenant(api_client, tenant_id_arg=None, tenant_index=None):
     return tenant_id
 
 
-def main():
+def print_report(r):
+    print(f"\nReport: {r['ReportName']}")
+    print(f"Title: {r['ReportTitles'][0] if r['ReportTitles'] else ''}")
+    print(f"Date: {r['ReportDate']}")
+    print("-" * 60)
+
+    if not r["Rows"]:
+        print("No rows returned in the report.")
+    else:
+        print(f"Found {len(r['Rows'])} rows.")
+
+    for row in r["Rows"]:
+        row_type = row["RowType"]
+        cells = [c.get("Value") for c in row.get("Cells") or []]
+
+        if row_type == "Header":
+            # Print headers
+            print(f"{' | '.join(cells)}")
+            print("-" * 60)
+        elif row_type == "Section":
+            print(f"\n--- {row.get('Title')} ---")
+            for sub_row in row.get("Rows") or []:
+                if sub_row["RowType"] in ("Row", "SummaryRow"):
+                    cells = [c.get("Value") for c in sub_row.get("Cells") or []]
+                    # Format: Label ... Value
+                    label = cells[0]
+                    values = cells[1:]
+                    print(f"{label:<40} {', '.join(values)}")
+        elif row_type == "Row":
+            label = cells[0]
+            values = cells[1:]
+            print(f"{label:<40} {', '.join(values)}")
+        elif row_type == "SummaryRow":
+            label = cells[0]
+            values = cells[1:]
+            print(f"TOTAL: {label:<33} {', '.join(values)}")
+
+
+def find_tracking_category(categories, name):
+    """The tracking category with this name (case-insensitive) or TrackingCategoryID, or None."""
+    for category in categories:
+        if category.get("TrackingCategoryID") == name or category.get("Name", "").lower() == name.lower():
+            return category
+    return None
+
+
+async def pnl_by_tracking(tenant_id_arg, tenant_index, from_date, to_date, category_name):
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        categories = await xero.get_tracking_categories(tenant_id)
+        category = find_tracking_category(categories, category_name)
+        if category is None:
+            names = ", ".join(c.get("Name", "") for c in categories) or "none"
+            print(f"Error: no tracking category '{category_name}' (available: {names})", file=sys.stderr)
+            sys.exit(1)
+        print(f"Fetching P&L from {from_date} to {to_date} by {category['Name']}...", file=sys.stderr)
+        report = await xero.get_report_profit_and_loss(
+            tenant_id, from_date, to_date, trackingCategoryID=category["TrackingCategoryID"]
+        )
+
+    # Columns as Xero returns them: one per option, then Unassigned and Total
+    titles, rows = flatten_report(report)
+    write_matrix(titles, [(row, row["Values"]) for row in rows])
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Generate Xero Profit and Loss Report")
     # Default to current year
     current_year = date.today().year
@@ -106,13 +163,23 @@ def main():
         help=f"End date (YYYY-MM-DD) (default: {default_end})",
         default=default_end,
     )
+    parser.add_argument(
+        "--no-precomputed",
+        action="store_true",
+        help="Always fetch the report, even if xero_scheduler.py has precomputed it",
+    )
+    parser.add_argument(
+        "--by-tracking",
+        metavar="CATEGORY",
+        help="Break the report down by the options of this tracking category (name or ID), as a CSV matrix",
+    )
     parser.add_argument("--tenant-id", help="Tenant ID to use (defaults to the first connection)")
     parser.add_argument(
         "--tenant-index",
         type=int,
         help="1-based index of the tenant connection to use (see xero_tenant_manager.py view)",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     try:
         from_date = datetime.strptime(args.start_date, "%Y-%m-%d").date()
@@ -121,27 +188,21 @@ def main():
         print("Error: Dates must be in YYYY-MM-DD format")
         sys.exit(1)
 
-    config = load_config()
-    token_data = load_token()
-
-    if not token_data:
+    if args.by_tracking:
+        run(pnl_by_tracking(args.tenant_id, args.tenant_index, from_date, to_date, args.by_tracking))
         return
 
-    # Create the token object first
-    oauth2_token = OAuth2Token(client_id=config["CLIENT_ID"], client_secret=config["CLIENT_SECRET"])
-    oauth2_token.update_token(**token_data)
-
-    api_client = ApiClient(
-        Configuration(debug=False, oauth2_token=oauth2_token),
-        pool_threads=1,
-    )
-
-    @api_client.oauth2_token_getter
-    def obtain_xero_oauth2_token():
-        return token_data
+    api_client = sdk_client()
 
     tenant_id = resolve_tenant(api_client, args.tenant_id, args.tenant_index)
 
+    precomputed = None if args.no_precomputed else load_report(tenant_id, "profit_and_loss", (from_date, to_date))
+    if precomputed:
+        report, fetched_at = precomputed
+        print(f"Using P&L from {from_date} to {to_date} precomputed at {fetched_at}", file=sys.stderr)
+        print_report(report)
+        return
+
     # 2. Get Profit and Loss Report
     accounting_api = AccountingApi(api_client)
 
@@ -154,51 +215,7 @@ def main():
         # We need to traverse it to print nicely
 
         if report.reports:
-            r = report.reports[0]
-            print(f"\nReport: {r.report_name}")
-            print(f"Title: {r.report_titles[0] if r.report_titles else ''}")
-            print(f"Date: {r.report_date}")
-            print("-" * 60)
-
-            if not r.rows:
-                print("No rows returned in the report.")
-            else:
-                print(f"Found {len(r.rows)} rows.")
-
-            for row in r.rows:
-                row_type_str = str(row.row_type)
-
-                if row_type_str == "RowType.HEADER":
-                    # Print headers
-                    cells = [c.value for c in row.cells]
-                    print(f"{' | '.join(cells)}")
-                    print("-" * 60)
-                elif row_type_str == "RowType.SECTION":
-                    print(f"\n--- {row.title} ---")
-                    if row.rows:
-                        for sub_row in row.rows:
-                            sub_row_type_str = str(sub_row.row_type)
-                            if sub_row_type_str == "RowType.ROW":
-                                cells = [c.value for c in sub_row.cells]
-                                # Format: Label ... Value
-                                label = cells[0]
-                                values = cells[1:]
-                                print(f"{label:<40} {', '.join(values)}")
-                            elif sub_row_type_str == "RowType.SUMMARYROW":
-                                cells = [c.value for c in sub_row.cells]
-                                label = cells[0]
-                                values = cells[1:]
-                                print(f"{label:<40} {', '.join(values)}")
-                elif row_type_str == "RowType.ROW":
-                    cells = [c.value for c in row.cells]
-                    label = cells[0]
-                    values = cells[1:]
-                    print(f"{label:<40} {', '.join(values)}")
-                elif row_type_str == "RowType.SUMMARYROW":
-                    cells = [c.value for c in row.cells]
-                    label = cells[0]
-                    values = cells[1:]
-                    print(f"TOTAL: {label:<33} {', '.join(values)}")
+            print_report(report_from_sdk(report.reports[0]))
 
     except Exception as e:
         print(f"Error fetching report: {e}")
@@ -0,0 +1,76 @@
+"""
+Xero Precomputed Reports
+
+Reports fetched ahead of time by xero_scheduler.py, kept as one JSON file per tenant, report and parameters in the
+tenant's cache directory (.xero_cache/<tenant_id>/precomputed_<report>_<dates>.json) with the time they were fetched
+and the time they stop being served. xero_pnl_report.py and xero_balance_sheet_report.py print a stored report
+instead of calling Xero while it is unexpired; their --no-precomputed option always fetches. The journal and chart
+of accounts writes in xero_journal_manager.py and xero_coa_manager.py drop the tenant's stored reports, which they
+make stale, so a report is not served from before a write until it expires.
+
+Reports are stored in the JSON shape returned by xero_async_client (ReportName, ReportTitles, ReportDate, Rows).
+"""
+
+import contextlib
+import os
+from datetime import datetime, timedelta
+
+from xero_cache import CACHE_DIR, read_json, tenant_cache_path, utc_now, write_json
+
+REPORTS = ("profit_and_loss", "balance_sheet")
+DEFAULT_KEEP_HOURS = 24
+
+
+def _file_name(report, dates):
+    return f"precomputed_{report}_{'_'.join(d.isoformat() for d in dates)}.json"
+
+
+def save_report(tenant_id, report, dates, data, keep_hours=DEFAULT_KEEP_HOURS):
+    """Store a report fetched for the given dates (P&L: from and to, Balance Sheet: the date)."""
+    fetched_at = utc_now()
+    write_json(
+        tenant_cache_path(tenant_id, _file_name(report, dates)),
+        {
+            "report": report,
+            "dates": [d.isoformat() for d in dates],
+            "fetched_at": fetched_at.isoformat(),
+            "expires_at": (fetched_at + timedelta(hours=keep_hours)).isoformat(),
+            "data": data,
+        },
+    )
+
+
+def load_report(tenant_id, report, dates):
+    """The stored report for the dates as (data, fetched_at), or None if there is none or it has expired."""
+    stored = read_json(os.path.join(CACHE_DIR, tenant_id, _file_name(report, dates)))
+    if not stored or datetime.fromisoformat(stored["expires_at"]) <= utc_now():
+        return None
+    return stored["data"], stored["fetched_at"]
+
+
+def _stored_files(tenant_id):
+    directory = os.path.join(CACHE_DIR, tenant_id)
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.startswith("precomputed_") and name.endswith(".json")
+    ]
+
+
+def stored_reports(tenant_id):
+    """Metadata (report, dates, fetched_at, expires_at) of every report stored for the tenant, expired or not."""
+    entries = []
+    for path in _stored_files(tenant_id):
+        stored = read_json(path)
+        entries.append({key: stored[key] for key in ("report", "dates", "fetched_at", "expires_at")})
+    return entries
+
+
+def drop_reports(tenant_id):
+    """Delete every report stored for the tenant; called after writes that change its reports."""
+    for path in _stored_files(tenant_id):
+        # Concurrent writes may drop the same files
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
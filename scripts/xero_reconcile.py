@@ -0,0 +1,178 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "httpx",
+#     "PyYAML",
+# ]
+# ///
+"""
+Xero Profit & Loss / Balance Sheet Reconciliation
+
+Checks, period by period, that the earnings on the Balance Sheet move by exactly the net profit on the Profit & Loss
+report: the change in Current Year Earnings plus Retained Earnings between two period ends must equal the period's
+net profit (this holds across financial year ends, when Xero moves the year's earnings into retained earnings).
+A difference means something reached equity without going through the P&L, or the reverse: a journal straight to
+retained earnings, an opening balance or conversion adjustment, or a report that no longer agrees with the ledger
+(see KNOWN_ISSUES.md for the mismatch that prompted this check).
+
+All Profit & Loss reports and Balance Sheets of the range are fetched concurrently, so two years of monthly periods
+take one command and a few seconds. One CSV row is printed per period; for periods that do not reconcile the Accounts
+column lists every equity account that moved, with its movement, as the places to look. The exit status is 1 if any
+period does not reconcile.
+
+Usage:
+    ./xero_reconcile.py --from YYYY-MM-DD --to YYYY-MM-DD [--every month|quarter|year]
+
+Examples:
+    ./xero_reconcile.py --from 2024-01-01 --to 2025-12-31
+    ./xero_reconcile.py --from 2024-01-01 --to 2025-12-31 --every quarter > reconciliation.csv
+
+Requirements:
+    - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET)
+    - .xero_token.json (generated by xero_connect.py)
+"""
+import argparse
+import asyncio
+import csv
+import signal
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from xero_async_client import XeroAsyncClient, resolve_tenant as resolve_connection, run
+from xero_cache import ACCOUNTS_FILE, cached_fetch
+from xero_reports import EVERY_CHOICES, flatten_report, period_ends, row_key
+from xero_validation import ACCOUNTS_MAX_AGE
+
+# Handle broken pipe when piping output
+signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+CURRENT_YEAR_EARNINGS = "Current Year Earnings"
+RETAINED_EARNINGS = "Retained Earnings"
+NET_PROFIT_LABELS = ("Net Profit", "Net Loss")
+
+COLUMNS = ["From", "To", "NetProfit", "EarningsMovement", "Difference", "Status", "Accounts"]
+
+
+def period_start(end, every):
+    """First day of the month, quarter or calendar year ending on `end`."""
+    months = {"month": 1, "quarter": 3, "year": 12}[every]
+    month = end.month - months + 1
+    return end.replace(year=end.year + (month - 1) // 12, month=(month - 1) % 12 + 1, day=1)
+
+
+def net_profit(report):
+    """The Net Profit of a Profit & Loss report (negative for a loss)."""
+    _, rows = flatten_report(report)
+    for row in rows:
+        if row["Label"] in NET_PROFIT_LABELS and row["Values"] and row["Values"][0] is not None:
+            return row["Values"][0]
+    return None
+
+
+def equity_balances(report, retained_earnings_id):
+    """
+    Equity rows of a Balance Sheet: {row key: (label, balance)} and the earnings balance (CYE + retained earnings).
+
+    Balances are credit-positive, as the report shows them.
+    """
+    _, rows = flatten_report(report)
+    equity = {}
+    earnings = Decimal(0)
+    for row in rows:
+        if row["RowType"] != "Row" or "equity" not in row["Section"].lower():
+            continue
+        balance = row["Values"][0] if row["Values"] and row["Values"][0] is not None else Decimal(0)
+        equity[row_key(row)] = (row["Label"], balance)
+        is_retained = retained_earnings_id is not None and row["AccountID"] == retained_earnings_id
+        if row["Label"] in (CURRENT_YEAR_EARNINGS, RETAINED_EARNINGS) or is_retained:
+            earnings += balance
+    return equity, earnings
+
+
+def equity_movements(before, after):
+    """[(label, movement)] of the equity rows whose balance changed between two Balance Sheets."""
+    moved = []
+    for key in dict.fromkeys([*before, *after]):
+        label = (after.get(key) or before[key])[0]
+        movement = after.get(key, (label, Decimal(0)))[1] - before.get(key, (label, Decimal(0)))[1]
+        if movement:
+            moved.append((label, movement))
+    return moved
+
+
+async def reconcile(tenant_id_arg, tenant_index, ends, every):
+    starts = [period_start(ends[0], every)] + [end + timedelta(days=1) for end in ends[:-1]]
+    balance_dates = [starts[0] - timedelta(days=1), *ends]
+
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        print(f"Fetching {len(ends)} Profit & Loss reports and {len(balance_dates)} Balance Sheets...", file=sys.stderr)
+        chart, balance_sheets, *pnls = await asyncio.gather(
+            cached_fetch(tenant_id, ACCOUNTS_FILE, ACCOUNTS_MAX_AGE, lambda: xero.get_accounts(tenant_id)),
+            asyncio.gather(*(xero.get_report_balance_sheet(tenant_id, d) for d in balance_dates)),
+            *(xero.get_report_profit_and_loss(tenant_id, start, end) for start, end in zip(starts, ends)),
+        )
+
+    retained_earnings_id = next(
+        (account["AccountID"] for account in chart if account.get("SystemAccount") == "RETAINEDEARNINGS"), None
+    )
+    equity = [equity_balances(report, retained_earnings_id) for report in balance_sheets]
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(COLUMNS)
+    mismatched = []
+    for i, (start, end, pnl) in enumerate(zip(starts, ends, pnls)):
+        (before, earnings_before), (after, earnings_after) = equity[i], equity[i + 1]
+        profit = net_profit(pnl)
+        if profit is None:
+            profit = Decimal(0)
+            print(f"Warning: no Net Profit row in the Profit & Loss for {start} to {end}", file=sys.stderr)
+        movement = earnings_after - earnings_before
+        difference = movement - profit
+        accounts = ""
+        if difference:
+            mismatched.append(end)
+            accounts = "; ".join(f"{label}: {amount}" for label, amount in equity_movements(before, after))
+        writer.writerow([start, end, profit, movement, difference, "MISMATCH" if difference else "OK", accounts])
+
+    if mismatched:
+        print(f"{len(mismatched)} of {len(ends)} period(s) do not reconcile.", file=sys.stderr)
+        sys.exit(1)
+    print(f"All {len(ends)} period(s) reconcile.", file=sys.stderr)
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile Xero Profit & Loss with Balance Sheet earnings")
+    parser.add_argument("--from", dest="from_date", required=True, help="First date of the range (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", required=True, help="Last date of the range (YYYY-MM-DD)")
+    parser.add_argument(
+        "--every", choices=EVERY_CHOICES, default="month", help="Length of each period (default: month)"
+    )
+    parser.add_argument("--tenant-id", help="Tenant ID to use (defaults to the first connection)")
+    parser.add_argument(
+        "--tenant-index",
+        type=int,
+        help="1-based index of the tenant connection to use (see xero_tenant_manager.py view)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        ends = period_ends(parse_date(args.from_date), parse_date(args.to_date), args.every)
+    except ValueError:
+        print("Error: Dates must be in YYYY-MM-DD format", file=sys.stderr)
+        sys.exit(1)
+    if not ends:
+        print("Error: No complete period in the given range", file=sys.stderr)
+        sys.exit(1)
+
+    run(reconcile(args.tenant_id, args.tenant_index, ends, args.every))
+
+
+if __name__ == "__main__":
+    main()
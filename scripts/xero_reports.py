@@ -0,0 +1,181 @@
+"""
+Xero Report Helpers
+
+Shared helpers for the report scripts: flattening the nested Rows/Sections structure of Xero report JSON (as
+returned by xero_async_client) into typed rows, building date ranges, and writing account x column matrices.
+"""
+
+import calendar
+import csv
+import sys
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+EVERY_CHOICES = ("month", "quarter", "year")
+
+# Account Type -> Class, as listed in the Xero Accounts API documentation
+ACCOUNT_CLASS_BY_TYPE = {
+    **dict.fromkeys(["BANK", "CURRENT", "FIXED", "INVENTORY", "NONCURRENT", "PREPAYMENT"], "ASSET"),
+    **dict.fromkeys(
+        [
+            "CURRLIAB",
+            "LIABILITY",
+            "TERMLIAB",
+            "PAYGLIABILITY",
+            "SUPERANNUATIONLIABILITY",
+            "WAGESPAYABLELIABILITY",
+        ],
+        "LIABILITY",
+    ),
+    "EQUITY": "EQUITY",
+    **dict.fromkeys(["REVENUE", "SALES", "OTHERINCOME"], "REVENUE"),
+    **dict.fromkeys(
+        ["EXPENSE", "DIRECTCOSTS", "OVERHEADS", "DEPRECIATN", "SUPERANNUATIONEXPENSE", "WAGESEXPENSE"],
+        "EXPENSE",
+    ),
+}
+
+
+def parse_amount(value):
+    """Parse a report cell value into a Decimal; returns None for blank or non-numeric cells."""
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return value
+    text = str(value).strip().replace(",", "")
+    if not text:
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    try:
+        amount = Decimal(text.strip("()"))
+    except InvalidOperation:
+        return None
+    return -amount if negative else amount
+
+
+def report_from_sdk(report):
+    """A xero-python report (ReportWithRow) in the JSON shape returned by xero_async_client, for the helpers here."""
+
+    def convert(row):
+        converted = {
+            "RowType": row.row_type.value if row.row_type else None,
+            "Cells": [{"Value": cell.value} for cell in row.cells or []],
+        }
+        if converted["RowType"] == "Section":
+            converted["Title"] = row.title
+        if getattr(row, "rows", None):
+            converted["Rows"] = [convert(child) for child in row.rows]
+        return converted
+
+    return {
+        "ReportName": report.report_name,
+        "ReportTitles": list(report.report_titles or []),
+        "ReportDate": report.report_date,
+        "Rows": [convert(row) for row in report.rows or []],
+    }
+
+
+def _cell_account_id(cell):
+    for attribute in cell.get("Attributes") or []:
+        if attribute.get("Id") == "account":
+            return attribute.get("Value")
+    return None
+
+
+def flatten_report(report):
+    """
+    Flatten a report into (headers, rows).
+
+    headers are the column titles of the report's Header row (without the label column). Each row is a dict with
+    Section, RowType ("Row" or "SummaryRow"), Label, AccountID (None for totals) and Values (Decimals or None).
+    """
+    headers = []
+    rows = []
+
+    def visit(row, section):
+        row_type = row.get("RowType")
+        if row_type == "Header":
+            headers[:] = [cell.get("Value", "") for cell in row.get("Cells", [])[1:]]
+        elif row_type == "Section":
+            title = row.get("Title") or section
+            for child in row.get("Rows") or []:
+                visit(child, title)
+        elif row_type in ("Row", "SummaryRow"):
+            cells = row.get("Cells") or []
+            if not cells:
+                return
+            rows.append(
+                {
+                    "Section": section,
+                    "RowType": row_type,
+                    "Label": cells[0].get("Value", ""),
+                    "AccountID": _cell_account_id(cells[0]),
+                    "Values": [parse_amount(cell.get("Value")) for cell in cells[1:]],
+                }
+            )
+
+    for row in report.get("Rows") or []:
+        visit(row, "")
+    return headers, rows
+
+
+def row_key(row):
+    """Stable identity of a report row across reports: account rows by AccountID, totals by section and label."""
+    return row["AccountID"] or f"{row['Section']}|{row['Label']}"
+
+
+def period_ends(start, end, every):
+    """Period-end dates from the end of the period containing start up to end (inclusive)."""
+    step = {"month": 1, "quarter": 3, "year": 12}[every]
+    year, month = start.year, start.month
+    if every == "quarter":
+        month = ((month - 1) // 3 + 1) * 3
+    elif every == "year":
+        month = 12
+    dates = []
+    while True:
+        last = date(year, month, calendar.monthrange(year, month)[1])
+        if last > end:
+            break
+        dates.append(last)
+        month += step
+        year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return dates
+
+
+def financial_year_start(at, year_end_month, year_end_day):
+    """First day of the financial year containing the date `at`, for a year ending on (month, day)."""
+
+    def year_end(year):
+        return date(year, year_end_month, min(year_end_day, calendar.monthrange(year, year_end_month)[1]))
+
+    year = at.year if at <= year_end(at.year) else at.year + 1
+    return year_end(year - 1) + timedelta(days=1)
+
+
+def merge_columns(reports, value_index=0):
+    """
+    Combine one value column from each report into a matrix.
+
+    reports is a list of flattened (headers, rows). Returns a list of (row, [value per report]) in first-seen order.
+    """
+    order = []
+    matrix = {}
+    for column, (_, rows) in enumerate(reports):
+        for row in rows:
+            key = row_key(row)
+            if key not in matrix:
+                matrix[key] = (row, [None] * len(reports))
+                order.append(key)
+            values = row["Values"]
+            matrix[key][1][column] = values[value_index] if value_index < len(values) else None
+    return [matrix[key] for key in order]
+
+
+def write_matrix(column_titles, matrix, out=None):
+    writer = csv.writer(out or sys.stdout)
+    writer.writerow(["Section", "Account", "AccountID", *column_titles])
+    for row, values in matrix:
+        writer.writerow(
+            [row["Section"], row["Label"], row["AccountID"] or "", *["" if v is None else v for v in values]]
+        )
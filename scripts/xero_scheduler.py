@@ -0,0 +1,352 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "httpx",
+#     "PyYAML",
+# ]
+# ///
+"""
+Xero Report Scheduler
+
+Precomputes the standard Profit & Loss and Balance Sheet reports for every tenant off-peak, on a cron-style schedule,
+so that xero_pnl_report.py and xero_balance_sheet_report.py print them instantly instead of queueing behind everyone
+else's month-end runs (see xero_precomputed.py for how they are stored and served).
+
+The schedule is read from xero_schedule.yaml:
+
+    # Calls the scheduler may spend per tenant: per minute (the API allows 60) and per day (the API allows 5000),
+    # and the daily API allowance it always leaves for interactive use
+    calls_per_minute: 20
+    daily_calls: 1000
+    reserve_daily_calls: 1000
+    jobs:
+      - name: month-end-pnl
+        cron: "15 2 1 * *"           # minute hour day-of-month month day-of-week, local time
+        report: profit_and_loss
+        period: last_month            # this_month, last_month, this_quarter, last_quarter, this_year, last_year
+        tenants: all                  # or a list of tenant IDs
+        keep_hours: 72                # how long the stored report is served (default: 24)
+      - name: month-end-balance-sheet
+        cron: "20 2 1 * *"
+        report: balance_sheet
+        date: last_month_end          # today, this_month_end, last_month_end, this_year_end, last_year_end
+
+A job fetches its report for all its tenants side by side, each tenant paced to calls_per_minute so interactive
+scripts keep most of the per-minute limit. A tenant that has used daily_calls today, or whose remaining daily API
+allowance (as reported by Xero) is down to reserve_daily_calls, is skipped until the next run.
+
+Usage:
+    ./xero_scheduler.py <command> [options]
+
+Commands:
+    run       Run the schedule until interrupted (e.g. under nohup or a systemd service).
+    run-now   Run some or all jobs once, immediately.
+    status    List the precomputed reports of every tenant in CSV format.
+
+Examples:
+    nohup ./xero_scheduler.py run >> scheduler.log 2>&1 &
+    ./xero_scheduler.py run-now month-end-pnl
+    ./xero_scheduler.py status
+
+Requirements:
+    - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET)
+    - .xero_token.json (generated by xero_connect.py)
+    - xero_schedule.yaml
+"""
+import argparse
+import asyncio
+import calendar
+import csv
+import os
+import signal
+import sys
+from datetime import date, datetime, timedelta
+
+import yaml
+from xero_async_client import RateLimiter, XeroAsyncClient, run
+from xero_cache import read_json, tenant_cache_path, write_json
+from xero_precomputed import DEFAULT_KEEP_HOURS, REPORTS, save_report, stored_reports
+
+# Handle broken pipe when piping output
+signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+SCHEDULE_FILE = "xero_schedule.yaml"
+USAGE_FILE = "scheduler_usage.json"
+DEFAULT_CALLS_PER_MINUTE = 20
+DEFAULT_DAILY_CALLS = 1000
+DEFAULT_RESERVE_DAILY_CALLS = 1000
+
+PERIODS = ("this_month", "last_month", "this_quarter", "last_quarter", "this_year", "last_year")
+DATES = ("today", "this_month_end", "last_month_end", "this_year_end", "last_year_end")
+CRON_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day of month", 1, 31), ("month", 1, 12), ("day of week", 0, 7))
+
+
+def _cron_field(spec, name, lo, hi):
+    values = set()
+    for part in spec.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            first, last = lo, hi
+        elif "-" in part:
+            first, last = (int(value) for value in part.split("-", 1))
+        else:
+            first = last = int(part)
+            if step:
+                # As in cron, "N/step" steps from N to the end of the range
+                last = hi
+        if not lo <= first <= last <= hi:
+            raise ValueError(f"{name} '{spec}' is out of range {lo}-{hi}")
+        if step and int(step) < 1:
+            raise ValueError(f"{name} '{spec}' has a step below 1")
+        values.update(range(first, last + 1, int(step) if step else 1))
+    return values
+
+
+class CronSchedule:
+    """A standard five-field cron expression (numbers, *, lists, ranges and steps; day of week 0 or 7 is Sunday)."""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression '{expression}' must have 5 fields")
+        try:
+            self.minutes, self.hours, self.days, self.months, weekdays = (
+                _cron_field(spec, *field) for spec, field in zip(fields, CRON_FIELDS)
+            )
+        except ValueError as e:
+            raise ValueError(f"cron expression '{expression}': {e}") from None
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron, a restricted day of month and day of week match either one
+        self.either_day = fields[2] != "*" and fields[4] != "*"
+
+    def matches(self, moment):
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day, weekday = moment.day in self.days, (moment.weekday() + 1) % 7 in self.weekdays
+        return (day or weekday) if self.either_day else (day and weekday)
+
+
+def _month_end(year, month):
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def report_dates(job, today):
+    """The report parameters of a job run on `today`: (from, to) for a P&L, (date,) for a Balance Sheet."""
+    first_of_month = today.replace(day=1)
+    if job["report"] == "balance_sheet":
+        last_month = first_of_month - timedelta(days=1)
+        return (
+            {
+                "today": today,
+                "this_month_end": _month_end(today.year, today.month),
+                "last_month_end": last_month,
+                "this_year_end": date(today.year, 12, 31),
+                "last_year_end": date(today.year - 1, 12, 31),
+            }[job["date"]],
+        )
+
+    period = job["period"]
+    if period.endswith("month"):
+        start = first_of_month if period == "this_month" else (first_of_month - timedelta(days=1)).replace(day=1)
+        return start, _month_end(start.year, start.month)
+    if period.endswith("quarter"):
+        start = date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+        if period == "last_quarter":
+            end = start - timedelta(days=1)
+            start = date(end.year, end.month - 2, 1)
+        return start, _month_end(start.year, start.month + 2)
+    year = today.year if period == "this_year" else today.year - 1
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def load_schedule(path=SCHEDULE_FILE):
+    """Read and check the schedule; prints the problem and exits on an invalid file."""
+    if not os.path.exists(path):
+        print(f"Schedule file {path} not found.", file=sys.stderr)
+        sys.exit(1)
+    with open(path, "r") as f:
+        schedule = yaml.safe_load(f) or {}
+
+    problems = []
+    names = set()
+    for number, job in enumerate(schedule.get("jobs") or [], start=1):
+        name = job.setdefault("name", f"job{number}")
+        if name in names:
+            problems.append(f"duplicate job name '{name}'")
+        names.add(name)
+        try:
+            job["schedule"] = CronSchedule(str(job.get("cron", "")))
+        except ValueError as e:
+            problems.append(f"{name}: {e}")
+        if job.get("report") not in REPORTS:
+            problems.append(f"{name}: report must be one of {', '.join(REPORTS)}")
+        elif job["report"] == "profit_and_loss" and job.get("period") not in PERIODS:
+            problems.append(f"{name}: period must be one of {', '.join(PERIODS)}")
+        elif job["report"] == "balance_sheet" and job.get("date") not in DATES:
+            problems.append(f"{name}: date must be one of {', '.join(DATES)}")
+        tenants = job.setdefault("tenants", "all")
+        if tenants != "all" and not isinstance(tenants, list):
+            problems.append(f"{name}: tenants must be 'all' or a list of tenant IDs")
+    if not names:
+        problems.append("no jobs defined")
+    if problems:
+        for problem in problems:
+            print(f"Error in {path}: {problem}", file=sys.stderr)
+        sys.exit(1)
+    return schedule
+
+
+class Scheduler:
+    def __init__(self, xero, schedule):
+        self.xero = xero
+        self.jobs = {job["name"]: job for job in schedule["jobs"]}
+        self.calls_per_minute = int(schedule.get("calls_per_minute", DEFAULT_CALLS_PER_MINUTE))
+        self.daily_calls = int(schedule.get("daily_calls", DEFAULT_DAILY_CALLS))
+        self.reserve_daily_calls = int(schedule.get("reserve_daily_calls", DEFAULT_RESERVE_DAILY_CALLS))
+        self.pacers = {}
+
+    def pacer(self, tenant_id):
+        # The scheduler's own, slower pace, on top of the client's per-tenant limits
+        if tenant_id not in self.pacers:
+            self.pacers[tenant_id] = RateLimiter(self.calls_per_minute)
+        return self.pacers[tenant_id]
+
+    def within_budget(self, tenant_id):
+        """Count one call against today's budget of the tenant; False if it is spent."""
+        path = tenant_cache_path(tenant_id, USAGE_FILE)
+        today = date.today().isoformat()
+        usage = read_json(path) or {}
+        if usage.get("day") != today:
+            usage = {"day": today, "calls": 0}
+        remaining = self.xero.limiter(tenant_id).remaining.get("X-DayLimit-Remaining")
+        if usage["calls"] >= self.daily_calls or (remaining is not None and remaining <= self.reserve_daily_calls):
+            return False
+        usage["calls"] += 1
+        write_json(path, usage)
+        return True
+
+    async def tenants(self, job):
+        if job["tenants"] != "all":
+            return list(job["tenants"])
+        return [connection["tenantId"] for connection in await self.xero.get_connections()]
+
+    async def precompute(self, job, tenant_id, today):
+        dates = report_dates(job, today)
+        described = f"{job['name']}: {job['report']} {' to '.join(d.isoformat() for d in dates)} for {tenant_id}"
+        if not self.within_budget(tenant_id):
+            print(f"{described}: skipped, daily call budget spent", file=sys.stderr)
+            return False
+        await self.pacer(tenant_id).wait_turn()
+        try:
+            if job["report"] == "profit_and_loss":
+                report = await self.xero.get_report_profit_and_loss(tenant_id, *dates)
+            else:
+                report = await self.xero.get_report_balance_sheet(tenant_id, *dates)
+        except Exception as e:
+            print(f"{described}: failed: {e}", file=sys.stderr)
+            return False
+        save_report(tenant_id, job["report"], dates, report, float(job.get("keep_hours", DEFAULT_KEEP_HOURS)))
+        print(f"{described}: stored", file=sys.stderr)
+        return True
+
+    async def run_job(self, name, today=None):
+        """Run a job for all its tenants; True if every report was stored. Errors are printed, never raised."""
+        job = self.jobs[name]
+        today = today or date.today()
+        try:
+            results = await asyncio.gather(
+                *(self.precompute(job, tenant_id, today) for tenant_id in await self.tenants(job))
+            )
+        except Exception as e:
+            # run_forever starts jobs as tasks, where an exception would go unreported
+            print(f"{name}: failed: {e}", file=sys.stderr)
+            return False
+        return all(results)
+
+    async def run_forever(self):
+        """Start every job whose schedule matches the current minute, once a minute, until cancelled."""
+        running = set()
+        last_minute = None
+        print(f"Scheduler started with {len(self.jobs)} job(s).", file=sys.stderr)
+        while True:
+            now = datetime.now().replace(second=0, microsecond=0)
+            if now != last_minute:
+                last_minute = now
+                for name, job in self.jobs.items():
+                    if job["schedule"].matches(now):
+                        # Jobs run as tasks so a slow one never makes the loop miss a minute
+                        task = asyncio.create_task(self.run_job(name, now.date()))
+                        running.add(task)
+                        task.add_done_callback(running.discard)
+            await asyncio.sleep(60 - datetime.now().second + 0.5)
+
+
+async def run_schedule(schedule):
+    async with XeroAsyncClient.from_files() as xero:
+        await Scheduler(xero, schedule).run_forever()
+
+
+async def run_now(schedule, names):
+    async with XeroAsyncClient.from_files() as xero:
+        scheduler = Scheduler(xero, schedule)
+        unknown = [name for name in names if name not in scheduler.jobs]
+        if unknown:
+            print(f"Error: unknown job(s): {', '.join(unknown)}", file=sys.stderr)
+            sys.exit(1)
+        results = [await scheduler.run_job(name) for name in names or scheduler.jobs]
+    if not all(results):
+        sys.exit(1)
+
+
+async def print_status():
+    async with XeroAsyncClient.from_files() as xero:
+        connections = await xero.get_connections()
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["TenantID", "TenantName", "Report", "Dates", "FetchedAt", "ExpiresAt", "CallsToday"])
+    for connection in connections:
+        tenant_id = connection["tenantId"]
+        usage = read_json(tenant_cache_path(tenant_id, USAGE_FILE)) or {}
+        calls = usage.get("calls", 0) if usage.get("day") == date.today().isoformat() else 0
+        for entry in stored_reports(tenant_id):
+            writer.writerow(
+                [
+                    tenant_id,
+                    connection.get("tenantName", ""),
+                    entry["report"],
+                    " to ".join(entry["dates"]),
+                    entry["fetched_at"],
+                    entry["expires_at"],
+                    calls,
+                ]
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute Xero reports on a cron-style schedule")
+    parser.add_argument("--schedule", default=SCHEDULE_FILE, help=f"Schedule file (default: {SCHEDULE_FILE})")
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    subparsers.add_parser("run", help="Run the schedule until interrupted")
+    run_now_parser = subparsers.add_parser("run-now", help="Run jobs once, immediately")
+    run_now_parser.add_argument("jobs", nargs="*", metavar="JOB", help="Names of the jobs to run (default: all)")
+    subparsers.add_parser("status", help="List the precomputed reports of every tenant")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        try:
+            run(run_schedule(load_schedule(args.schedule)))
+        except KeyboardInterrupt:
+            print("Scheduler stopped.", file=sys.stderr)
+    elif args.command == "run-now":
+        run(run_now(load_schedule(args.schedule), args.jobs))
+    elif args.command == "status":
+        run(print_status())
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Xero SDK Session
+
+The xero-python ApiClient shared by the scripts: xero_config.yaml and .xero_token.json are read, the token refreshed
+and the HTTP cache installed once per process, and the connection list is fetched once. A script run on its own
+builds the session on first use, as it always has; under xero_batch.py every step of a runbook reuses it.
+"""
+
+import json
+import os
+import sys
+import threading
+
+import yaml
+from xero_python.api_client import ApiClient
+from xero_python.api_client.configuration import Configuration
+from xero_python.api_client.oauth2 import OAuth2Token
+from xero_python.identity import IdentityApi
+from xero_http_cache import install_sdk_cache
+
+CONFIG_FILE = "xero_config.yaml"
+TOKEN_FILE = ".xero_token.json"
+
+_lock = threading.Lock()
+_api_client = None
+_connections = None
+
+
+def load_config(config_file=CONFIG_FILE):
+    if not os.path.exists(config_file):
+        print(f"Config file {config_file} not found.", file=sys.stderr)
+        sys.exit(1)
+    with open(config_file, "r") as f:
+        return yaml.safe_load(f)
+
+
+def load_token(token_file=TOKEN_FILE):
+    if not os.path.exists(token_file):
+        print("Token file not found. Please run xero_connect.py first.", file=sys.stderr)
+        sys.exit(1)
+    with open(token_file, "r") as f:
+        return json.load(f)
+
+
+def _create_api_client():
+    config = load_config()
+    token_data = load_token()
+
+    oauth2_token = OAuth2Token(client_id=config["CLIENT_ID"], client_secret=config["CLIENT_SECRET"])
+    oauth2_token.update_token(**token_data)
+
+    api_client = ApiClient(Configuration(debug=False, oauth2_token=oauth2_token), pool_threads=1)
+    install_sdk_cache(api_client)
+
+    @api_client.oauth2_token_getter
+    def obtain_xero_oauth2_token():
+        return token_data
+
+    @api_client.oauth2_token_saver
+    def store_xero_oauth2_token(token):
+        nonlocal token_data
+        token_data = token
+        with open(TOKEN_FILE, "w") as f:
+            json.dump(token, f, indent=4)
+
+    try:
+        api_client.refresh_oauth2_token()
+    except Exception as e:
+        print(f"Warning: Token refresh failed: {e}", file=sys.stderr)
+
+    return api_client
+
+
+def sdk_client():
+    """The process's ApiClient, created (and its token refreshed) on first use."""
+    global _api_client
+    with _lock:
+        if _api_client is None:
+            _api_client = _create_api_client()
+        return _api_client
+
+
+def sdk_connections(api_client):
+    """The token's tenant connections, fetched once per process."""
+    global _connections
+    with _lock:
+        if _connections is None:
+            _connections = IdentityApi(api_client).get_connections()
+        return _connections
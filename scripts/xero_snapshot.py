@@ -0,0 +1,239 @@
+"""
+Xero Tenant Snapshots
+
+A portable, versioned file holding a frozen copy of a tenant's data for audits and offline analysis: tables of rows
+(accounts, journal lines, ...) and JSON documents (reports). Tables are stored column by column, each column in
+separately zlib-compressed blocks, with the table of contents in a JSON footer:
+
+    MAGIC | format version (uint16) | blocks ... | footer JSON | footer length (uint64) | MAGIC
+
+Snapshot() memory-maps the file and parses only the footer. A column is decompressed and decoded the first time it is
+used, so a query touching three columns of a million-line table never reads the others.
+
+Column encodings:
+    dict    the distinct values as a JSON list, plus one uint32 index into it per row (text, IDs, dates)
+    scaled  one int64 per row holding the value times 10**scale (Decimal columns without blanks; exact)
+    int     one int64 per row (integer columns without blanks)
+Integers are little-endian.
+"""
+
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from decimal import Decimal
+
+MAGIC = b"XSNAP\x00"
+FORMAT_VERSION = 1
+_VERSION = struct.Struct("<H")
+_FOOTER_LENGTH = struct.Struct("<Q")
+_INT64_LIMIT = 2**63
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _pack(typecode, values):
+    data = array.array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpack(typecode, raw):
+    data = array.array(typecode)
+    data.frombytes(raw)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+
+def _scaled(values):
+    """(scale, ints) for Decimal values that fit in int64 once scaled, else None."""
+    if not values or not all(isinstance(v, Decimal) and v.is_finite() for v in values):
+        return None
+    scale = max(0, max(-v.as_tuple().exponent for v in values))
+    ints = [int(v.scaleb(scale)) for v in values]
+    if any(not -_INT64_LIMIT <= i < _INT64_LIMIT for i in ints):
+        return None
+    return scale, ints
+
+
+class SnapshotWriter:
+    """
+    Write a snapshot; use as a context manager. The file is written under a temporary name and moved into place
+    on success, so an interrupted export never leaves a truncated snapshot behind.
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.file = open(self.tmp_path, "wb")
+        self.file.write(MAGIC + _VERSION.pack(FORMAT_VERSION))
+        self.footer = {"version": FORMAT_VERSION, "metadata": metadata or {}, "tables": {}, "documents": {}}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type:
+            self.file.close()
+            os.remove(self.tmp_path)
+        else:
+            self.close()
+
+    def _write_block(self, data):
+        offset = self.file.tell()
+        compressed = zlib.compress(data, 6)
+        self.file.write(compressed)
+        return {"offset": offset, "length": len(compressed), "size": len(data)}
+
+    def _write_column(self, values):
+        if (scaled := _scaled(values)) is not None:
+            scale, ints = scaled
+            return {"encoding": "scaled", "scale": scale, "data": self._write_block(_pack("q", ints))}
+        if values and all(type(v) is int and -_INT64_LIMIT <= v < _INT64_LIMIT for v in values):
+            return {"encoding": "int", "data": self._write_block(_pack("q", values))}
+
+        decimal = any(isinstance(v, Decimal) for v in values)
+        distinct = {}
+        codes = [distinct.setdefault(str(v) if decimal and v is not None else v, len(distinct)) for v in values]
+        return {
+            "encoding": "dict",
+            "decimal": decimal,
+            "values": self._write_block(json.dumps(list(distinct), default=str).encode()),
+            "codes": self._write_block(_pack("I", codes)),
+        }
+
+    def add_table(self, name, columns, rows):
+        """Store rows (dicts; missing keys are blank) as a table with the given columns."""
+        values = {column: [] for column in columns}
+        count = 0
+        for row in rows:
+            for column in columns:
+                values[column].append(row.get(column))
+            count += 1
+        self.footer["tables"][name] = {
+            "rows": count,
+            "columns": {column: self._write_column(values[column]) for column in columns},
+        }
+
+    def add_document(self, name, data):
+        """Store a JSON-serialisable document (e.g. a report as returned by xero_async_client)."""
+        self.footer["documents"][name] = self._write_block(json.dumps(data, default=str).encode())
+
+    def close(self):
+        footer = json.dumps(self.footer).encode()
+        self.file.write(footer + _FOOTER_LENGTH.pack(len(footer)) + MAGIC)
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+
+class SnapshotTable:
+    def __init__(self, snapshot, name, info):
+        self.snapshot = snapshot
+        self.name = name
+        self.columns = list(info["columns"])
+        self._info = info
+        self._decoded = {}
+
+    def __len__(self):
+        return self._info["rows"]
+
+    def column(self, name):
+        """All values of a column as a list, decoded on first use."""
+        if name not in self._decoded:
+            if name not in self._info["columns"]:
+                raise SnapshotError(f"table '{self.name}' has no column '{name}'")
+            self._decoded[name] = self._decode(self._info["columns"][name])
+        return self._decoded[name]
+
+    def _decode(self, info):
+        read = self.snapshot.read_block
+        if info["encoding"] == "scaled":
+            # Multiplying by an exact power of ten is faster than scaleb() and exact for int64 values
+            unit = Decimal(1).scaleb(-info["scale"])
+            return [Decimal(i) * unit for i in _unpack("q", read(info["data"]))]
+        if info["encoding"] == "int":
+            return _unpack("q", read(info["data"])).tolist()
+        distinct = json.loads(read(info["values"]))
+        if info.get("decimal"):
+            distinct = [None if v is None else Decimal(v) for v in distinct]
+        return list(map(distinct.__getitem__, _unpack("I", read(info["codes"]))))
+
+    def rows(self, columns=None):
+        """Rows as dicts of the given columns (default: all), decoding only those columns."""
+        columns = list(columns or self.columns)
+        for values in zip(*(self.column(column) for column in columns)):
+            yield dict(zip(columns, values))
+
+
+class Snapshot:
+    """A snapshot file opened for reading; use as a context manager."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"{path} is empty")
+        try:
+            self.footer = self._read_footer()
+        except SnapshotError:
+            self.close()
+            raise
+        self.version = self.footer["version"]
+        self.metadata = self.footer["metadata"]
+        self.tables = {name: SnapshotTable(self, name, info) for name, info in self.footer["tables"].items()}
+
+    def _read_footer(self):
+        size = len(self._map)
+        magic_end = len(MAGIC)
+        trailer_start = size - len(MAGIC)
+        footer_end = trailer_start - _FOOTER_LENGTH.size
+        if (
+            footer_end < magic_end + _VERSION.size
+            or self._map[:magic_end] != MAGIC
+            or self._map[trailer_start:] != MAGIC
+        ):
+            raise SnapshotError(f"{self.path} is not a snapshot file (or is truncated)")
+        (version,) = _VERSION.unpack_from(self._map, len(MAGIC))
+        if version > FORMAT_VERSION:
+            raise SnapshotError(
+                f"{self.path} uses snapshot format {version}; this version reads up to {FORMAT_VERSION}"
+            )
+        (footer_length,) = _FOOTER_LENGTH.unpack_from(self._map, footer_end)
+        footer_start = footer_end - footer_length
+        return json.loads(self._map[footer_start:footer_end])
+
+    def read_block(self, block):
+        start = block["offset"]
+        end = start + block["length"]
+        return zlib.decompress(self._map[start:end])
+
+    def table(self, name):
+        if name not in self.tables:
+            raise SnapshotError(f"no table '{name}' in {self.path} (tables: {', '.join(self.tables)})")
+        return self.tables[name]
+
+    def document(self, name):
+        if name not in self.footer["documents"]:
+            raise SnapshotError(f"no document '{name}' in {self.path}")
+        return json.loads(self.read_block(self.footer["documents"][name]))
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
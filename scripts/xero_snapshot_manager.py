@@ -0,0 +1,271 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "httpx",
+#     "PyYAML",
+#     "xero-python",
+# ]
+# ///
+"""
+Xero Tenant Snapshot Manager
+
+Freeze a tenant's chart of accounts, manual journal lines, general ledger lines and reports into one portable file
+for audits and offline analysis, and query it later without network access (format: see xero_snapshot.py).
+
+Usage:
+    ./xero_snapshot_manager.py <command> [options]
+
+Commands:
+    export    Write a snapshot of the tenant (journals come from the local store, synced first).
+    load      Query a snapshot: print a table as CSV (optionally filtered), summarize journal lines, render a
+              stored report, or show what the snapshot contains.
+
+Examples:
+    # Snapshot the first tenant with reports as of the end of June
+    ./xero_snapshot_manager.py export --date 2025-06-30 --output acme_2025-06.xsnap
+
+    # What is in it
+    ./xero_snapshot_manager.py load acme_2025-06.xsnap --info
+
+    # Journal lines on account 810, and posted amounts per account and month
+    ./xero_snapshot_manager.py load acme_2025-06.xsnap "AccountCode == '810'"
+    ./xero_snapshot_manager.py load acme_2025-06.xsnap "Status == 'POSTED'" --summarize AccountCode,Month
+
+    # The whole general ledger by date, sorted on disk in 64 MB of memory
+    ./xero_snapshot_manager.py load acme_2025-06.xsnap --table ledger_lines --sort Date --sort-memory 64
+
+    # Accounts and the stored Balance Sheet
+    ./xero_snapshot_manager.py load acme_2025-06.xsnap --table accounts --columns Code,Name,Class
+    ./xero_snapshot_manager.py load acme_2025-06.xsnap --report balance_sheet
+
+Requirements (export only):
+    - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET)
+    - .xero_token.json (generated by xero_connect.py)
+"""
+import argparse
+import asyncio
+import csv
+import signal
+import sys
+from datetime import date, datetime
+
+from xero_async_client import XeroAsyncClient, resolve_tenant as resolve_connection, run
+from xero_cache import utc_now
+from xero_journal_store import LINE_COLUMNS, JournalStore, sync_gl_journals, sync_manual_journals
+from xero_listing import SORT_MEMORY_MB, add_sort_memory_argument, parse_sort, select_rows
+from xero_reports import flatten_report, write_matrix
+from xero_snapshot import Snapshot, SnapshotError, SnapshotWriter
+
+# Handle broken pipe when piping output
+signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+ACCOUNT_COLUMNS = ["Code", "Name", "Type", "Class", "TaxType", "Description", "Status", "AccountID"]
+LEDGER_COLUMNS = ["JournalNumber", "Date", "Account", "AccountID", "AccountType", "NetAmount"]
+REPORTS = ("profit_and_loss", "balance_sheet")
+
+
+async def export_snapshot(tenant_id_arg, tenant_index, path, report_date, pnl_from):
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        path = path or f"{tenant_id}_{report_date.isoformat()}.xsnap"
+        with JournalStore(tenant_id) as store:
+            organisations, accounts, pnl, balance_sheet, *_ = await asyncio.gather(
+                xero.get_organisations(tenant_id),
+                xero.get_accounts(tenant_id),
+                xero.get_report_profit_and_loss(tenant_id, pnl_from, report_date),
+                xero.get_report_balance_sheet(tenant_id, report_date),
+                # Full and uncached, so the snapshot leaves out journals deleted in Xero
+                sync_manual_journals(xero, store, full=True),
+                sync_gl_journals(xero, store),
+            )
+            organisation = organisations[0] if organisations else {}
+            metadata = {
+                "tenant_id": tenant_id,
+                "organisation": organisation.get("Name"),
+                "base_currency": organisation.get("BaseCurrency"),
+                "exported_at": utc_now().isoformat(),
+                "report_date": report_date.isoformat(),
+                "profit_and_loss_from": pnl_from.isoformat(),
+            }
+            with SnapshotWriter(path, metadata) as writer:
+                writer.add_table("accounts", ACCOUNT_COLUMNS, accounts)
+                writer.add_table("journal_lines", LINE_COLUMNS, store.manual_journal_lines())
+                writer.add_table("ledger_lines", LEDGER_COLUMNS, store.gl_journal_lines())
+                writer.add_document("profit_and_loss", pnl)
+                writer.add_document("balance_sheet", balance_sheet)
+                counts = {name: table["rows"] for name, table in writer.footer["tables"].items()}
+
+    summary = ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+    print(f"Wrote {path}: {summary}", file=sys.stderr)
+
+
+def print_info(snapshot):
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Key", "Value"])
+    writer.writerow(["format_version", snapshot.version])
+    for key, value in snapshot.metadata.items():
+        writer.writerow([key, value])
+    for name, table in snapshot.tables.items():
+        writer.writerow([f"table:{name}", f"{len(table)} rows; columns {', '.join(table.columns)}"])
+    for name in snapshot.footer["documents"]:
+        writer.writerow([f"document:{name}", ""])
+
+
+def print_report(snapshot, name):
+    headers, rows = flatten_report(snapshot.document(name))
+    write_matrix(headers, [(row, row["Values"]) for row in rows])
+
+
+def query_columns(table, query, columns):
+    """Compile the query and work out which columns must be decoded to evaluate it and print the rows."""
+    code = compile(query, "<query>", "eval") if query else None
+    needed = list(columns)
+    if code:
+        needed += [name for name in table.columns if name in code.co_names and name not in needed]
+    return code, needed
+
+
+def print_rows(table, query, columns, limit, sort=None, sort_memory=SORT_MEMORY_MB):
+    code, needed = query_columns(table, query, columns)
+    if sort and sort[0] not in needed:
+        needed.append(sort[0])
+    rows = table.rows(needed)
+    if code:
+
+        def matches(row):
+            try:
+                return eval(code, {}, row)
+            except Exception as e:
+                print(f"Error evaluating query '{query}' for row: {e}", file=sys.stderr)
+                return False
+
+        rows = filter(matches, rows)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    for row in select_rows(rows, limit, sort, memory_mb=sort_memory):
+        writer.writerow([row[column] for column in columns])
+
+
+def summarize_rows(table, by, query):
+    # Only needed here; keeps plain loads from importing the SDK
+    from xero_journal_manager import SUMMARY_DIMENSIONS, summarize_lines, write_summary
+
+    unknown = [column for column in by if column not in SUMMARY_DIMENSIONS]
+    if unknown:
+        raise SnapshotError(f"unknown --summarize column(s): {', '.join(unknown)}")
+    periods = {"Month", "Quarter", "Year"}
+    columns = [column for column in by if column not in periods] + ["Date", "LineAmount"]
+    _, needed = query_columns(table, query, list(dict.fromkeys(columns)))
+    write_summary(by, summarize_lines(table.rows(needed), by, query))
+
+
+def load_snapshot(
+    path, table_name, query, columns, limit, summarize, report, info, sort=None, sort_memory=SORT_MEMORY_MB
+):
+    with Snapshot(path) as snapshot:
+        if info:
+            print_info(snapshot)
+        elif report:
+            print_report(snapshot, report)
+        else:
+            table = snapshot.table(table_name)
+            if summarize:
+                summarize_rows(table, summarize, query)
+            else:
+                for column in columns or []:
+                    if column not in table.columns:
+                        raise SnapshotError(f"table '{table_name}' has no column '{column}'")
+                try:
+                    order = parse_sort(sort, table.columns) if sort else None
+                except ValueError as e:
+                    raise SnapshotError(f"table '{table_name}': {e}")
+                print_rows(table, query, columns or table.columns, limit, order, sort_memory)
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and query portable Xero tenant snapshots")
+    parser.add_argument("--tenant-id", help="Tenant ID to use (defaults to the first connection)")
+    parser.add_argument(
+        "--tenant-index",
+        type=int,
+        help="1-based index of the tenant connection to use (see xero_tenant_manager.py view)",
+    )
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    # Export command
+    export_parser = subparsers.add_parser("export", help="Write a snapshot of the tenant")
+    export_parser.add_argument("--output", help="Snapshot file (default: <tenant_id>_<date>.xsnap)")
+    export_parser.add_argument(
+        "--date",
+        type=parse_date,
+        default=date.today(),
+        help="Balance Sheet date and end of the Profit & Loss period (YYYY-MM-DD, default: today)",
+    )
+    export_parser.add_argument(
+        "--pnl-from",
+        type=parse_date,
+        help="Start of the Profit & Loss period (YYYY-MM-DD, default: 1 January of --date's year)",
+    )
+
+    # Load command
+    load_parser = subparsers.add_parser("load", help="Query a snapshot without network access")
+    load_parser.add_argument("file", help="Snapshot file written by export")
+    load_parser.add_argument(
+        "query", nargs="?", help="Filter query, given right after the file (e.g. \"AccountCode == '810'\")"
+    )
+    load_parser.add_argument(
+        "--table",
+        default="journal_lines",
+        help="Table to print: journal_lines, ledger_lines or accounts (default: journal_lines)",
+    )
+    load_parser.add_argument("--columns", type=lambda value: value.split(","), help="Comma-separated columns to print")
+    load_parser.add_argument("--limit", type=int, help="Print at most N rows")
+    load_parser.add_argument(
+        "--sort",
+        metavar="COLUMN[:desc]",
+        help="Sort rows by a column of the table, ascending unless ':desc' is given (e.g. Date:desc)",
+    )
+    add_sort_memory_argument(load_parser)
+    load_parser.add_argument(
+        "--summarize",
+        type=lambda value: value.split(","),
+        metavar="COLUMNS",
+        help="Sum LineAmount of journal_lines grouped by these columns, the last one pivoted (e.g. AccountCode,Month)",
+    )
+    load_parser.add_argument("--report", choices=REPORTS, help="Print a stored report as CSV")
+    load_parser.add_argument("--info", action="store_true", help="Print the snapshot's metadata and contents")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        pnl_from = args.pnl_from or args.date.replace(month=1, day=1)
+        run(export_snapshot(args.tenant_id, args.tenant_index, args.output, args.date, pnl_from))
+    elif args.command == "load":
+        try:
+            load_snapshot(
+                args.file,
+                args.table,
+                args.query,
+                args.columns,
+                args.limit,
+                args.summarize,
+                args.report,
+                args.info,
+                args.sort,
+                args.sort_memory,
+            )
+        except (OSError, SnapshotError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
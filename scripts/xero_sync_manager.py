@@ -0,0 +1,183 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "httpx",
+#     "PyYAML",
+# ]
+# ///
+"""
+Xero Invoice, Bank Transaction, Credit Note and Contact Sync
+
+Keeps a local copy of a tenant's invoices, bank transactions, credit notes and contacts in
+.xero_cache/<tenant_id>/entities.sqlite (see xero_entity_store.py) and queries it with the same filter syntax as
+the other view commands, so e.g. bank feed lines can be matched against contacts or invoices without exporting
+anything from the Xero UI.
+
+Each sync only asks for records changed since the last one (If-Modified-Since) and fetches pages concurrently; the
+entities are synced side by side within the per-tenant rate limits.
+
+Usage:
+    ./xero_sync_manager.py <command> [options]
+
+Commands:
+    sync    Fetch new and changed records of some or all entities.
+    view    List the records of an entity in CSV format (syncing it first unless --offline).
+    show    Print the full stored API document of one record as JSON.
+
+Entities: invoices, bank_transactions, credit_notes, contacts
+
+Examples:
+    # Sync everything
+    ./xero_sync_manager.py sync
+
+    # Unreconciled bank transactions over 1,000, largest first
+    ./xero_sync_manager.py view bank_transactions "not IsReconciled and Total > 1000" --sort Total:desc
+
+    # Unpaid supplier bills of one contact, from the local copy only
+    ./xero_sync_manager.py view invoices "Type == 'ACCPAY' and ContactName == 'Koinly' and AmountDue > 0" --offline
+
+    # Everything Xero holds about one transaction
+    ./xero_sync_manager.py show bank_transactions <BankTransactionID>
+
+Requirements:
+    - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET)
+    - .xero_token.json (generated by xero_connect.py)
+"""
+import argparse
+import asyncio
+import csv
+import json
+import signal
+import sys
+
+from xero_async_client import XeroAsyncClient, resolve_tenant as resolve_connection, run
+from xero_entity_store import ENTITIES, EntityStore, entity_columns, sync_entity
+from xero_listing import SORT_MEMORY_MB, add_listing_arguments, select_rows
+
+# Handle broken pipe when piping output
+signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+async def sync_entities(tenant_id_arg, tenant_index, entities):
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        with EntityStore(tenant_id) as store:
+            updated = await asyncio.gather(*(sync_entity(xero, store, entity) for entity in entities))
+            counts = [store.count(entity) for entity in entities]
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Entity", "Updated", "Stored"])
+    for entity, changed, stored in zip(entities, updated, counts):
+        writer.writerow([entity, changed, stored])
+
+
+async def view_records(
+    tenant_id_arg, tenant_index, entity, query=None, limit=None, sort=None, offline=False, sort_memory=SORT_MEMORY_MB
+):
+    """Bring the entity's local copy up to date, then print its rows as CSV."""
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        with EntityStore(tenant_id) as store:
+            if not offline:
+                updated = await sync_entity(xero, store, entity)
+                if updated:
+                    print(f"Synced {updated} new or changed {entity.replace('_', ' ')}.", file=sys.stderr)
+            write_rows(store, entity, query, limit, sort, sort_memory)
+
+
+def write_rows(store, entity, query=None, limit=None, sort=None, sort_memory=SORT_MEMORY_MB):
+    columns = entity_columns(entity)
+    rows = store.rows(entity)
+    if query:
+        code = compile(query, "<query>", "eval")
+
+        def matches(row):
+            try:
+                return eval(code, {}, row)
+            except Exception as e:
+                print(f"Error evaluating query '{query}' for row: {e}", file=sys.stderr)
+                return False
+
+        rows = filter(matches, rows)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    for row in select_rows(rows, limit, sort, memory_mb=sort_memory):
+        writer.writerow([row[column] for column in columns])
+
+
+async def show_record(tenant_id_arg, tenant_index, entity, record_id):
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+    with EntityStore(tenant_id) as store:
+        document = store.document(entity, record_id)
+    if document is None:
+        print(f"Error: no {entity} record {record_id} in the local store (run sync first).", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(document, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sync and query Xero invoices, bank transactions, credit notes, contacts"
+    )
+    parser.add_argument("--tenant-id", help="Tenant ID to use (defaults to the first connection)")
+    parser.add_argument(
+        "--tenant-index",
+        type=int,
+        help="1-based index of the tenant connection to use (see xero_tenant_manager.py view)",
+    )
+    subparsers = parser.add_subparsers(dest="command", help="Command to run")
+
+    # Sync command
+    sync_parser = subparsers.add_parser("sync", help="Fetch new and changed records")
+    sync_parser.add_argument(
+        "entities", nargs="*", help=f"Entities to sync: {', '.join(ENTITIES)} (default: all)", metavar="ENTITY"
+    )
+
+    # View command
+    view_parser = subparsers.add_parser("view", help="List the records of an entity in CSV format")
+    view_parser.add_argument("entity", choices=list(ENTITIES), help="Entity to list")
+    view_parser.add_argument("query", nargs="?", help="Filter query (e.g. \"ContactName == 'Koinly'\")")
+    all_columns = list(dict.fromkeys(column for entity in ENTITIES for column in entity_columns(entity)))
+    add_listing_arguments(view_parser, all_columns, sort_memory=True)
+    view_parser.add_argument(
+        "--offline", action="store_true", help="Use the local copy without first fetching changed records"
+    )
+
+    # Show command
+    show_parser = subparsers.add_parser("show", help="Print the stored API document of one record as JSON")
+    show_parser.add_argument("entity", choices=list(ENTITIES), help="Entity of the record")
+    show_parser.add_argument("id", help="Record ID (e.g. an InvoiceID)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "sync":
+        unknown = [entity for entity in args.entities if entity not in ENTITIES]
+        if unknown:
+            parser.error(f"unknown entity: {', '.join(unknown)} (choose from {', '.join(ENTITIES)})")
+        run(sync_entities(args.tenant_id, args.tenant_index, args.entities or list(ENTITIES)))
+    elif args.command == "view":
+        if args.sort and args.sort[0] not in entity_columns(args.entity):
+            parser.error(f"{args.entity} have no column '{args.sort[0]}'")
+        run(
+            view_records(
+                args.tenant_id,
+                args.tenant_index,
+                args.entity,
+                args.query,
+                args.limit,
+                args.sort,
+                args.offline,
+                args.sort_memory,
+            )
+        )
+    elif args.command == "show":
+        run(show_record(args.tenant_id, args.tenant_index, args.entity, args.id))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "httpx",
+#     "PyYAML",
+# ]
+# ///
+"""
+Xero Trial Balance Report Generator
+
+Fetches the Trial Balance report for one or many dates concurrently and prints it as typed CSV rows, one per date
+and account: Debit and Credit for the month, YTD Debit and YTD Credit for the balance used in reconciliations.
+
+With --verify each date is also checked without a second manual pass:
+    - the report's own totals: account rows add up to the Total row, and total debits equal total credits;
+    - every account's YTD balance against the general ledger journals summed locally (the journal store of
+      xero_journal_manager.py balance, synced first unless --offline). Balance sheet accounts are compared on their
+      cumulative balance, income and expense accounts from the start of the financial year, and retained earnings
+      include the income and expense of earlier years, as Xero reports them.
+Rows gain Ledger and Difference columns, discrepancies are listed on stderr and the exit status is 1 if any is found.
+
+Usage:
+    ./xero_trial_balance_report.py [options]
+
+Options:
+    --date YYYY-MM-DD        Date for the report (default: today)
+    --dates D1,D2,...        Fetch several dates concurrently
+    --every month|quarter|year --from YYYY-MM-DD --to YYYY-MM-DD
+                             Fetch every period end in the range
+    --verify                 Check the report totals and each account against the local ledger
+    --offline                With --verify, use the local ledger without fetching new journals first
+
+Examples:
+    ./xero_trial_balance_report.py --date 2025-06-30
+    ./xero_trial_balance_report.py --every month --from 2025-01-01 --to 2025-06-30 > tb_h1.csv
+    ./xero_trial_balance_report.py --dates 2024-12-31,2025-06-30 --verify
+
+Requirements:
+    - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET)
+    - .xero_token.json (generated by xero_connect.py)
+"""
+import argparse
+import asyncio
+import csv
+import re
+import signal
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from xero_async_client import XeroAsyncClient, resolve_tenant as resolve_connection, run
+from xero_cache import ACCOUNTS_FILE, ORGANISATION_FILE, cached_fetch
+from xero_journal_store import BalanceIndex, JournalStore, sync_gl_journals
+from xero_reports import ACCOUNT_CLASS_BY_TYPE, EVERY_CHOICES, financial_year_start, flatten_report, period_ends
+from xero_validation import ACCOUNTS_MAX_AGE, SETTINGS_MAX_AGE
+
+# Handle broken pipe when piping output
+signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+AMOUNT_COLUMNS = ["Debit", "Credit", "YTDDebit", "YTDCredit"]
+COLUMNS = ["Date", "Section", "Account", "AccountCode", "AccountID", *AMOUNT_COLUMNS]
+CHECK_COLUMNS = ["Ledger", "Difference"]
+
+# "Sales (200)" -> "200"
+_ACCOUNT_CODE = re.compile(r"\(([^()]*)\)\s*$")
+
+
+def trial_balance_rows(report, report_date):
+    """
+    Flatten a Trial Balance report into (account rows, total row).
+
+    Amounts are Decimals (0 for blank cells), keyed by the header titles without spaces (Debit, Credit, YTDDebit,
+    YTDCredit). The total row is the report's closing "Total" summary row, or None.
+    """
+    headers, rows = flatten_report(report)
+    keys = [title.replace(" ", "") for title in headers]
+    accounts = []
+    total = None
+    for row in rows:
+        amounts = dict(zip(keys, row["Values"]))
+        typed = {
+            "Date": report_date.isoformat(),
+            "Section": row["Section"],
+            "Account": row["Label"],
+            "AccountCode": "",
+            "AccountID": row["AccountID"] or "",
+            **{column: amounts.get(column) or Decimal(0) for column in AMOUNT_COLUMNS},
+        }
+        if row["RowType"] == "SummaryRow":
+            total = typed
+            continue
+        match = _ACCOUNT_CODE.search(row["Label"])
+        if match:
+            typed["AccountCode"] = match.group(1)
+        accounts.append(typed)
+    return accounts, total
+
+
+def check_totals(report_date, rows, total):
+    """Problems with the report's own totals, as messages."""
+    problems = []
+    sums = {column: sum((row[column] for row in rows), Decimal(0)) for column in AMOUNT_COLUMNS}
+    if total is not None:
+        for column in AMOUNT_COLUMNS:
+            if sums[column] != total[column]:
+                problems.append(
+                    f"{report_date}: {column} rows add up to {sums[column]}, Total row says {total[column]}"
+                )
+    if sums["YTDDebit"] != sums["YTDCredit"]:
+        problems.append(
+            f"{report_date}: YTD debits {sums['YTDDebit']} != YTD credits {sums['YTDCredit']} "
+            f"(out by {sums['YTDDebit'] - sums['YTDCredit']})"
+        )
+    return problems
+
+
+class LedgerBalances:
+    """Trial balance figures summed from the local general ledger journals (debits positive)."""
+
+    def __init__(self, index, ledger_accounts, chart, financial_year_end):
+        self.index = index
+        self.ledger_accounts = ledger_accounts
+        self.financial_year_end = financial_year_end
+        self.classes = {
+            account["AccountID"]: account.get("Class") or ACCOUNT_CLASS_BY_TYPE.get(account.get("Type"), "ASSET")
+            for account in chart
+        }
+        self.retained_earnings = next(
+            (account["AccountID"] for account in chart if account.get("SystemAccount") == "RETAINEDEARNINGS"), None
+        )
+        self.names = {account["AccountID"]: account.get("Name", "") for account in chart}
+
+    def account_class(self, account_id):
+        return self.classes.get(account_id, "ASSET")
+
+    def balances(self, report_date):
+        """{AccountID: YTD net balance} at the date, as the Trial Balance would show it."""
+        closed = financial_year_start(report_date, *self.financial_year_end) - timedelta(days=1)
+        balances = {}
+        earlier_earnings = Decimal(0)
+        for account_id, account in self.ledger_accounts.items():
+            balance = self.index.balance_at(account, report_date)
+            if self.account_class(account_id) in ("REVENUE", "EXPENSE"):
+                before = self.index.balance_at(account, closed)
+                earlier_earnings += before
+                balance -= before
+            balances[account_id] = balance
+        # Xero closes earlier years' income and expense into retained earnings without a journal
+        if self.retained_earnings:
+            balances[self.retained_earnings] = balances.get(self.retained_earnings, Decimal(0)) + earlier_earnings
+        return balances
+
+
+def check_ledger(report_date, rows, ledger):
+    """Add Ledger and Difference to each row; returns problems as messages."""
+    problems = []
+    balances = ledger.balances(report_date)
+    reported = set()
+    for row in rows:
+        reported.add(row["AccountID"])
+        expected = balances.get(row["AccountID"], Decimal(0))
+        row["Ledger"] = expected
+        row["Difference"] = row["YTDDebit"] - row["YTDCredit"] - expected
+        if row["Difference"]:
+            problems.append(
+                f"{report_date}: {row['Account']}: report {row['YTDDebit'] - row['YTDCredit']}, "
+                f"ledger {expected} (diff {row['Difference']})"
+            )
+    for account_id, balance in balances.items():
+        if balance and account_id not in reported:
+            label = ledger.names.get(account_id) or account_id
+            problems.append(f"{report_date}: {label}: ledger balance {balance} missing from the report")
+
+    debits = sum((balance for balance in balances.values() if balance > 0), Decimal(0))
+    credits = -sum((balance for balance in balances.values() if balance < 0), Decimal(0))
+    reported_debits = sum((max(row["YTDDebit"] - row["YTDCredit"], Decimal(0)) for row in rows), Decimal(0))
+    reported_credits = sum((max(row["YTDCredit"] - row["YTDDebit"], Decimal(0)) for row in rows), Decimal(0))
+    if (debits, credits) != (reported_debits, reported_credits):
+        problems.append(
+            f"{report_date}: ledger totals debit {debits} / credit {credits}, "
+            f"report {reported_debits} / {reported_credits}"
+        )
+    return problems
+
+
+async def load_ledger(xero, tenant_id, offline):
+    organisations, chart = await asyncio.gather(
+        cached_fetch(tenant_id, ORGANISATION_FILE, SETTINGS_MAX_AGE, lambda: xero.get_organisations(tenant_id)),
+        cached_fetch(tenant_id, ACCOUNTS_FILE, ACCOUNTS_MAX_AGE, lambda: xero.get_accounts(tenant_id)),
+    )
+    organisation = organisations[0] if organisations else {}
+    financial_year_end = (
+        int(organisation.get("FinancialYearEndMonth", 12)),
+        int(organisation.get("FinancialYearEndDay", 31)),
+    )
+    with JournalStore(tenant_id) as store:
+        if not offline:
+            added = await sync_gl_journals(xero, store)
+            if added:
+                print(f"Indexed {added} new ledger journal(s).", file=sys.stderr)
+        return LedgerBalances(BalanceIndex.load(store), store.ledger_accounts(), chart, financial_year_end)
+
+
+async def trial_balances(tenant_id_arg, tenant_index, report_dates, verify=False, offline=False):
+    async with XeroAsyncClient.from_files() as xero:
+        tenant_id = resolve_connection(await xero.get_connections(), tenant_id_arg, tenant_index)
+        print(f"Fetching {len(report_dates)} Trial Balance(s)...", file=sys.stderr)
+        fetch = asyncio.gather(*(xero.get_report_trial_balance(tenant_id, d) for d in report_dates))
+        if verify:
+            reports, ledger = await asyncio.gather(fetch, load_ledger(xero, tenant_id, offline))
+        else:
+            reports = await fetch
+
+    columns = COLUMNS + (CHECK_COLUMNS if verify else [])
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    problems = []
+    for report_date, report in zip(report_dates, reports):
+        rows, total = trial_balance_rows(report, report_date)
+        if verify:
+            problems += check_totals(report_date, rows, total)
+            problems += check_ledger(report_date, rows, ledger)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+
+    if verify:
+        for problem in problems:
+            print(f"Discrepancy: {problem}", file=sys.stderr)
+        if problems:
+            print(f"{len(problems)} discrepancy(ies) found.", file=sys.stderr)
+            sys.exit(1)
+        print(f"Trial balance(s) agree with the ledger on {len(report_dates)} date(s).", file=sys.stderr)
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Xero Trial Balance Reports")
+    parser.add_argument("--date", help="Report date (YYYY-MM-DD) (default: today)")
+    parser.add_argument("--dates", help="Comma-separated report dates (YYYY-MM-DD)")
+    parser.add_argument("--every", choices=EVERY_CHOICES, help="Report at every period end between --from and --to")
+    parser.add_argument("--from", dest="from_date", help="First date of the --every range (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", help="Last date of the --every range (YYYY-MM-DD)")
+    parser.add_argument(
+        "--verify", action="store_true", help="Check report totals and account balances against the local ledger"
+    )
+    parser.add_argument("--offline", action="store_true", help="With --verify, do not fetch new ledger journals first")
+    parser.add_argument("--tenant-id", help="Tenant ID to use (defaults to the first connection)")
+    parser.add_argument(
+        "--tenant-index",
+        type=int,
+        help="1-based index of the tenant connection to use (see xero_tenant_manager.py view)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.every and not (args.from_date and args.to_date):
+        parser.error("--every requires --from and --to")
+    try:
+        if args.dates:
+            report_dates = sorted({parse_date(d.strip()) for d in args.dates.split(",") if d.strip()})
+        elif args.every:
+            report_dates = period_ends(parse_date(args.from_date), parse_date(args.to_date), args.every)
+        else:
+            report_dates = [parse_date(args.date) if args.date else date.today()]
+    except ValueError:
+        print("Error: Dates must be in YYYY-MM-DD format", file=sys.stderr)
+        sys.exit(1)
+    if not report_dates:
+        print("Error: No report dates in the given range", file=sys.stderr)
+        sys.exit(1)
+
+    run(trial_balances(args.tenant_id, args.tenant_index, report_dates, args.verify, args.offline))
+
+
+if __name__ == "__main__":
+    main()
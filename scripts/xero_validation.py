@@ -0,0 +1,117 @@
+"""
+Xero Journal Pre-flight Validation
+
+Checks manual journals locally, before any write is sent, against the rules Xero would otherwise enforce with an
+HTTP 400: lines must balance, account codes must exist and be active, tax types must be active tax rates, amounts
+must have at most two decimal places, and posted journals cannot be dated on or before the organisation's lock
+dates. The organisation settings, chart of accounts and tax rates are cached per tenant in .xero_cache/.
+
+Journals are Xero-shaped dicts (Date as YYYY-MM-DD, Narration, Status, JournalLines with AccountCode, LineAmount
+and TaxType). validate() takes every pending journal at once and uses set lookups, so a batch of thousands is
+checked in one pass before anything is sent.
+"""
+
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from xero_async_client import parse_xero_date
+from xero_cache import ACCOUNTS_FILE, ORGANISATION_FILE, TAX_RATES_FILE, cached_fetch
+
+ACCOUNTS_MAX_AGE = 3600
+SETTINGS_MAX_AGE = 86400
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class JournalValidator:
+    def __init__(self, organisation, accounts, tax_rates, refresh_accounts=None):
+        lock_dates = [
+            parse_xero_date(organisation.get(field))
+            for field in ("PeriodLockDate", "EndOfYearLockDate")
+            if organisation.get(field)
+        ]
+        self.lock_date = max((_as_date(d) for d in lock_dates), default=None)
+        self.set_accounts(accounts)
+        self.tax_types = {t["TaxType"] for t in tax_rates if t.get("Status", "ACTIVE") == "ACTIVE"}
+        self.refresh_accounts = refresh_accounts
+
+    def set_accounts(self, accounts):
+        self.all_codes = {a["Code"] for a in accounts if a.get("Code")}
+        self.active_codes = {a["Code"] for a in accounts if a.get("Code") and a.get("Status") == "ACTIVE"}
+
+    @classmethod
+    async def load(cls, xero, tenant_id, accounts_max_age=ACCOUNTS_MAX_AGE, settings_max_age=SETTINGS_MAX_AGE):
+        organisations, accounts, tax_rates = await asyncio.gather(
+            cached_fetch(tenant_id, ORGANISATION_FILE, settings_max_age, lambda: xero.get_organisations(tenant_id)),
+            cached_fetch(tenant_id, ACCOUNTS_FILE, accounts_max_age, lambda: xero.get_accounts(tenant_id)),
+            cached_fetch(tenant_id, TAX_RATES_FILE, settings_max_age, lambda: xero.get_tax_rates(tenant_id)),
+        )
+        return cls(
+            organisations[0] if organisations else {},
+            accounts,
+            tax_rates,
+            refresh_accounts=lambda: cached_fetch(tenant_id, ACCOUNTS_FILE, None, lambda: xero.get_accounts(tenant_id)),
+        )
+
+    def validate(self, journals):
+        """Return one list of problems per journal (empty when the journal is expected to be accepted)."""
+        return [self._validate_journal(journal) for journal in journals]
+
+    async def validate_fresh(self, journals):
+        """
+        Like validate(), but re-fetch the chart once if a code is unknown to the cached copy.
+
+        Accounts created moments ago (e.g. with xero_coa_manager.py add) are then not reported as missing.
+        """
+        codes = {line.get("AccountCode") for journal in journals for line in journal.get("JournalLines") or []}
+        if self.refresh_accounts and not codes <= self.all_codes:
+            self.set_accounts(await self.refresh_accounts())
+        return self.validate(journals)
+
+    def _validate_journal(self, journal):
+        problems = []
+        journal_date = None
+        try:
+            journal_date = _as_date(journal.get("Date") or "")
+        except ValueError:
+            problems.append(f"invalid Date '{journal.get('Date')}'")
+        if not journal.get("Narration"):
+            problems.append("Narration is required")
+        status = journal.get("Status", "DRAFT")
+        if status not in ("DRAFT", "POSTED"):
+            problems.append(f"invalid Status '{status}'")
+        elif status == "POSTED" and journal_date and self.lock_date and journal_date <= self.lock_date:
+            problems.append(f"Date {journal_date} is on or before the lock date {self.lock_date}")
+
+        lines = journal.get("JournalLines") or []
+        if len(lines) < 2:
+            problems.append("a journal needs at least two lines")
+
+        total = Decimal(0)
+        for line in lines:
+            code = line.get("AccountCode")
+            if code not in self.all_codes:
+                problems.append(f"unknown AccountCode '{code}'")
+            elif code not in self.active_codes:
+                problems.append(f"AccountCode '{code}' is archived")
+            tax_type = line.get("TaxType")
+            if tax_type and tax_type not in self.tax_types:
+                problems.append(f"invalid TaxType '{tax_type}'")
+            try:
+                amount = Decimal(str(line.get("LineAmount")))
+            except InvalidOperation:
+                problems.append(f"invalid LineAmount '{line.get('LineAmount')}'")
+                continue
+            if amount.as_tuple().exponent < -2:
+                problems.append(f"LineAmount {amount} has more than two decimal places")
+            total += amount
+        if total != 0:
+            problems.append(f"lines total {total}, not zero")
+        return problems
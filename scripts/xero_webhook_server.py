@@ -0,0 +1,237 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "flask",
+#     "httpx",
+#     "PyYAML",
+# ]
+# ///
+"""
+Xero Webhook Receiver
+
+Companion to xero_connect.py: a small Flask server that receives Xero webhooks and keeps the local entity store
+(.xero_cache/<tenant_id>/entities.sqlite, see xero_entity_store.py) up to date with the changed invoices, contacts and
+credit notes, so xero_sync_manager.py view --offline and show see them within seconds without polling.
+
+Every delivery is verified against the webhook signing key (x-xero-signature is the base64 HMAC-SHA256 of the raw
+body). Xero's "intent to receive" check is a delivery with no events: it gets 200 when the signature is valid and
+401 when it is not, exactly like a normal delivery. Events are acknowledged immediately and queued; a background
+worker waits --batch-window seconds to coalesce bursts, then re-fetches only the changed resources (one
+request per tenant and resource type, using the IDs filter) and upserts them into the store. The sync commands'
+If-Modified-Since watermark is left alone, so the next sync still fetches everything changed since the last one.
+
+Refreshes that fail with a 5xx, a network error or a (non-daily) 429 are retried with exponential backoff, never
+sooner than Retry-After. Other errors, the daily rate limit and resources that failed MAX_REFRESH_ATTEMPTS times are
+dropped with a message; the next sync picks those changes up.
+
+Usage:
+    ./xero_webhook_server.py [--port 8889] [--batch-window 2]
+
+Setup:
+    1. Add WEBHOOK_KEY (the signing key shown in the Xero developer portal) to xero_config.yaml.
+    2. Expose the server publicly (e.g. a Codespaces port or a tunnel) and set the delivery URL to
+       https://<host>/webhooks in the developer portal, then send the intent to receive.
+
+Requirements:
+    - xero_config.yaml (with CLIENT_ID, CLIENT_SECRET, WEBHOOK_KEY)
+    - .xero_token.json (generated by xero_connect.py)
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import queue
+import sys
+import threading
+import time
+
+import httpx
+from xero_async_client import XeroAsyncClient, XeroApiError, load_config, load_token
+from xero_entity_store import ENTITIES, EntityStore
+
+# eventCategory -> entity of the store
+RESOURCES = {"INVOICE": "invoices", "CONTACT": "contacts", "CREDITNOTE": "credit_notes"}
+# GUIDs per request; keeps the query string well under URL length limits
+IDS_PER_REQUEST = 50
+# Failed refreshes of a resource before its events are dropped
+MAX_REFRESH_ATTEMPTS = 5
+# Seconds before the first retry, doubled for every further failure up to MAX_RETRY_BACKOFF
+RETRY_BACKOFF = 5
+MAX_RETRY_BACKOFF = 300
+
+
+def verify_signature(webhook_key, body, signature):
+    digest = hmac.new(webhook_key.encode(), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), signature or "")
+
+
+def create_webhook_app(config, events):
+    # Only the server needs Flask; the queue and retry helpers are importable without it
+    from flask import Flask, request
+
+    app = Flask(__name__)
+
+    # Disable flask banner
+    import logging
+
+    log = logging.getLogger("werkzeug")
+    log.setLevel(logging.ERROR)
+
+    @app.route("/webhooks", methods=["POST"])
+    def webhooks():
+        # Verify against the raw bytes; re-serialised JSON would not match the signature
+        body = request.get_data()
+        if not verify_signature(config["WEBHOOK_KEY"], body, request.headers.get("x-xero-signature")):
+            return "", 401
+
+        # Xero expects an answer within 5 seconds, so only queue the events here
+        for event in json.loads(body).get("events") or []:
+            events.put(event)
+        return "", 200
+
+    return app
+
+
+def group_events(batch):
+    """Group events by (tenant, category) into sets of resource IDs, ignoring categories the store does not keep."""
+    groups = {}
+    for event in batch:
+        category = event.get("eventCategory")
+        if category not in RESOURCES:
+            print(f"Ignoring {category} event for {event.get('resourceId')}", file=sys.stderr)
+            continue
+        groups.setdefault((event["tenantId"], category), set()).add(event["resourceId"])
+    return groups
+
+
+def retry_delay(error, attempt):
+    """
+    Seconds to wait before refreshing again after the attempt-th failure with `error`, or None when retrying cannot
+    help: 4xx errors other than 429, the daily rate limit, unexpected errors and MAX_REFRESH_ATTEMPTS failures.
+    """
+    if attempt >= MAX_REFRESH_ATTEMPTS:
+        return None
+    if isinstance(error, XeroApiError):
+        if error.status == 429 and error.problem == "day":
+            return None
+        if error.status < 500 and error.status != 429:
+            return None
+    elif not isinstance(error, httpx.HTTPError):
+        return None
+    backoff = min(RETRY_BACKOFF * 2 ** (attempt - 1), MAX_RETRY_BACKOFF)
+    return max(backoff, getattr(error, "retry_after", None) or 0)
+
+
+def plan_retries(groups, results, attempts):
+    """
+    Report the failed refreshes of a batch and return the (delay, event) pairs to re-queue. `attempts` maps
+    (tenant, category, resource ID) to the failures so far and is updated in place; succeeded and dropped resources
+    are removed from it.
+    """
+    retries = []
+    for ((tenant_id, category), ids), result in zip(groups.items(), results):
+        keys = [(tenant_id, category, resource_id) for resource_id in sorted(ids)]
+        if isinstance(result, Exception):
+            attempt = max(attempts.get(key, 0) for key in keys) + 1
+            delay = retry_delay(result, attempt)
+            if isinstance(result, XeroApiError) and result.status in (401, 403):
+                print(f"Tenant {tenant_id} is no longer connected; dropping {len(ids)} event(s)", file=sys.stderr)
+            elif delay is None:
+                print(
+                    f"Error refreshing {category} for tenant {tenant_id}: {result}; dropping {len(ids)} event(s) "
+                    f"after {attempt} attempt(s), the next sync fetches them",
+                    file=sys.stderr,
+                )
+            else:
+                print(
+                    f"Error refreshing {category} for tenant {tenant_id}: {result}; retrying in {delay:g}s",
+                    file=sys.stderr,
+                )
+                for key in keys:
+                    attempts[key] = attempt
+                    retries.append((delay, {"tenantId": tenant_id, "eventCategory": category, "resourceId": key[2]}))
+                continue
+        for key in keys:
+            attempts.pop(key, None)
+    return retries
+
+
+async def refresh_resources(xero, tenant_id, category, resource_ids):
+    """Re-fetch the changed resources and upsert them into the tenant's entity store."""
+    entity = RESOURCES[category]
+    endpoint = ENTITIES[entity]["endpoint"]
+    # The records are under the collection named like the endpoint (e.g. "Invoices")
+    collection = endpoint.lstrip("/")
+    ids = sorted(resource_ids)
+    chunks = []
+    for start in range(0, len(ids), IDS_PER_REQUEST):
+        end = start + IDS_PER_REQUEST
+        chunks.append(ids[start:end])
+    responses = await asyncio.gather(
+        *(xero.request("GET", endpoint, tenant_id, params={"IDs": ",".join(chunk)}) for chunk in chunks)
+    )
+
+    documents = [document for data in responses for document in (data or {}).get(collection, [])]
+    with EntityStore(tenant_id) as store:
+        store.upsert(entity, documents)
+    print(f"Refreshed {len(documents)} {entity.replace('_', ' ')} for tenant {tenant_id}", file=sys.stderr)
+
+
+async def refresh_worker(events, batch_window):
+    """Drain the queue in batches and refresh the changed records in the entity store."""
+    loop = asyncio.get_running_loop()
+    # (tenant, category, resource ID) -> failed refreshes so far
+    attempts = {}
+    # Events say exactly what changed, so bypass the HTTP cache's TTLs
+    async with XeroAsyncClient.from_files(cache=False) as xero:
+        while True:
+            batch = [await loop.run_in_executor(None, events.get)]
+            # Let a burst of events (e.g. a bulk import in Xero) settle into one batch
+            deadline = time.monotonic() + batch_window
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(await loop.run_in_executor(None, events.get, True, remaining))
+                except queue.Empty:
+                    break
+
+            groups = group_events(batch)
+            results = await asyncio.gather(
+                *(refresh_resources(xero, t, c, ids) for (t, c), ids in groups.items()), return_exceptions=True
+            )
+            # Put failed events back once their backoff is over, to be fetched with that batch
+            for delay, event in plan_retries(groups, results, attempts):
+                loop.call_later(delay, events.put, event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive Xero webhooks and update the local entity store")
+    parser.add_argument("--port", type=int, default=8889, help="Port to listen on (default: 8889)")
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=2.0,
+        help="Seconds to collect events before re-fetching them together (default: 2)",
+    )
+    args = parser.parse_args()
+
+    config = load_config()
+    if not config.get("WEBHOOK_KEY"):
+        print("Error: WEBHOOK_KEY is missing from xero_config.yaml.", file=sys.stderr)
+        sys.exit(1)
+    if not load_token():
+        sys.exit(1)
+
+    events = queue.Queue()
+    threading.Thread(target=lambda: asyncio.run(refresh_worker(events, args.batch_window)), daemon=True).start()
+
+    app = create_webhook_app(config, events)
+    print(f"Listening for Xero webhooks on http://localhost:{args.port}/webhooks", file=sys.stderr)
+    app.run(port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts are standalone modules in scripts/, imported by name as they import each other
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "scripts"))
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from xero_async_client import XeroApiError, XeroAsyncClient
+
+
+def client_answering(*responses):
+    """A client whose requests get the given responses in turn; returns (client, list of requests sent)."""
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return responses[min(len(sent), len(responses)) - 1]
+
+    xero = XeroAsyncClient({}, {"access_token": "token", "expires_at": time.time() + 3600}, cache=False)
+    xero.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return xero, sent
+
+
+async def get_accounts(xero):
+    try:
+        return await xero.request("GET", "/Accounts", "tenant")
+    finally:
+        await xero.close()
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {"Retry-After": "43200", "X-Rate-Limit-Problem": "day"},
+        {"Retry-After": "30", "X-Rate-Limit-Problem": "day"},
+        {"Retry-After": "900", "X-Rate-Limit-Problem": "minute"},
+    ],
+)
+def test_daily_or_long_rate_limit_is_raised_without_waiting(headers):
+    xero, sent = client_answering(httpx.Response(429, headers=headers, json={}))
+    with pytest.raises(XeroApiError) as error:
+        asyncio.run(get_accounts(xero))
+    assert error.value.status == 429
+    assert len(sent) == 1
+
+
+def test_short_rate_limit_is_retried():
+    xero, sent = client_answering(
+        httpx.Response(429, headers={"Retry-After": "0", "X-Rate-Limit-Problem": "minute"}, json={}),
+        httpx.Response(200, json={"Accounts": []}),
+    )
+    assert asyncio.run(get_accounts(xero)) == {"Accounts": []}
+    assert len(sent) == 2
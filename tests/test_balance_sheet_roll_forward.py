@@ -0,0 +1,88 @@
+import asyncio
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import xero_balance_sheet_report as bs
+
+BANK = "bank-account-id"
+ACCRUALS = "accruals-account-id"
+
+
+def journal(number, journal_date, lines):
+    return {
+        "JournalNumber": number,
+        "JournalDate": journal_date,
+        "JournalLines": [
+            {"AccountID": account_id, "AccountCode": code, "AccountType": account_type, "NetAmount": amount}
+            for account_id, code, account_type, amount in lines
+        ],
+    }
+
+
+class FakeXero:
+    """Ledger of three journals; the last one is already numbered but dated after the report date."""
+
+    journals = [
+        journal(1, "2025-06-01", [(BANK, "090", "BANK", 100), (ACCRUALS, "820", "CURRLIAB", -100)]),
+        journal(2, "2025-06-20", [(BANK, "090", "BANK", 50), (ACCRUALS, "820", "CURRLIAB", -50)]),
+        # Auto-reversal of an accrual, posted with the accrual but dated next month
+        journal(3, "2025-07-15", [(BANK, "090", "BANK", -30), (ACCRUALS, "820", "CURRLIAB", 30)]),
+    ]
+
+    async def get_organisations(self, tenant_id):
+        return [{"FinancialYearEndMonth": 12, "FinancialYearEndDay": 31}]
+
+    async def get_accounts(self, tenant_id):
+        return [{"AccountID": BANK, "Name": "Bank"}, {"AccountID": ACCRUALS, "Name": "Accruals"}]
+
+    async def get_journals(self, tenant_id, offset=0):
+        return [j for j in self.journals if j["JournalNumber"] > (offset or 0)][:100]
+
+    async def get_report_balance_sheet(self, tenant_id, report_date):
+        def row(label, account_id, value):
+            return {
+                "RowType": "Row",
+                "Cells": [{"Value": label, "Attributes": [{"Id": "account", "Value": account_id}]}, {"Value": value}],
+            }
+
+        return {
+            "Rows": [
+                {"RowType": "Section", "Title": "Assets", "Rows": [row("Bank", BANK, "150.00")]},
+                {"RowType": "Section", "Title": "Liabilities", "Rows": [row("Accruals", ACCRUALS, "150.00")]},
+            ]
+        }
+
+
+def balances(snapshot):
+    return {row["Label"]: Decimal(row["Balance"]) for row in snapshot["rows"]}
+
+
+def test_future_dated_journal_below_offset_is_applied_once_its_date_passes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    snapshot = asyncio.run(bs.full_refresh(FakeXero(), "tenant", date(2025, 6, 30)))
+
+    assert snapshot["journal_offset"] == 3
+    assert [line["Date"] for line in snapshot["deferred"]] == ["2025-07-15", "2025-07-15"]
+    assert balances(snapshot) == {"Bank": Decimal("150.00"), "Accruals": Decimal("150.00")}
+
+    # Not yet reached: nothing moves and the lines stay deferred
+    assert bs.roll_forward(snapshot, [], date(2025, 7, 10)) == {}
+    assert len(snapshot["deferred"]) == 2
+
+    movements = bs.roll_forward(snapshot, [], date(2025, 7, 31))
+    assert movements == {BANK: Decimal(-30), ACCRUALS: Decimal(-30)}
+    assert balances(snapshot) == {"Bank": Decimal("120.00"), "Accruals": Decimal("120.00")}
+    assert snapshot["deferred"] == []
+
+    # Applied exactly once
+    assert bs.roll_forward(snapshot, [], date(2025, 8, 31)) == {}
+    assert balances(snapshot)["Bank"] == Decimal("120.00")
+
+
+@pytest.mark.parametrize("report_date", [date(2025, 7, 15), date(2025, 12, 31)])
+def test_nothing_is_deferred_when_the_report_covers_every_journal(tmp_path, monkeypatch, report_date):
+    monkeypatch.chdir(tmp_path)
+    snapshot = asyncio.run(bs.full_refresh(FakeXero(), "tenant", report_date))
+    assert snapshot["deferred"] == []
@@ -0,0 +1,26 @@
+from xero_coa_manager import validate_account_rows
+
+EXISTING = [
+    {"AccountID": "sales-id", "Code": "200", "Name": "Sales", "Type": "REVENUE"},
+    {"AccountID": "bank-id", "Name": "Business Bank Account", "Type": "BANK"},
+]
+
+
+def problems(rows):
+    return [problem for _, problem in validate_account_rows(rows, EXISTING)]
+
+
+def test_name_clash_with_an_uncoded_account_is_reported_by_name():
+    rows = [{"Code": "091", "Name": "Business Bank Account", "Type": "BANK", "BankAccountNumber": "12-3456"}]
+    assert problems(rows) == ["Name 'Business Bank Account' is already used by an account without a code"]
+
+
+def test_name_clash_with_a_coded_account_names_its_code():
+    assert problems([{"Code": "201", "Name": "sales", "Type": "REVENUE"}]) == [
+        "Name 'sales' is already used by account 200"
+    ]
+
+
+def test_rows_keeping_their_own_name_are_valid():
+    rows = [{"Code": "200", "Name": "Sales", "Type": "REVENUE"}, {"Code": "400", "Name": "Rent", "Type": "EXPENSE"}]
+    assert problems(rows) == [None, None]
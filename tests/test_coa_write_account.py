@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+import pytest
+
+from xero_async_client import XeroApiError
+from xero_coa_manager import write_account
+from xero_oplog import OperationLog
+
+ACCOUNT = {"Code": "4100", "Name": "Consulting", "Type": "REVENUE"}
+
+
+class FakeXero:
+    """Accounts of one tenant; create_account raises `error` (after creating the account when `applied`)."""
+
+    def __init__(self, error=None, applied=False):
+        self.accounts = []
+        self.error = error
+        self.applied = applied
+        self.creates = 0
+
+    async def get_accounts(self, tenant_id, where=None, fresh=False):
+        return [a for a in self.accounts if where == f'Code=="{a["Code"]}"']
+
+    async def create_account(self, tenant_id, account, idempotency_key=None):
+        self.creates += 1
+        created = {**account, "AccountID": f"account-{self.creates}"}
+        if self.error is None or self.applied:
+            self.accounts.append(created)
+        if self.error is not None:
+            raise self.error
+        return created
+
+
+@pytest.fixture
+def oplog_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return str(tmp_path / "oplog.jsonl")
+
+
+def create(xero, oplog_file, resume=False):
+    with OperationLog(oplog_file, resume=resume) as oplog:
+        status = asyncio.run(write_account(xero, oplog, "tenant", "create", ACCOUNT))
+        key = oplog.plan("tenant", "create_account", ACCOUNT["Code"], ACCOUNT)
+        return status, oplog.is_done(key), oplog.is_uncertain(key)
+
+
+@pytest.mark.parametrize("error", [XeroApiError(503, "Service unavailable"), httpx.ReadTimeout("timed out")])
+def test_unknown_outcome_is_looked_up_on_resume(oplog_file, error):
+    xero = FakeXero(error, applied=True)
+    (status, message), done, uncertain = create(xero, oplog_file)
+    assert status == "error" and "outcome unknown" in message
+    assert not done and uncertain
+
+    xero.error = None
+    assert create(xero, oplog_file, resume=True) == (("skipped", "created by a previous run"), True, False)
+    assert xero.creates == 1
+
+
+def test_unknown_outcome_is_sent_again_when_the_account_is_missing(oplog_file):
+    xero = FakeXero(XeroApiError(504, "Gateway timeout"))
+    create(xero, oplog_file)
+
+    xero.error = None
+    assert create(xero, oplog_file, resume=True) == (("ok", None), True, False)
+    assert xero.creates == 2
+
+
+def test_refused_create_is_recorded_as_failed(oplog_file):
+    xero = FakeXero(XeroApiError(400, "Account code already exists"))
+    (status, message), done, uncertain = create(xero, oplog_file)
+    assert (status, message) == ("error", "HTTP 400: Account code already exists")
+    assert not done and not uncertain
@@ -0,0 +1,43 @@
+import asyncio
+from decimal import Decimal
+
+from xero_journal_manager import find_created_journal
+
+JOURNAL = {
+    "Date": "2025-06-30",
+    "Narration": 'Reclass "Koinly" fees, June',
+    "JournalLines": [{"AccountCode": "404", "LineAmount": "12.50"}, {"AccountCode": "090", "LineAmount": "-12.50"}],
+}
+
+
+class FakeXero:
+    def __init__(self, journals):
+        self.journals = journals
+        self.filters = []
+
+    async def get_all_manual_journals(self, tenant_id, where=None):
+        self.filters.append(where)
+        return self.journals
+
+
+def created(journal_id, narration, amount="12.50"):
+    return {
+        "ManualJournalID": journal_id,
+        "Date": "/Date(1751241600000+0000)/",
+        "Narration": narration,
+        "JournalLines": [
+            {"AccountCode": "404", "LineAmount": Decimal(amount)},
+            {"AccountCode": "090", "LineAmount": -Decimal(amount)},
+        ],
+    }
+
+
+def test_journal_with_quotes_in_its_narration_is_found():
+    xero = FakeXero([created("other", "Reclass fees"), created("created", JOURNAL["Narration"])])
+    assert asyncio.run(find_created_journal(xero, "tenant", JOURNAL)) == "created"
+    assert xero.filters == ["Date==DateTime(2025,6,30)"]
+
+
+def test_journal_with_other_lines_is_not_a_match():
+    xero = FakeXero([created("created", JOURNAL["Narration"], amount="13.00")])
+    assert asyncio.run(find_created_journal(xero, "tenant", JOURNAL)) is None
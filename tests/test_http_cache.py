@@ -0,0 +1,34 @@
+import pytest
+
+from xero_http_cache import HttpCache
+
+API = "https://api.xero.com/api.xro/2.0"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HttpCache(str(tmp_path / "http_cache.sqlite"))
+    yield cache
+    cache.close()
+
+
+def cached(cache, tenant_id, url):
+    return cache.lookup(tenant_id, url, None) is not None
+
+
+def test_journal_write_drops_cached_reports_and_journals(cache):
+    urls = [f"{API}/Reports/ProfitAndLoss", f"{API}/Journals", f"{API}/ManualJournals", f"{API}/Contacts"]
+    for tenant_id in ("tenant", "other"):
+        for url in urls:
+            cache.store(tenant_id, url, None, b'{"Items": [1]}', {})
+
+    cache.invalidate("tenant", f"{API}/ManualJournals/journal-id")
+
+    assert [cached(cache, "tenant", url) for url in urls] == [False, False, False, True]
+    assert all(cached(cache, "other", url) for url in urls)
+
+
+def test_contact_write_keeps_cached_reports(cache):
+    cache.store("tenant", f"{API}/Reports/BalanceSheet", None, b'{"Reports": [1]}', {})
+    cache.invalidate("tenant", f"{API}/Contacts")
+    assert cached(cache, "tenant", f"{API}/Reports/BalanceSheet")
@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from xero_journal_impact import edit_impact, impact_rows, print_impact
+
+CHART = [
+    {"Code": "200", "Type": "REVENUE"},
+    {"Code": "400", "Type": "OVERHEADS"},
+    {"Code": "420", "Type": "EXPENSE"},
+    {"Code": "090", "Type": "BANK"},
+    {"Code": "800", "Type": "CURRLIAB"},
+]
+
+
+def journal(status, lines, date="2025-06-30", line_amount_types=None):
+    payload = {"Date": date, "Status": status, "JournalLines": [dict(line) for line in lines]}
+    if line_amount_types:
+        payload["LineAmountTypes"] = line_amount_types
+    return payload
+
+
+def line(code, amount, tax_type=None):
+    return {"AccountCode": code, "LineAmount": amount, **({"TaxType": tax_type} if tax_type else {})}
+
+
+def reassigned(before, new_code):
+    after = journal(before["Status"], before["JournalLines"], before["Date"], before.get("LineAmountTypes"))
+    after["JournalLines"][0]["AccountCode"] = new_code
+    return after
+
+
+def test_reclassification_moves_expense_between_accounts_of_one_class():
+    before = journal("POSTED", [line("400", 100), line("090", -100)])
+    impact, unknown, taxed = edit_impact([("j1", before, reassigned(before, "420"))], CHART)
+    assert impact == {("2025-06", "EXPENSE"): [Decimal("100.00")] * 2, ("2025-06", "ASSET"): [Decimal("-100.00")] * 2}
+    assert unknown == set() and taxed == []
+
+
+def test_posting_a_draft_only_counts_after():
+    draft = journal("DRAFT", [line("090", 250), line("200", -250)])
+    impact, _, _ = edit_impact([("j1", draft, {**draft, "Status": "POSTED"})], CHART)
+    assert impact == {("2025-06", "ASSET"): [Decimal("0.00"), Decimal("250.00")], ("2025-06", "REVENUE"): [0, 250]}
+
+
+def test_reclassification_across_classes_by_period():
+    june = journal("POSTED", [line("200", -80), line("090", 80)])
+    july = journal("POSTED", [line("400", 40), line("800", -40)], date="2025-07-15")
+    edits = [("j1", june, reassigned(june, "800")), ("j2", july, reassigned(july, "090"))]
+    rows = impact_rows(edit_impact(edits, CHART)[0])
+
+    assert rows == [
+        ["2025-06", "REVENUE", Decimal("80.00"), Decimal("0.00"), Decimal("-80.00")],
+        ["2025-06", "ASSET", Decimal("80.00"), Decimal("80.00"), Decimal("0.00")],
+        ["2025-06", "LIABILITY", Decimal("0.00"), Decimal("80.00"), Decimal("80.00")],
+        ["2025-06", "Net Profit", Decimal("80.00"), Decimal("0.00"), Decimal("-80.00")],
+        ["2025-06", "Net Assets", Decimal("80.00"), Decimal("0.00"), Decimal("-80.00")],
+        ["2025-07", "EXPENSE", Decimal("40.00"), Decimal("0.00"), Decimal("-40.00")],
+        ["2025-07", "ASSET", Decimal("0.00"), Decimal("40.00"), Decimal("40.00")],
+        ["2025-07", "LIABILITY", Decimal("40.00"), Decimal("40.00"), Decimal("0.00")],
+        ["2025-07", "Net Profit", Decimal("-40.00"), Decimal("0.00"), Decimal("40.00")],
+        ["2025-07", "Net Assets", Decimal("-40.00"), Decimal("0.00"), Decimal("40.00")],
+    ]
+
+
+def test_codes_missing_from_the_chart_are_reported():
+    before = journal("POSTED", [line("999", 10), line("090", -10)])
+    impact, unknown, _ = edit_impact([("j1", before, reassigned(before, "400"))], CHART)
+    assert unknown == {"999"}
+    assert impact[("2025-06", "EXPENSE")] == [Decimal("0.00"), Decimal("10.00")]
+
+
+def test_journals_that_post_tax_are_not_previewed(capsys):
+    inclusive = journal("POSTED", [line("400", 115, "INPUT2"), line("090", -115)], line_amount_types="Inclusive")
+    tax_change = journal("POSTED", [line("400", 100, "NONE"), line("090", -100)], line_amount_types="Exclusive")
+    retaxed = journal("POSTED", tax_change["JournalLines"], line_amount_types="Exclusive")
+    retaxed["JournalLines"][0]["TaxType"] = "INPUT2"
+    no_tax = journal("POSTED", [line("400", 50, "INPUT2"), line("090", -50)], line_amount_types="NoTax")
+    edits = [
+        ("inclusive", inclusive, reassigned(inclusive, "420")),
+        ("tax-change", tax_change, retaxed),
+        ("no-tax", no_tax, reassigned(no_tax, "420")),
+    ]
+
+    impact, _, taxed = edit_impact(edits, CHART)
+    assert taxed == ["inclusive", "tax-change"]
+    assert impact[("2025-06", "EXPENSE")] == [Decimal("50.00"), Decimal("50.00")]
+
+    print_impact([], taxed=taxed)
+    err = capsys.readouterr().err
+    assert "would not move" not in err
+    assert "Not previewed (tax applies to their lines): inclusive, tax-change" in err
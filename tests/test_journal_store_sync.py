@@ -0,0 +1,172 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+
+import httpx
+import pytest
+
+import xero_journal_manager
+import xero_journal_store
+from xero_async_client import XeroAsyncClient, parse_xero_timestamp
+from xero_cache import utc_now
+from xero_journal_store import JournalStore, sync_manual_journals
+
+
+def manual_journal(journal_id, narration, updated_at):
+    return {
+        "ManualJournalID": journal_id,
+        "Date": "2025-06-30",
+        "Narration": narration,
+        "Status": "DRAFT",
+        "UpdatedDateUTC": updated_at,
+        "JournalLines": [
+            {"AccountCode": "400", "Description": narration, "LineAmount": 25},
+            {"AccountCode": "090", "Description": narration, "LineAmount": -25},
+        ],
+    }
+
+
+class FakeXero:
+    """
+    Manual journals of one tenant; honours If-Modified-Since like the API (inclusively: journals updated at that very
+    time are returned again), so deletions never show up in it.
+    """
+
+    def __init__(self, journals):
+        self.journals = list(journals)
+        self.full_listings = 0
+
+    async def get_all_manual_journals(self, tenant_id, if_modified_since=None, fresh=False):
+        if if_modified_since is None:
+            self.full_listings += 1
+            return list(self.journals)
+        return [j for j in self.journals if parse_xero_timestamp(j["UpdatedDateUTC"]) >= if_modified_since]
+
+
+@pytest.fixture
+def xero(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return FakeXero(
+        [
+            manual_journal("kept", "Office rent", "2025-07-01T10:00:00+00:00"),
+            manual_journal("deleted", "Duplicate rent accrual", "2025-07-01T11:00:00+00:00"),
+        ]
+    )
+
+
+def stored_ids(store):
+    return {row["JournalID"] for row in store.manual_journal_lines()}
+
+
+def test_changed_since_sync_does_not_see_deletions(xero):
+    with JournalStore("tenant") as store:
+        assert asyncio.run(sync_manual_journals(xero, store)) == 2
+        xero.journals = [j for j in xero.journals if j["ManualJournalID"] != "deleted"]
+
+        assert asyncio.run(sync_manual_journals(xero, store)) == 0
+        assert stored_ids(store) == {"kept", "deleted"}
+        assert xero.full_listings == 1
+
+
+def test_unchanged_journals_are_not_counted_again(xero):
+    with JournalStore("tenant") as store:
+        assert asyncio.run(sync_manual_journals(xero, store)) == 2
+        assert asyncio.run(sync_manual_journals(xero, store)) == 0
+        assert asyncio.run(sync_manual_journals(xero, store, full=True)) == 0
+
+        xero.journals[0] = manual_journal("kept", "Office rent, July", "2025-07-02T08:00:00+00:00")
+        assert asyncio.run(sync_manual_journals(xero, store)) == 1
+        assert asyncio.run(sync_manual_journals(xero, store)) == 0
+        assert store.search("july")
+
+
+def test_full_sync_deletes_journals_no_longer_listed(xero):
+    with JournalStore("tenant") as store:
+        asyncio.run(sync_manual_journals(xero, store))
+        xero.journals = [j for j in xero.journals if j["ManualJournalID"] != "deleted"]
+        xero.journals.append(manual_journal("added", "Insurance", "2025-07-02T09:00:00+00:00"))
+
+        assert asyncio.run(sync_manual_journals(xero, store, full=True)) == 2
+        assert stored_ids(store) == {"kept", "added"}
+        assert store.manual_journal_versions().keys() == {"kept", "added"}
+        assert store.db.execute("SELECT COUNT(*) FROM manual_journal_lines_fts").fetchone()[0] == 4
+
+
+def test_sync_prunes_once_the_last_full_listing_is_old(xero):
+    with JournalStore("tenant") as store:
+        asyncio.run(sync_manual_journals(xero, store))
+        xero.journals = [j for j in xero.journals if j["ManualJournalID"] != "deleted"]
+        stale = (utc_now() - timedelta(seconds=xero_journal_store.PRUNE_INTERVAL + 60)).isoformat()
+        with store.db:
+            store.set_meta("manual_journals_pruned_at", stale)
+
+        assert asyncio.run(sync_manual_journals(xero, store)) == 1
+        assert stored_ids(store) == {"kept"}
+        assert xero.full_listings == 2
+
+
+def test_search_stops_returning_deleted_journals(xero):
+    with JournalStore("tenant") as store:
+        asyncio.run(sync_manual_journals(xero, store))
+        assert {row["JournalID"] for _, row in store.search("rent")} == {"kept", "deleted"}
+        xero.journals = [j for j in xero.journals if j["ManualJournalID"] != "deleted"]
+
+        asyncio.run(sync_manual_journals(xero, store, full=True))
+        assert {row["JournalID"] for _, row in store.search("rent")} == {"kept"}
+        assert store.search("duplicate") == []
+
+
+def cached_client(journals):
+    """A real client with the HTTP cache on, whose /ManualJournals answers from `journals` like Xero would."""
+
+    def handler(request):
+        if request.url.path == "/connections":
+            return httpx.Response(200, json=[{"tenantId": "tenant", "tenantName": "Demo Company"}])
+        listed = journals
+        if "If-Modified-Since" in request.headers:
+            since = parsedate_to_datetime(request.headers["If-Modified-Since"])
+            listed = [j for j in journals if parse_xero_timestamp(j["UpdatedDateUTC"]) >= since]
+        page = int(request.url.params.get("page", "1"))
+        return httpx.Response(200, content=json.dumps({"ManualJournals": listed if page == 1 else []}))
+
+    xero = XeroAsyncClient({}, {"access_token": "token", "expires_at": time.time() + 3600})
+    xero.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return xero
+
+
+def test_full_sync_through_the_http_cache_deletes_journals(xero):
+    async def scenario():
+        api = cached_client(xero.journals)
+        with JournalStore("tenant") as store:
+            await sync_manual_journals(api, store)
+            # Listed once more (e.g. by create --resume), so the cache holds a listing with the deleted journal
+            await api.get_all_manual_journals("tenant")
+            xero.journals[:] = [j for j in xero.journals if j["ManualJournalID"] != "deleted"]
+
+            await sync_manual_journals(api, store, full=True)
+            ids = stored_ids(store)
+        await api.close()
+        return ids
+
+    assert asyncio.run(scenario()) == {"kept"}
+
+
+def test_search_through_the_http_cache_drops_deleted_journals(xero, monkeypatch, capsys):
+    monkeypatch.setattr(XeroAsyncClient, "from_files", classmethod(lambda cls, **kwargs: cached_client(xero.journals)))
+
+    def search(full=False):
+        asyncio.run(xero_journal_manager.search_journals(None, None, "rent", {}, 50, full=full))
+        rows = capsys.readouterr().out.splitlines()[1:]
+        return {row.split(",")[1] for row in rows}
+
+    assert search() == {"kept", "deleted"}
+    xero.journals[:] = [j for j in xero.journals if j["ManualJournalID"] != "deleted"]
+    assert search(full=True) == {"kept"}
+
+    # The daily listing drops them too, without --full
+    xero.journals[:] = []
+    with JournalStore("tenant") as store, store.db:
+        store.set_meta("manual_journals_pruned_at", "2000-01-01T00:00:00+00:00")
+    assert search() == set()
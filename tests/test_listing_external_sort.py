@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+import xero_listing
+from xero_listing import _sort_key, external_sort, select_rows
+
+
+def make_rows(n, seed=0):
+    """Rows with many equal keys (to check stability) and some blank names and amounts."""
+    rng = random.Random(seed)
+    names = ["Alpha", "Bravo", "Charlie", "", None]
+    return [{"Row": i, "Name": rng.choice(names), "Amount": rng.randint(-50, 50) if i % 7 else None} for i in range(n)]
+
+
+@pytest.fixture
+def runs_written(monkeypatch):
+    """Counts the runs spilled to disk, first pass and merge passes alike."""
+    written = []
+    write_run = xero_listing._write_run
+
+    def counting_write_run(rows):
+        written.append(1)
+        return write_run(rows)
+
+    monkeypatch.setattr(xero_listing, "_write_run", counting_write_run)
+    return written
+
+
+def test_rows_within_the_budget_are_not_spilled(runs_written):
+    rows = make_rows(500)
+    key = _sort_key("Amount", False, lambda row: row)
+    assert list(external_sort(rows, key, memory_mb=1)) == sorted(rows, key=key)
+    assert runs_written == []
+
+
+@pytest.mark.parametrize("column,descending", [("Amount", False), ("Amount", True), ("Name", False), ("Name", True)])
+def test_several_runs_merge_like_sorted(runs_written, column, descending):
+    # A zero budget still keeps _SAMPLE_ROWS rows per run
+    rows = make_rows(xero_listing._SAMPLE_ROWS * 5 + 123)
+    key = _sort_key(column, descending, lambda row: row)
+    assert list(external_sort(rows, key, descending, memory_mb=0)) == sorted(rows, key=key, reverse=descending)
+    assert len(runs_written) == 6
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_more_runs_than_the_fan_in_are_merged_in_passes(runs_written, descending):
+    runs = xero_listing.MERGE_FAN_IN + 6
+    rows = make_rows(xero_listing._SAMPLE_ROWS * runs, seed=1)
+    key = _sort_key("Amount", descending, lambda row: row)
+    assert list(external_sort(iter(rows), key, descending, memory_mb=0)) == sorted(rows, key=key, reverse=descending)
+    # Every first-pass run, then one longer run per group of MERGE_FAN_IN
+    assert len(runs_written) == runs + 2
+
+
+def test_multi_pass_merge_with_a_small_fan_in(monkeypatch, runs_written):
+    monkeypatch.setattr(xero_listing, "_SAMPLE_ROWS", 3)
+    monkeypatch.setattr(xero_listing, "MERGE_FAN_IN", 2)
+    rows = make_rows(100, seed=2)
+    key = _sort_key("Name", True, lambda row: row)
+    assert list(external_sort(rows, key, True, memory_mb=0)) == sorted(rows, key=key, reverse=True)
+    # 34 runs merged pairwise down to two: 17, 9, 5, 3 and 2 runs
+    assert len(runs_written) == 34 + 17 + 9 + 5 + 3 + 2
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_select_rows_spills_pairs_and_puts_blanks_last(descending):
+    # (columns, csv row) pairs, as the list commands pass them
+    rows = [(row, [row["Row"], row["Name"]]) for row in make_rows(xero_listing._SAMPLE_ROWS * 3, seed=3)]
+
+    def fields(pair):
+        return pair[0]
+
+    ordered = list(select_rows(iter(rows), sort=("Name", descending), fields=fields, memory_mb=0))
+
+    key = _sort_key("Name", descending, fields)
+    assert ordered == sorted(rows, key=key, reverse=descending)
+    names = [columns["Name"] for columns, _ in ordered]
+    filled = sum(1 for name in names if name)
+    assert names[:filled] == sorted(names[:filled], reverse=descending) and all(names[:filled])
+    assert not any(names[filled:])
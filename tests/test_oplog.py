@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from xero_oplog import OperationLog, default_oplog_file
+
+
+def test_fresh_run_refuses_to_displace_an_interrupted_log(tmp_path, capsys):
+    path = str(tmp_path / "oplog.jsonl")
+    with OperationLog(path) as oplog:
+        key = oplog.plan("tenant", "edit_journal", "journal-1", {"find": "265"})
+        oplog.started(key)
+
+    with pytest.raises(SystemExit):
+        OperationLog(path)
+    assert "--resume" in capsys.readouterr().err
+    assert not os.path.exists(f"{path}.prev")
+
+    with OperationLog(path, resume=True) as oplog:
+        assert oplog.is_uncertain(key)
+        oplog.done(key)
+
+
+def test_fresh_run_moves_a_finished_log_aside(tmp_path):
+    path = str(tmp_path / "oplog.jsonl")
+    with OperationLog(path) as oplog:
+        oplog.done(oplog.plan("tenant", "edit_journal", "journal-1"))
+        oplog.failed(oplog.plan("tenant", "edit_journal", "journal-2"), "HTTP 400: invalid")
+
+    with OperationLog(path) as oplog:
+        assert oplog.pending("tenant", "edit_journal") == []
+    assert os.path.exists(f"{path}.prev")
+
+
+def test_commands_keep_separate_logs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with OperationLog(default_oplog_file("journal_edit")) as oplog:
+        oplog.started(oplog.plan("tenant", "edit_journal", "journal-1"))
+
+    # An interrupted edit neither blocks nor is displaced by another command
+    with OperationLog(default_oplog_file("coa_import")) as oplog:
+        oplog.done(oplog.plan("tenant", "create_account", "810"))
+    with OperationLog(default_oplog_file("coa_import")):
+        pass
+
+    with OperationLog(default_oplog_file("journal_edit"), resume=True) as oplog:
+        assert [entry["target"] for entry in oplog.pending("tenant", "edit_journal")] == ["journal-1"]
+    assert sorted(os.listdir(tmp_path)) == [
+        ".xero_oplog_coa_import.jsonl",
+        ".xero_oplog_coa_import.jsonl.prev",
+        ".xero_oplog_journal_edit.jsonl",
+    ]
@@ -0,0 +1,20 @@
+from datetime import date
+
+from xero_precomputed import drop_reports, load_report, save_report, stored_reports
+
+DATES = (date(2025, 1, 1), date(2025, 12, 31))
+
+
+def test_drop_reports_stops_serving_the_tenants_reports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_report("tenant", "profit_and_loss", DATES, {"ReportName": "Profit and Loss"})
+    save_report("tenant", "balance_sheet", DATES[1:], {"ReportName": "Balance Sheet"})
+    save_report("other", "balance_sheet", DATES[1:], {"ReportName": "Balance Sheet"})
+    assert load_report("tenant", "profit_and_loss", DATES)
+
+    drop_reports("tenant")
+
+    assert load_report("tenant", "profit_and_loss", DATES) is None
+    assert stored_reports("tenant") == []
+    assert load_report("other", "balance_sheet", DATES[1:])
+    drop_reports("no-cache-yet")
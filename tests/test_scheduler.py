@@ -0,0 +1,83 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+from xero_scheduler import CronSchedule, Scheduler, report_dates
+
+
+def matching_minutes(expression, hour=0):
+    schedule = CronSchedule(expression)
+    return [minute for minute in range(60) if schedule.matches(datetime(2025, 6, 2, hour, minute))]
+
+
+def test_minute_steps_lists_and_ranges():
+    assert matching_minutes("*/15 * * * *") == [0, 15, 30, 45]
+    assert matching_minutes("5/10 * * * *") == [5, 15, 25, 35, 45, 55]
+    assert matching_minutes("10-20/5,58 * * * *") == [10, 15, 20, 58]
+    assert matching_minutes("7 3 * * *", hour=3) == [7]
+    assert matching_minutes("7 3 * * *", hour=4) == []
+
+
+def test_day_of_month_and_day_of_week():
+    # 2025-06-01 is a Sunday, 2025-06-02 a Monday
+    sundays = CronSchedule("0 2 * * 7")
+    assert sundays.matches(datetime(2025, 6, 1, 2, 0)) and not sundays.matches(datetime(2025, 6, 2, 2, 0))
+    assert CronSchedule("0 2 * * 0").matches(datetime(2025, 6, 1, 2, 0))
+
+    # Restricting both matches either, as in cron
+    first_or_monday = CronSchedule("0 2 1 * 1")
+    assert first_or_monday.matches(datetime(2025, 6, 1, 2, 0))
+    assert first_or_monday.matches(datetime(2025, 6, 9, 2, 0))
+    assert not first_or_monday.matches(datetime(2025, 6, 10, 2, 0))
+
+    quarter_ends = CronSchedule("30 1 1 1/3 *")
+    assert [m for m in range(1, 13) if quarter_ends.matches(datetime(2025, m, 1, 1, 30))] == [1, 4, 7, 10]
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "0 24 * * *", "0 0 0 * *", "*/0 * * * *", "x * * * *"])
+def test_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+@pytest.mark.parametrize(
+    "period,today,expected",
+    [
+        ("this_month", date(2025, 2, 14), (date(2025, 2, 1), date(2025, 2, 28))),
+        ("last_month", date(2025, 1, 1), (date(2024, 12, 1), date(2024, 12, 31))),
+        ("this_quarter", date(2025, 8, 31), (date(2025, 7, 1), date(2025, 9, 30))),
+        ("last_quarter", date(2025, 5, 1), (date(2025, 1, 1), date(2025, 3, 31))),
+        ("last_quarter", date(2025, 2, 14), (date(2024, 10, 1), date(2024, 12, 31))),
+        ("this_year", date(2025, 6, 1), (date(2025, 1, 1), date(2025, 12, 31))),
+        ("last_year", date(2025, 1, 1), (date(2024, 1, 1), date(2024, 12, 31))),
+    ],
+)
+def test_profit_and_loss_periods(period, today, expected):
+    assert report_dates({"report": "profit_and_loss", "period": period}, today) == expected
+
+
+@pytest.mark.parametrize(
+    "when,today,expected",
+    [
+        ("today", date(2025, 3, 15), date(2025, 3, 15)),
+        ("this_month_end", date(2024, 2, 10), date(2024, 2, 29)),
+        ("last_month_end", date(2025, 1, 1), date(2024, 12, 31)),
+        ("this_year_end", date(2025, 3, 15), date(2025, 12, 31)),
+        ("last_year_end", date(2025, 3, 15), date(2024, 12, 31)),
+    ],
+)
+def test_balance_sheet_dates(when, today, expected):
+    assert report_dates({"report": "balance_sheet", "date": when}, today) == (expected,)
+
+
+class OfflineXero:
+    async def get_connections(self):
+        raise ConnectionError("connection refused")
+
+
+def test_job_errors_are_reported_not_raised(capsys):
+    job = {"name": "month-end-pnl", "report": "profit_and_loss", "period": "last_month", "tenants": "all"}
+    scheduler = Scheduler(OfflineXero(), {"jobs": [job]})
+    assert asyncio.run(scheduler.run_job("month-end-pnl", date(2025, 7, 1))) is False
+    assert "month-end-pnl: failed: connection refused" in capsys.readouterr().err
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import time
+from datetime import date
+
+import httpx
+
+from xero_async_client import XeroAsyncClient
+from xero_snapshot import Snapshot
+from xero_snapshot_manager import export_snapshot
+
+JOURNALS = [
+    {
+        "ManualJournalID": journal_id,
+        "Date": "2025-06-30",
+        "Narration": narration,
+        "Status": "DRAFT",
+        "UpdatedDateUTC": "2025-07-01T10:00:00+00:00",
+        "JournalLines": [{"AccountCode": "400", "LineAmount": 25}, {"AccountCode": "090", "LineAmount": -25}],
+    }
+    for journal_id, narration in (("kept", "Office rent"), ("deleted", "Duplicate rent accrual"))
+]
+
+
+def cached_client(journals):
+    """A client with the HTTP cache on, answering the requests of an export from `journals`."""
+    fixed = {
+        "/connections": [{"tenantId": "tenant", "tenantName": "Demo Company"}],
+        "/api.xro/2.0/Organisation": {"Organisations": [{"Name": "Demo Company", "BaseCurrency": "USD"}]},
+        "/api.xro/2.0/Accounts": {"Accounts": []},
+        "/api.xro/2.0/Journals": {"Journals": []},
+        "/api.xro/2.0/Reports/ProfitAndLoss": {"Reports": [{"Rows": []}]},
+        "/api.xro/2.0/Reports/BalanceSheet": {"Reports": [{"Rows": []}]},
+    }
+
+    def handler(request):
+        if request.url.path in fixed:
+            return httpx.Response(200, json=fixed[request.url.path])
+        page = int(request.url.params.get("page", "1"))
+        return httpx.Response(200, content=json.dumps({"ManualJournals": journals if page == 1 else []}))
+
+    xero = XeroAsyncClient({}, {"access_token": "token", "expires_at": time.time() + 3600})
+    xero.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return xero
+
+
+def test_export_leaves_out_journals_deleted_since_the_listing_was_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    journals = list(JOURNALS)
+    monkeypatch.setattr(XeroAsyncClient, "from_files", classmethod(lambda cls, **kwargs: cached_client(journals)))
+
+    def export(path):
+        asyncio.run(export_snapshot(None, None, path, date(2025, 6, 30), date(2025, 1, 1)))
+        with Snapshot(path) as snapshot:
+            return {row["JournalID"] for row in snapshot.table("journal_lines").rows(["JournalID"])}
+
+    assert export("before.xsnap") == {"kept", "deleted"}
+    journals.remove(JOURNALS[1])
+    assert export("after.xsnap") == {"kept"}
@@ -0,0 +1,101 @@
+import base64
+import hashlib
+import hmac
+import json
+import queue
+
+import httpx
+import pytest
+
+import xero_webhook_server
+from xero_async_client import XeroApiError
+from xero_webhook_server import group_events, plan_retries, retry_delay, verify_signature
+
+KEY = "signing-key"
+
+
+def sign(body, key=KEY):
+    return base64.b64encode(hmac.new(key.encode(), body, hashlib.sha256).digest()).decode()
+
+
+def event(tenant_id, category, resource_id):
+    return {"tenantId": tenant_id, "eventCategory": category, "resourceId": resource_id}
+
+
+def test_signature_is_the_hmac_of_the_raw_body():
+    body = b'{"events":[],"firstEventSequence":0,"lastEventSequence":0,"entropy":"S0MEENTROPY"}'
+    assert verify_signature(KEY, body, sign(body))
+    assert not verify_signature(KEY, body, sign(body, "another-key"))
+    assert not verify_signature(KEY, body + b" ", sign(body))
+    assert not verify_signature(KEY, body, None)
+
+
+def test_webhook_route_rejects_bad_signatures():
+    pytest.importorskip("flask")
+    events = queue.Queue()
+    client = xero_webhook_server.create_webhook_app({"WEBHOOK_KEY": KEY}, events).test_client()
+    body = json.dumps({"events": [event("tenant", "INVOICE", "inv-1")]}).encode()
+
+    assert client.post("/webhooks", data=body, headers={"x-xero-signature": sign(body, "wrong")}).status_code == 401
+    assert events.empty()
+    assert client.post("/webhooks", data=body, headers={"x-xero-signature": sign(body)}).status_code == 200
+    assert events.get_nowait()["resourceId"] == "inv-1"
+
+
+def test_group_events_by_tenant_and_category():
+    batch = [
+        event("a", "INVOICE", "inv-1"),
+        event("a", "INVOICE", "inv-2"),
+        event("a", "INVOICE", "inv-1"),
+        event("a", "CONTACT", "con-1"),
+        event("b", "INVOICE", "inv-3"),
+        event("a", "SUBSCRIPTION", "sub-1"),
+    ]
+    assert group_events(batch) == {
+        ("a", "INVOICE"): {"inv-1", "inv-2"},
+        ("a", "CONTACT"): {"con-1"},
+        ("b", "INVOICE"): {"inv-3"},
+    }
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        XeroApiError(400, "Bad request"),
+        XeroApiError(404, "Not found"),
+        XeroApiError(429, "Rate limited (day limit)", retry_after=43200, problem="day"),
+        ValueError("bad document"),
+    ],
+)
+def test_errors_retrying_cannot_fix_are_not_retried(error):
+    assert retry_delay(error, 1) is None
+
+
+def test_retries_back_off_and_honour_retry_after():
+    server_error = XeroApiError(503, "Service unavailable")
+    delays = [retry_delay(server_error, attempt) for attempt in range(1, xero_webhook_server.MAX_REFRESH_ATTEMPTS)]
+    assert delays == sorted(delays) and delays[0] == xero_webhook_server.RETRY_BACKOFF
+    assert retry_delay(server_error, xero_webhook_server.MAX_REFRESH_ATTEMPTS) is None
+
+    assert retry_delay(httpx.ConnectTimeout("timed out"), 1) == xero_webhook_server.RETRY_BACKOFF
+    assert retry_delay(XeroApiError(429, "Rate limited", retry_after=600, problem="minute"), 1) == 600
+
+
+def test_failing_resources_are_dropped_after_the_last_attempt():
+    groups = {("a", "INVOICE"): {"inv-1"}, ("a", "CONTACT"): {"con-1"}}
+    attempts = {}
+    for attempt in range(1, xero_webhook_server.MAX_REFRESH_ATTEMPTS):
+        retries = plan_retries(groups, [XeroApiError(502, "Bad gateway"), None], attempts)
+        assert [retry_event for _, retry_event in retries] == [event("a", "INVOICE", "inv-1")]
+        assert attempts == {("a", "INVOICE", "inv-1"): attempt}
+
+    assert plan_retries(groups, [XeroApiError(502, "Bad gateway"), None], attempts) == []
+    assert attempts == {}
+
+
+def test_persistent_client_errors_are_dropped_at_once():
+    attempts = {}
+    groups = {("a", "INVOICE"): {"inv-1"}, ("b", "INVOICE"): {"inv-2"}}
+    results = [XeroApiError(403, "Forbidden"), XeroApiError(429, "Rate limited", retry_after=60, problem="day")]
+    assert plan_retries(groups, results, attempts) == []
+    assert attempts == {}